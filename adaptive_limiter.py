@@ -0,0 +1,132 @@
+import os
+import time
+import random
+import asyncio
+import httpx
+
+# AIMD 방식의 적응형 동시성 제한기 (Adaptive concurrency limiter)
+# - 응답이 빠르고 오류가 없으면 동시 요청 수를 조금씩 늘립니다 (additive increase).
+# - 과부하 신호(5xx/429 응답, 타임아웃, 연결 끊김, 지연 급증)가 오면 절반으로 줄입니다 (multiplicative decrease).
+#   그 밖의 오류는 오류율이 허용치를 넘을 때만 줄입니다. 동시에 실패한 요청들은 한 번만 줄입니다.
+# - 요청마다 지터(jitter)를 준 지수 백오프로 재시도합니다.
+# - 공공 API처럼 초당 요청 수 제한이 정해진 곳에는 RateLimiter(토큰 버킷)를 함께 씁니다.
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+RETRY_EXCEPTIONS = (httpx.TimeoutException, httpx.NetworkError, httpx.RemoteProtocolError)
+ERROR_WINDOW = 0.05  # 오류율 이동 평균의 가중치 (약 최근 20건)
+
+class RetryableStatus(Exception):
+    def __init__(self, response):
+        super().__init__(f"HTTP {response.status_code}")
+        self.response = response
+
+class RateLimiter:
+    """토큰 버킷 방식의 요청 속도 제한기. 초당 rate개, 최대 burst개까지 몰아서 허용합니다. rate가 0 이하이면 제한하지 않습니다."""
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.capacity = float(burst or max(1.0, self.rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = None
+
+    async def acquire(self):
+        if self.rate <= 0: return
+        if self._lock is None: self._lock = asyncio.Lock()
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+class AdaptiveLimiter:
+    def __init__(self, initial=None, min_limit=None, max_limit=None, latency_tolerance=None, error_tolerance=None, backoff_factor=0.5):
+        self.limit = float(initial or os.getenv("CRAWL_INITIAL_CONCURRENCY", "8"))
+        self.min_limit = float(min_limit or os.getenv("CRAWL_MIN_CONCURRENCY", "2"))
+        self.max_limit = float(max_limit or os.getenv("CRAWL_MAX_CONCURRENCY", "64"))
+        # 지연이 기준(관측된 최소 지연의 이동 평균)의 몇 배를 넘으면 과부하로 보는지
+        self.latency_tolerance = float(latency_tolerance or os.getenv("CRAWL_LATENCY_TOLERANCE", "3"))
+        self.error_tolerance = float(error_tolerance or os.getenv("CRAWL_ERROR_TOLERANCE", "0.2"))
+        self.backoff_factor = backoff_factor
+        self.error_rate = 0.0
+        self.in_flight = 0
+        self.baseline = None
+        self.last_decrease = 0.0
+        self.stats = {"requests": 0, "errors": 0, "retries": 0, "decreases": 0, "peak_limit": self.limit}
+        self._cond = None
+
+    def _condition(self):
+        if self._cond is None: self._cond = asyncio.Condition()
+        return self._cond
+
+    async def acquire(self):
+        cond = self._condition()
+        async with cond:
+            while self.in_flight >= int(self.limit):
+                await cond.wait()
+            self.in_flight += 1
+
+    async def release(self, outcome, latency):
+        """outcome: "ok", "error"(그 밖의 오류) 또는 "overload"(5xx/429, 타임아웃, 연결 끊김)."""
+        cond = self._condition()
+        async with cond:
+            self.in_flight -= 1
+            self.stats["requests"] += 1
+            self.error_rate += ((outcome != "ok") - self.error_rate) * ERROR_WINDOW
+            if outcome == "ok": self._on_success(latency)
+            else:
+                self.stats["errors"] += 1
+                if outcome == "overload" or self.error_rate > self.error_tolerance: self._decrease()
+            cond.notify_all()
+
+    def _on_success(self, latency):
+        if self.baseline is None or latency < self.baseline:
+            self.baseline = latency
+        else:
+            # 서버 상태 변화에 따라 기준 지연이 천천히 올라갈 수 있게 합니다.
+            self.baseline += (latency - self.baseline) * 0.01
+        if latency > self.baseline * self.latency_tolerance:
+            self._decrease()
+        elif self.in_flight + 1 >= int(self.limit):
+            # 한도까지 쓰고 있을 때만 늘립니다 (한 왕복당 약 +1).
+            self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+            self.stats["peak_limit"] = max(self.stats["peak_limit"], self.limit)
+
+    def _decrease(self):
+        # 동시에 실패한 요청들이 한도를 연달아 깎지 않도록, 감소는 기준 지연 한 번에 한 번만 적용합니다.
+        now = time.monotonic()
+        if now - self.last_decrease < max(self.baseline or 0, 0.05): return
+        self.last_decrease = now
+        self.limit = max(self.min_limit, self.limit * self.backoff_factor)
+        self.stats["decreases"] += 1
+
+    def snapshot(self):
+        return {**self.stats, "limit": round(self.limit, 1), "peak_limit": round(self.stats["peak_limit"], 1)}
+
+async def request_with_retry(client, limiter, method, url, retries=4, base_delay=0.5, max_delay=10.0, rate=None, **kwargs):
+    """제한기를 거쳐 요청을 보내고, 일시적인 오류는 지터를 준 지수 백오프로 재시도합니다.
+    rate(RateLimiter)가 주어지면 재시도를 포함한 모든 요청이 속도 제한을 따릅니다.
+    재시도를 모두 소진하면 마지막 예외를 그대로 올립니다."""
+    for attempt in range(retries + 1):
+        if rate: await rate.acquire()
+        await limiter.acquire()
+        started = time.monotonic(); outcome = "error"
+        try:
+            res = await client.request(method, url, **kwargs)
+            if res.status_code in RETRY_STATUS:
+                outcome = "overload"
+                raise RetryableStatus(res)
+            outcome = "ok"
+            return res
+        except (RetryableStatus, *RETRY_EXCEPTIONS):
+            # 5xx/429, 타임아웃, 연결 끊김은 모두 한도를 줄이는 신호입니다.
+            outcome = "overload"
+            if attempt >= retries: raise
+        finally:
+            await limiter.release(outcome, time.monotonic() - started)
+        limiter.stats["retries"] += 1
+        # full jitter: 0 ~ min(max_delay, base * 2^attempt)
+        await asyncio.sleep(random.uniform(0, min(max_delay, base_delay * 2 ** attempt)))
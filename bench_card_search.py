@@ -0,0 +1,62 @@
+import random
+import sys
+import time
+
+from search_index import CardEventIndex
+
+# 카드 이벤트 검색 색인 벤치마크
+# - 10만 건의 가상 이벤트(한글 제목)를 카드사 8개 샤드로 나누어 색인하고
+# - 질의 유형별 p50/p99 지연을 단순 선형 검색(브라우저 filterEvents 방식)과 비교합니다.
+# 사용법: python bench_card_search.py [이벤트 수]
+
+N_EVENTS = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+ISSUERS = ["shinhan", "kb", "hana", "woori", "bc", "samsung", "hyundai", "lotte"]
+WORDS = ["스타벅스", "편의점", "해외", "캐시백", "쿠폰", "할인", "최대", "포인트", "적립", "이벤트", "여행", "항공",
+         "주유", "온라인", "간편결제", "배달", "영화", "커피", "마트", "백화점", "면세점", "호텔", "무이자", "할부",
+         "신규", "발급", "경품", "추첨", "페이백", "청구할인", "교통", "통신", "넷플릭스", "쿠팡", "다이소", "올리브영"]
+CATEGORIES = ["이벤트", "쇼핑", "여행", "생활", "푸드", "문화", "금융"]
+QUERIES = ["쿠폰", "스타벅스 편의점", '"해외 캐시백"', '"최대 5만원" 주유', "넷플릭스", "무이자할부", "페이"]
+
+def make_events(n):
+    rnd = random.Random(42)
+    events = {issuer: [] for issuer in ISSUERS}
+    for i in range(n):
+        issuer = ISSUERS[i % len(ISSUERS)]
+        title = " ".join(rnd.sample(WORDS, rnd.randint(3, 6))) + f" 최대 {rnd.randint(1, 30)}만원"
+        events[issuer].append({"issuer": issuer, "companyName": issuer, "eventName": title, "category": rnd.choice(CATEGORIES)})
+    return events
+
+def linear_search(all_events, q):
+    # 템플릿 parseQuery/match 와 같은 방식의 전체 스캔
+    from search_index import parse_query
+    phrases, words = parse_query(q)
+    out = []
+    for ev in all_events:
+        txt = f"{ev['eventName']} {ev['category']} {ev['companyName']}".lower()
+        if all(p in txt for p in phrases) and (not words or any(w in txt for w in words)): out.append(ev)
+    return out
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+if __name__ == "__main__":
+    events = make_events(N_EVENTS)
+    index = CardEventIndex()
+    t0 = time.perf_counter()
+    for issuer, evs in events.items(): index.update(issuer, evs)
+    print(f"Indexed {N_EVENTS} events in {time.perf_counter() - t0:.2f}s")
+    t0 = time.perf_counter(); index.update("kb", events["kb"])
+    print(f"Re-indexed one issuer ({len(events['kb'])} events) in {time.perf_counter() - t0:.2f}s")
+
+    flat = [ev for evs in events.values() for ev in evs]
+    print(f"{'query':<22} {'hits':>7} {'index p50':>10} {'index p99':>10} {'scan p50':>10}")
+    for q in QUERIES:
+        samples = []
+        for _ in range(20):
+            t0 = time.perf_counter(); total, _ = index.search(q, limit=20); samples.append((time.perf_counter() - t0) * 1000)
+        scans = []
+        for _ in range(3):
+            t0 = time.perf_counter(); expected = linear_search(flat, q); scans.append((time.perf_counter() - t0) * 1000)
+        assert total == len(expected), (q, total, len(expected))
+        print(f"{q:<22} {total:>7} {percentile(samples, 50):>8.1f}ms {percentile(samples, 99):>8.1f}ms {percentile(scans, 50):>8.1f}ms")
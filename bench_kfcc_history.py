@@ -0,0 +1,61 @@
+import sys
+import tempfile
+import time
+import numpy as np
+import kfcc_history
+from kfcc_crawler import TARGET_PRODUCTS
+
+# KFCC 금리 이력 저장소 벤치마크
+# - 금고 1000곳 x 상품 3개를 1년 동안 매일 수집했다고 보고 이력 파일 전체 크기와 1회 추가 시간을 재고,
+# - 지점 하나의 1년 구간 조회, 전체 지점의 월별 집계 조회 지연을 측정합니다.
+# - 금리는 실제처럼 대부분의 날에 그대로이고 가끔(평균 한 달에 한 번) 0.05%p 단위로 바뀝니다.
+# 사용법: python bench_kfcc_history.py [금고 수] [일수]
+
+N_BANKS = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+N_DAYS = int(sys.argv[2]) if len(sys.argv) > 2 else 365
+QUERIES = 200
+
+def simulate(rng):
+    rates = np.round(rng.uniform(2.0, 3.2, (N_BANKS, len(TARGET_PRODUCTS))), 2)
+    codes = [f"{4000 + i}" for i in range(N_BANKS)]
+    days = np.arange(np.datetime64("2026-01-01"), np.datetime64("2026-01-01") + N_DAYS)
+    append_times = []
+    for day in days:
+        changed = rng.random(rates.shape) < 1 / 30
+        rates = np.round(np.where(changed, rates + rng.choice([-0.05, 0.05], rates.shape), rates), 2)
+        data = {"last_updated": f"{day} 04:00:00",
+                "data": [{"gmgoCd": code, "rates": {p: f"{r:g}" for p, r in zip(TARGET_PRODUCTS, row)}, "기준일": str(day).replace("-", "/")}
+                         for code, row in zip(codes, rates)]}
+        t0 = time.perf_counter()
+        kfcc_history.append_snapshot(data)
+        append_times.append(time.perf_counter() - t0)
+    return codes, days, append_times
+
+def latency(func, n=QUERIES):
+    samples = []
+    for _ in range(n):
+        t0 = time.perf_counter(); func(); samples.append((time.perf_counter() - t0) * 1000)
+    samples.sort()
+    return samples[len(samples) // 2], samples[int(len(samples) * 0.99) - 1]
+
+if __name__ == "__main__":
+    kfcc_history.HISTORY_DIR = tempfile.mkdtemp()
+    rng = np.random.default_rng(1)
+    codes, days, append_times = simulate(rng)
+    rows = N_BANKS * len(TARGET_PRODUCTS) * N_DAYS
+    size = kfcc_history.storage_bytes()
+    print(f"{N_BANKS} banks x {len(TARGET_PRODUCTS)} products x {N_DAYS} days = {rows:,} rates")
+    print(f"storage: {size / 1024 / 1024:.2f} MB ({size / rows:.2f} B per rate), append p50 {sorted(append_times)[len(append_times) // 2] * 1000:.0f} ms, max {max(append_times) * 1000:.0f} ms")
+
+    start, end = int(days[0].astype(np.int64)), int(days[-1].astype(np.int64))
+    cases = [
+        ("one branch, full range, day", lambda: kfcc_history.series(start, end, codes[rng.integers(N_BANKS)])),
+        ("one branch, 30 days, day", lambda: kfcc_history.series(end - 29, end, codes[rng.integers(N_BANKS)])),
+        ("one branch, full range, week", lambda: kfcc_history.series(start, end, codes[rng.integers(N_BANKS)], interval="week")),
+        ("all branches, full range, month", lambda: kfcc_history.series(start, end, interval="month")),
+    ]
+    kfcc_history.series(start, end, codes[0])  # 월 파일을 읽어 둡니다 (이후 조회는 수정 시각만 확인)
+    print(f"{'query':<34} {'p50(ms)':>8} {'p99(ms)':>8}")
+    for name, func in cases:
+        p50, p99 = latency(func, 20 if name.startswith("all") else QUERIES)
+        print(f"{name:<34} {p50:>8.2f} {p99:>8.2f}")
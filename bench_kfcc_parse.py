@@ -0,0 +1,123 @@
+import asyncio
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from bs4 import BeautifulSoup
+import kfcc_crawler
+from kfcc_crawler import parse_html, parse_bank_pages, parse_rate, cleanup_title, TARGET_PRODUCTS
+
+# KFCC 금리 페이지 파싱 벤치마크
+# - kfcc_rate_debug.html(상품 없음)과, 같은 페이지에 MG더뱅킹 상품표 3개를 넣은 페이지로
+#   BeautifulSoup+CSS 선택자(이전 방식)와 lxml XPath(현재 방식)의 초당 파싱 수를 비교하고,
+# - 크롤링 1회 분량(금고 1000곳 x 2페이지)을 이벤트 루프에서 직접 파싱할 때와 풀에서 파싱할 때의
+#   이벤트 루프 최대 지연(= 같은 프로세스의 API 응답 지연)을 측정합니다.
+# 사용법: python bench_kfcc_parse.py [페이지 수]
+
+N_PAGES = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+TICK = 0.005
+
+def parse_html_bs4(html):
+    # 이전 구현 (비교용)
+    soup = BeautifulSoup(html, "lxml")
+    base_date = ""
+    date_elem = soup.select_one(".base-date")
+    if date_elem:
+        m = re.search(r"\d{4}/\d{2}/\d{2}", date_elem.text)
+        if m: base_date = m.group(0)
+    rates = {}
+    for sec in soup.select("#divTmp1"):
+        tit_elem = sec.select_one(".tbl-tit")
+        if not tit_elem: continue
+        title = cleanup_title(tit_elem.text.strip())
+        if title in TARGET_PRODUCTS:
+            for row in sec.select("tbody tr"):
+                cols = row.select("td")
+                if len(cols) >= 2:
+                    period_txt = cols[-2].text.strip()
+                    rate_txt = cols[-1].text.strip()
+                    if "12" in period_txt and "개월" in period_txt:
+                        rate = parse_rate(rate_txt)
+                        if rate:
+                            rates[title] = rate
+                            break
+    return base_date, rates
+
+def product_table(title, rate):
+    rows = "".join(f"<tr><td>{title}</td><td>{m}개월 이상</td><td>{rate + m / 100:.2f}</td></tr>" for m in (1, 3, 6, 12, 24, 36))
+    return f'<div id="divTmp1" name="divTmp1"><p class="tbl-tit"> {title} </p><table><thead><tr><th>상품</th><th>기간</th><th>이율</th></tr></thead><tbody>{rows}</tbody></table></div>'
+
+def load_pages():
+    with open("kfcc_rate_debug.html", "r", encoding="utf-8") as f: empty = f.read()
+    tables = "".join(product_table(t, 3.0 + i * 0.2) for i, t in enumerate(TARGET_PRODUCTS))
+    populated = re.sub(r'<div class="content_nodata">.*?</div>', tables, empty, count=1, flags=re.S)
+    return {"empty": empty, "populated": populated}
+
+def throughput(func, html, n):
+    t0 = time.perf_counter()
+    for _ in range(n): func(html)
+    return n / (time.perf_counter() - t0)
+
+async def loop_lag(parse_many):
+    """parse_many가 도는 동안 TICK 간격 타이머의 최대 지연(ms)."""
+    lags, stop = [], asyncio.Event()
+    async def ticker():
+        while not stop.is_set():
+            t0 = time.perf_counter(); await asyncio.sleep(TICK)
+            lags.append((time.perf_counter() - t0 - TICK) * 1000)
+    task = asyncio.create_task(ticker())
+    t0 = time.perf_counter()
+    await parse_many()
+    elapsed = time.perf_counter() - t0
+    stop.set(); await task
+    lags.sort()
+    return elapsed, lags[len(lags) // 2] if lags else 0, lags[-1] if lags else 0
+
+async def bench_lag(html):
+    jobs = [{"13": html, "14": html}] * (N_PAGES // 2)
+
+    def inline(parse):
+        # 이전 구조: 수집 코루틴 안에서 파싱 (금고 사이에서만 루프에 양보)
+        async def run():
+            for bodies in jobs:
+                for html in bodies.values(): parse(html)
+                await asyncio.sleep(0)
+        return run
+
+    def pooled(pool):
+        async def run():
+            loop = asyncio.get_running_loop()
+            queue = asyncio.Queue(maxsize=kfcc_crawler.PARSE_QUEUE_SIZE)
+            async def producer():
+                for bodies in jobs: await queue.put(bodies)
+                for _ in range(kfcc_crawler.PARSE_WORKERS * 2): await queue.put(None)
+            async def consumer():
+                while (bodies := await queue.get()) is not None:
+                    await loop.run_in_executor(pool, parse_bank_pages, bodies)
+            await asyncio.gather(producer(), *[consumer() for _ in range(kfcc_crawler.PARSE_WORKERS * 2)])
+        return run
+
+    print(f"\n{N_PAGES} pages ({N_PAGES // 2} banks), parse workers: {kfcc_crawler.PARSE_WORKERS}")
+    print(f"{'mode':<16} {'wall(s)':>8} {'lag p50(ms)':>12} {'lag max(ms)':>12}")
+    for name, parse in [("inline bs4", parse_html_bs4), ("inline lxml", parse_html)]:
+        elapsed, p50, worst = await loop_lag(inline(parse))
+        print(f"{name:<16} {elapsed:>8.2f} {p50:>12.1f} {worst:>12.1f}")
+    with ThreadPoolExecutor(max_workers=kfcc_crawler.PARSE_WORKERS) as pool:
+        elapsed, p50, worst = await loop_lag(pooled(pool))
+    print(f"{'thread pool':<16} {elapsed:>8.2f} {p50:>12.1f} {worst:>12.1f}")
+    with ProcessPoolExecutor(max_workers=kfcc_crawler.PARSE_WORKERS) as pool:
+        await asyncio.get_running_loop().run_in_executor(pool, parse_bank_pages, jobs[0])  # 워커 기동
+        elapsed, p50, worst = await loop_lag(pooled(pool))
+    print(f"{'process pool':<16} {elapsed:>8.2f} {p50:>12.1f} {worst:>12.1f}")
+
+if __name__ == "__main__":
+    pages = load_pages()
+    for name, html in pages.items():
+        assert parse_html(html) == parse_html_bs4(html), name
+    print(f"populated page -> {parse_html(pages['populated'])}")
+    print(f"{'page':<10} {'bs4+css/s':>10} {'lxml xpath/s':>13} {'speedup':>8}")
+    for name, html in pages.items():
+        n = max(50, N_PAGES // 10)
+        old, new = throughput(parse_html_bs4, html, n), throughput(parse_html, html, n)
+        print(f"{name:<10} {old:>10.0f} {new:>13.0f} {new / old:>7.1f}x")
+    asyncio.run(bench_lag(pages["populated"]))
@@ -0,0 +1,91 @@
+import os
+import sys
+import time
+import random
+import tempfile
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+import local_currency
+from local_currency import Merchant, nearest_merchants
+from spatial import geohash_encode, haversine_km
+
+# 가맹점 반경 검색 벤치마크 (SQLite 대용, 기본 100만 건)
+# - 수도권에 몰린 분포로 가맹점을 만들고, 이전 방식(위경도 사각형 BETWEEN + limit 500, 단일 컬럼 인덱스만)과
+#   현재 방식((type, geohash) 인덱스 + 하버사인 + 가까운 순 + 커서)의 조회 지연을 비교합니다.
+# - 현재 방식의 결과가 전수 계산한 최근접 목록과 같은지도 확인합니다.
+# 사용법: python bench_merchant_search.py [가맹점 수] [조회 수]
+
+N = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+QUERIES = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+RADIUS_KM = 2.0
+WORDS = ["시장", "식당", "마트", "약국", "카페", "정육점", "반찬", "떡집", "분식", "수산"]
+
+def random_point(rnd):
+    if rnd.random() < 0.6:
+        return 37.2 + rnd.random() * 0.6, 126.7 + rnd.random() * 0.6  # 수도권
+    return 34.5 + rnd.random() * 3.5, 126.3 + rnd.random() * 3.0
+
+def build(path):
+    engine = create_engine(f"sqlite:///{path}")
+    Merchant.metadata.create_all(bind=engine)
+    rnd = random.Random(0)
+    t0 = time.perf_counter()
+    for start in range(0, N, 50_000):
+        rows = []
+        for i in range(start, min(N, start + 50_000)):
+            lat, lon = random_point(rnd)
+            rows.append({"type": "onnuri" if i % 2 else "gg", "source_key": str(i), "name": f"{rnd.choice(WORDS)}{i}",
+                         "address": f"주소 {i}", "lat": lat, "lon": lon, "geohash": geohash_encode(lat, lon)})
+        with engine.begin() as conn:
+            conn.execute(insert(Merchant.__table__), rows)
+    print(f"built {N} merchants in {time.perf_counter() - t0:.1f}s")
+    return engine
+
+def old_query(db, merchant_type, lat, lon, radius):
+    # 이전 구현 (비교용)
+    delta = radius * 0.01
+    return db.query(Merchant).filter(Merchant.type == merchant_type, Merchant.lat.between(lat - delta, lat + delta),
+                                     Merchant.lon.between(lon - delta, lon + delta)).limit(500).all()
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+def timed(func, centers):
+    lat_ms = []
+    for lat, lon in centers:
+        t0 = time.perf_counter(); func(lat, lon); lat_ms.append((time.perf_counter() - t0) * 1000)
+    return percentile(lat_ms, 0.5), percentile(lat_ms, 0.99)
+
+def brute_force(db, merchant_type, lat, lon, radius, limit):
+    delta = radius * 0.02
+    candidates = db.query(Merchant).filter(Merchant.type == merchant_type, Merchant.lat.between(lat - delta, lat + delta),
+                                           Merchant.lon.between(lon - delta, lon + delta)).all()
+    hits = [(haversine_km(lat, lon, m.lat, m.lon), m.id) for m in candidates]
+    return sorted(hit for hit in hits if hit[0] <= radius)[:limit]
+
+if __name__ == "__main__":
+    engine = build(os.path.join(tempfile.mkdtemp(), "merchants.db"))
+    db = sessionmaker(bind=engine)()
+    rnd = random.Random(1)
+    centers = [(37.3 + rnd.random() * 0.4, 126.8 + rnd.random() * 0.4) for _ in range(QUERIES)]
+
+    for lat, lon in centers[:5]:
+        hits, _ = nearest_merchants(db, "onnuri", lat, lon, RADIUS_KM, 50)
+        assert [(d, m.id) for d, m in hits] == brute_force(db, "onnuri", lat, lon, RADIUS_KM, 50)
+        # 커서로 이어 받은 두 페이지가 한 번에 받은 100개와 같아야 합니다.
+        first, _ = nearest_merchants(db, "onnuri", lat, lon, RADIUS_KM, 50)
+        second, _ = nearest_merchants(db, "onnuri", lat, lon, RADIUS_KM, 50, after=(first[-1][0], first[-1][1].id))
+        both, _ = nearest_merchants(db, "onnuri", lat, lon, RADIUS_KM, 100)
+        assert [m.id for _, m in first + second] == [m.id for _, m in both]
+
+    print(f"{'query':<34} {'p50(ms)':>8} {'p99(ms)':>8}")
+    for name, func in [
+        ("old box BETWEEN limit 500", lambda lat, lon: old_query(db, "onnuri", lat, lon, RADIUS_KM)),
+        ("nearest 200 (2km)", lambda lat, lon: nearest_merchants(db, "onnuri", lat, lon, RADIUS_KM, 200)),
+        ("nearest 500 (2km)", lambda lat, lon: nearest_merchants(db, "onnuri", lat, lon, RADIUS_KM, 500)),
+        ("nearest 200 (10km)", lambda lat, lon: nearest_merchants(db, "onnuri", lat, lon, 10.0, 200)),
+        ("nearest 200 + keyword (2km)", lambda lat, lon: nearest_merchants(db, "onnuri", lat, lon, RADIUS_KM, 200, keyword="약국")),
+    ]:
+        p50, p99 = timed(func, centers)
+        print(f"{name:<34} {p50:>8.1f} {p99:>8.1f}")
@@ -0,0 +1,95 @@
+import os
+import sys
+import time
+import random
+import tempfile
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import sessionmaker
+import local_currency
+from local_currency import Merchant, gg_merchant_row, upsert_merchants, remove_stale_merchants
+
+# 가맹점 동기화 적재 벤치마크 (SQLite 대용)
+# - 경기지역화폐 API 응답 형식의 가짜 행을 만들어, 이전 방식(행마다 존재 여부 조회 후 추가)과
+#   현재 방식(페이지 단위 INSERT ... ON CONFLICT DO UPDATE)의 초당 적재 행 수를 비교합니다.
+# - 두 번째 동기화(대부분 갱신 + 일부 신규 + 일부 삭제)에서 upsert와 오래된 행 정리가 맞게 동작하는지도 확인합니다.
+# 사용법: python bench_merchant_sync.py [행 수] [이전 방식 행 수]
+
+ROWS = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+OLD_ROWS = int(sys.argv[2]) if len(sys.argv) > 2 else 20_000
+PAGE = 1000
+
+def gg_items(n, seed=0):
+    rnd = random.Random(seed)
+    return [{
+        "CMPNM_NM": f"가맹점{i}",
+        "REFINE_WGS84_LAT": f"{37.0 + rnd.random():.7f}",
+        "REFINE_WGS84_LOGT": f"{126.5 + rnd.random():.7f}",
+        "REFINE_ROADNM_ADDR": f"경기도 어딘가로 {i}",
+        "INDUTYPE_NM": "음식점",
+        "TELNO": "031-000-0000",
+    } for i in range(n)]
+
+def new_engine():
+    path = os.path.join(tempfile.mkdtemp(), "merchants.db")
+    engine = create_engine(f"sqlite:///{path}")
+    Merchant.metadata.create_all(bind=engine)
+    return engine
+
+def old_sync(engine, items, synced_at):
+    # 이전 구현 (비교용): 행마다 (이름, 위도, 경도)로 조회하고 없으면 추가, 페이지마다 커밋
+    session = sessionmaker(bind=engine)()
+    for i in range(0, len(items), PAGE):
+        for item in items[i:i + PAGE]:
+            name, lat, lon = item["CMPNM_NM"], float(item["REFINE_WGS84_LAT"]), float(item["REFINE_WGS84_LOGT"])
+            existing = session.query(Merchant).filter(Merchant.name == name, Merchant.lat == lat, Merchant.lon == lon).first()
+            if not existing:
+                session.add(Merchant(name=name, type="gg", address=item["REFINE_ROADNM_ADDR"], lat=lat, lon=lon,
+                                     category=item["INDUTYPE_NM"], phone=item["TELNO"], last_updated=synced_at))
+        session.commit()
+    session.close()
+
+def new_sync(engine, items, synced_at):
+    for i in range(0, len(items), PAGE):
+        rows = [row for row in (gg_merchant_row(item, synced_at) for item in items[i:i + PAGE]) if row]
+        upsert_merchants(rows, bind=engine)
+    return remove_stale_merchants("gg", synced_at, bind=engine)
+
+def count(engine, *where):
+    with engine.connect() as conn:
+        return conn.execute(select(func.count()).select_from(Merchant).where(*where)).scalar()
+
+if __name__ == "__main__":
+    items = gg_items(ROWS)
+
+    engine = new_engine()
+    t0 = time.perf_counter()
+    old_sync(engine, items[:OLD_ROWS], "2026-01-01 04:00:00")
+    old_rate = OLD_ROWS / (time.perf_counter() - t0)
+    # 두 번째 실행: 이미 있는 행도 모두 다시 조회
+    t0 = time.perf_counter()
+    old_sync(engine, items[:OLD_ROWS], "2026-01-02 04:00:00")
+    old_rerun = OLD_ROWS / (time.perf_counter() - t0)
+
+    engine = new_engine()
+    t0 = time.perf_counter()
+    new_sync(engine, items, "2026-01-01 04:00:00")
+    new_rate = ROWS / (time.perf_counter() - t0)
+    assert count(engine) == ROWS
+
+    # 두 번째 동기화: 10%가 원본에서 사라지고, 5%가 새로 생기고, 나머지는 그대로 갱신
+    keep = items[ROWS // 10:]
+    for item in keep[:1000]: item["TELNO"] = "031-111-1111"
+    added = gg_items(ROWS // 20, seed=1)
+    for i, item in enumerate(added): item["CMPNM_NM"] = f"신규{i}"
+    t0 = time.perf_counter()
+    removed = new_sync(engine, keep + added, "2026-01-02 04:00:00")
+    rerun_rate = (len(keep) + len(added)) / (time.perf_counter() - t0)
+    assert removed == ROWS // 10, removed
+    assert count(engine) == len(keep) + len(added)
+    assert count(engine, Merchant.phone == "031-111-1111") == 1000
+    assert count(engine, Merchant.last_updated != "2026-01-02 04:00:00") == 0
+
+    print(f"{'mode':<24} {'rows':>8} {'rows/s':>10} {'est. 200k rows':>15}")
+    for name, rows, rate in [("per-row query (first)", OLD_ROWS, old_rate), ("per-row query (rerun)", OLD_ROWS, old_rerun),
+                             ("bulk upsert (first)", ROWS, new_rate), ("bulk upsert (rerun)", len(keep) + len(added), rerun_rate)]:
+        print(f"{name:<24} {rows:>8} {rate:>10.0f} {200_000 / rate:>14.1f}s")
@@ -0,0 +1,95 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+
+# Redis 지연이 API 지연에 미치는 영향 측정용 벤치마크
+# - 지연을 주입한 가짜 Redis(RESP) 서버를 별도 스레드에서 띄우고
+# - 여러 동시 요청으로 /api/*-cards 를 호출하여 p50/p99 지연을 측정합니다.
+# 사용법: python bench_redis_latency.py [지연ms] [라운드수]
+
+DELAY_MS = float(sys.argv[1]) if len(sys.argv) > 1 else 50
+ROUNDS = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+CONCURRENCY_LEVELS = [1, 8, 32, 64]
+ENDPOINTS = ["/api/shinhan-cards", "/api/kb-cards", "/api/hana-cards", "/api/woori-cards",
+             "/api/bc-cards", "/api/samsung-cards", "/api/hyundai-cards", "/api/lotte-cards"]
+
+store = {}
+
+def encode(value):
+    if value is None: return b"$-1\r\n"
+    if isinstance(value, int): return f":{value}\r\n".encode()
+    if isinstance(value, str): value = value.encode()
+    return b"$" + str(len(value)).encode() + b"\r\n" + value + b"\r\n"
+
+async def handle(reader, writer):
+    try:
+        while True:
+            line = await reader.readline()
+            if not line: break
+            argc = int(line[1:].strip())
+            args = []
+            for _ in range(argc):
+                size = int((await reader.readline())[1:].strip())
+                args.append((await reader.readexactly(size + 2))[:-2])
+            cmd = args[0].decode().upper()
+            await asyncio.sleep(DELAY_MS / 1000)
+            if cmd == "GET": writer.write(encode(store.get(args[1])))
+            elif cmd == "MGET": writer.write(f"*{len(args) - 1}\r\n".encode() + b"".join(encode(store.get(k)) for k in args[1:]))
+            elif cmd == "SETEX": store[args[1]] = args[3]; writer.write(b"+OK\r\n")
+            elif cmd == "SET": store[args[1]] = args[2]; writer.write(b"+OK\r\n")
+            elif cmd == "DEL": writer.write(encode(sum(1 for k in args[1:] if store.pop(k, None) is not None)))
+            elif cmd == "PING": writer.write(b"+PONG\r\n")
+            else: writer.write(b"+OK\r\n")
+            await writer.drain()
+    except (asyncio.IncompleteReadError, ConnectionResetError): pass
+    finally: writer.close()
+
+def start_fake_redis():
+    ready = threading.Event(); holder = {}
+    def run():
+        loop = asyncio.new_event_loop(); asyncio.set_event_loop(loop)
+        server = loop.run_until_complete(asyncio.start_server(handle, "127.0.0.1", 0))
+        holder["port"] = server.sockets[0].getsockname()[1]; ready.set()
+        loop.run_forever()
+    threading.Thread(target=run, daemon=True).start()
+    ready.wait()
+    return holder["port"]
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+async def bench():
+    import httpx
+    from main import app
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        # 캐시 워밍업 (파일 -> Redis)
+        for ep in ENDPOINTS: await client.get(ep)
+
+        async def timed(ep):
+            t0 = time.perf_counter()
+            resp = await client.get(ep)
+            assert resp.status_code == 200
+            return (time.perf_counter() - t0) * 1000
+
+        print(f"Injected Redis delay: {DELAY_MS:.0f} ms, rounds: {ROUNDS}")
+        print(f"{'concurrency':>12} {'p50(ms)':>10} {'p99(ms)':>10} {'wall(ms)':>10}")
+        for c in CONCURRENCY_LEVELS:
+            samples = []; t0 = time.perf_counter()
+            for _ in range(ROUNDS):
+                samples += await asyncio.gather(*[timed(ENDPOINTS[i % len(ENDPOINTS)]) for i in range(c)])
+            wall = (time.perf_counter() - t0) * 1000 / ROUNDS
+            print(f"{c:>12} {percentile(samples, 50):>10.1f} {percentile(samples, 99):>10.1f} {wall:>10.1f}")
+
+    from shared import r, rb
+    if r: await r.connection_pool.disconnect()
+    if rb: await rb.connection_pool.disconnect()
+
+if __name__ == "__main__":
+    port = start_fake_redis()
+    os.environ["REDIS_HOST"] = "127.0.0.1"
+    os.environ["REDIS_PORT"] = str(port)
+    asyncio.run(bench())
@@ -0,0 +1,139 @@
+import os
+import asyncio
+from urllib.parse import urlsplit
+from contextlib import asynccontextmanager
+from datetime import datetime
+from shared import seoul_tz
+
+# Playwright 크롤러가 공유하는 Chromium 풀
+# - 크롤러마다 Chromium을 띄우고 닫는 대신, 하나의 브라우저에서 컨텍스트만 새로 만듭니다.
+# - 동시에 열 수 있는 컨텍스트 수는 PLAYWRIGHT_MAX_CONTEXTS로 제한합니다.
+# - 사용 중인 크롤러(또는 browser_session)가 없으면 브라우저를 닫아 메모리를 돌려줍니다.
+
+MAX_CONTEXTS = int(os.getenv("PLAYWRIGHT_MAX_CONTEXTS", "2"))
+BROWSER_ARGS = ['--no-sandbox', '--disable-setuid-sandbox', '--disable-dev-shm-usage', '--disable-gpu']
+MOBILE_UA = "Mozilla/5.0 (iPhone; CPU iPhone OS 16_6 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/16.6 Mobile/15E148 Safari/604.1"
+
+# 리소스 차단 정책: 크롤러는 DOM 또는 JSON XHR만 필요하므로 이미지/폰트/미디어와 추적 스크립트는 내려받지 않습니다.
+# 이미지를 막아도 <img>의 src 속성은 DOM에 그대로 남아 있으므로 img.src 추출에는 영향이 없습니다.
+BLOCKED_RESOURCE_TYPES = {"image", "font", "media", "imageset", "texttrack", "beacon", "ping", "csp_report"}
+# 타사(third-party) 요청 중에서도 페이지 동작에 필요한 유형은 허용합니다.
+THIRD_PARTY_ALLOWED_TYPES = {"document", "script", "xhr", "fetch", "stylesheet"}
+TRACKER_HOSTS = (
+    "google-analytics.com", "googletagmanager.com", "doubleclick.net", "googlesyndication.com", "googleadservices.com",
+    "facebook.net", "facebook.com", "analytics.naver.com", "wcs.naver.net", "pixel.kakao.com", "t1.daumcdn.net",
+    "criteo.com", "criteo.net", "adobedtm.com", "omtrdc.net", "hotjar.com", "clarity.ms", "appsflyer.com", "mixpanel.com",
+)
+KR_SECOND_LEVEL = {"co.kr", "or.kr", "go.kr", "ne.kr", "re.kr", "ac.kr"}
+
+def site_of(host):
+    """등록 도메인(eTLD+1) 근사값. m.hanacard.co.kr -> hanacard.co.kr"""
+    labels = (host or "").lower().split(".")
+    if len(labels) >= 3 and ".".join(labels[-2:]) in KR_SECOND_LEVEL: return ".".join(labels[-3:])
+    return ".".join(labels[-2:])
+
+def should_block(resource_type, host, first_party):
+    if resource_type in BLOCKED_RESOURCE_TYPES: return True
+    host = (host or "").lower()
+    if any(host == t or host.endswith("." + t) for t in TRACKER_HOSTS): return True
+    return bool(first_party) and site_of(host) != first_party and resource_type not in THIRD_PARTY_ALLOWED_TYPES
+
+async def apply_resource_policy(ctx, stats):
+    """컨텍스트의 모든 요청에 차단 정책을 적용합니다. 첫 문서 요청의 도메인을 1st-party로 간주합니다."""
+    async def handle(route):
+        request = route.request
+        host = urlsplit(request.url).hostname
+        if request.resource_type == "document" and not stats["site"]:
+            stats["site"] = site_of(host)
+        if should_block(request.resource_type, host, stats["site"]):
+            stats["blocked"] += 1
+            await route.abort()
+        else:
+            stats["allowed"] += 1
+            await route.continue_()
+    await ctx.route("**/*", handle)
+
+_pool = {"playwright": None, "browser": None, "users": 0, "holds": 0, "lock": None, "slots": None}
+
+def _lock():
+    if _pool["lock"] is None: _pool["lock"] = asyncio.Lock()
+    return _pool["lock"]
+
+def _slots():
+    if _pool["slots"] is None: _pool["slots"] = asyncio.Semaphore(MAX_CONTEXTS)
+    return _pool["slots"]
+
+async def _acquire_browser():
+    async with _lock():
+        browser = _pool["browser"]
+        if browser is None or not browser.is_connected():
+            from playwright.async_api import async_playwright
+            if _pool["playwright"] is None:
+                _pool["playwright"] = await async_playwright().start()
+            try:
+                browser = _pool["browser"] = await _pool["playwright"].chromium.launch(headless=True, args=BROWSER_ARGS)
+            except Exception:
+                if _pool["users"] == 0:
+                    await _pool["playwright"].stop()
+                    _pool["playwright"] = None
+                raise
+            print(f"[{datetime.now(seoul_tz)}] Browser pool - Chromium launched (max contexts: {MAX_CONTEXTS})")
+        _pool["users"] += 1
+        return browser
+
+async def _close_if_idle():
+    if _pool["users"] > 0 or _pool["holds"] > 0: return
+    browser, playwright = _pool["browser"], _pool["playwright"]
+    if browser is None and playwright is None: return
+    _pool["browser"] = _pool["playwright"] = None
+    try:
+        if browser: await browser.close()
+    finally:
+        if playwright: await playwright.stop()
+    print(f"[{datetime.now(seoul_tz)}] Browser pool - Chromium closed")
+
+async def _release_browser():
+    async with _lock():
+        _pool["users"] -= 1
+        await _close_if_idle()
+
+@asynccontextmanager
+async def browser_session():
+    """블록이 끝날 때까지 Chromium을 유지합니다. 일괄 크롤링 동안 브라우저를 한 번만 띄우는 데 사용합니다.
+    브라우저는 첫 new_page 호출 때 띄우므로, 직접 경로만으로 끝나는 크롤링에서는 Chromium을 띄우지 않습니다."""
+    _pool["holds"] += 1
+    try:
+        yield
+    finally:
+        _pool["holds"] -= 1
+        async with _lock():
+            await _close_if_idle()
+
+@asynccontextmanager
+async def new_page(user_agent=MOBILE_UA, block_resources=True):
+    """공유 Chromium에서 새 컨텍스트와 페이지를 엽니다. 컨텍스트 수가 한도에 도달하면 대기합니다.
+    block_resources가 참이면 이미지/폰트/미디어/추적 요청을 차단합니다."""
+    async with _slots():
+        browser = await _acquire_browser()
+        try:
+            ctx = await browser.new_context(user_agent=user_agent)
+            stats = {"site": None, "blocked": 0, "allowed": 0}
+            try:
+                if block_resources: await apply_resource_policy(ctx, stats)
+                yield await ctx.new_page()
+            finally:
+                await ctx.close()
+                if block_resources:
+                    print(f"[{datetime.now(seoul_tz)}] Browser pool - {stats['site']}: {stats['allowed']} requests allowed, {stats['blocked']} blocked")
+        finally:
+            await _release_browser()
+
+def browser_rss_mb():
+    """Chromium 자식 프로세스를 포함한 현재 프로세스 트리의 RSS(MB)."""
+    import psutil
+    process = psutil.Process(os.getpid())
+    total = process.memory_info().rss
+    for child in process.children(recursive=True):
+        try: total += child.memory_info().rss
+        except psutil.Error: pass
+    return total / 1024 / 1024
@@ -0,0 +1,116 @@
+import os
+import re
+import json
+import hashlib
+import unicodedata
+from shared import data_path
+from change_log import read_json, write_atomic, last_seq, append_entry, entries_since
+
+# 카드사 이벤트 변경 피드 (카드사별 Diff feed)
+# - 이벤트마다 안정적인 ID를 붙입니다: 카드사 + 상세 링크(같은 수집 결과 안에서 그 이벤트만 쓰는 http(s) 링크)의 해시,
+#   목록 페이지 링크를 모든 이벤트가 같이 쓰거나 javascript: 링크인 카드사는 카드사 + 정규화한 제목의 해시입니다.
+# - 크롤링 결과를 게시할 때 직전 스냅샷(CHANGES_DIR/<카드사>.snapshot.json, ID -> 내용 해시 + 이벤트)과 비교하여
+#   신규/종료/변경 이벤트를 카드사별 로그(CHANGES_DIR/<카드사>.ndjson)에 일련번호(seq)와 함께 추가합니다.
+# - 게시하는 데이터에는 그 시점의 seq(change_seq)를 함께 저장하므로, 통합 응답의 cursor("kb:3,bc:5")는 응답 데이터와 정확히 맞습니다.
+#   클라이언트는 /api/card-events/changes?since=<cursor>로 그 뒤의 변경만 받아 로컬 사본에 적용합니다.
+# - 직전 스냅샷이 없으면(첫 게시, 배포 전 데이터) 전체 목록을 "replace" 항목으로 기록합니다.
+#   배포 전 데이터를 받아 둔 클라이언트(cursor 0)도 이 항목으로 그 카드사의 사본을 통째로 바꿉니다.
+CHANGES_DIR = os.getenv("CARD_CHANGES_DIR", data_path("card_changes"))
+CHANGES_KEEP = int(os.getenv("CARD_CHANGES_KEEP", "100"))
+CONTENT_FIELDS = ("category", "eventName", "period", "link", "image")
+
+def snapshot_path(issuer):
+    return os.path.join(CHANGES_DIR, f"{issuer}.snapshot.json")
+
+def log_path(issuer):
+    return os.path.join(CHANGES_DIR, f"{issuer}.ndjson")
+
+def short_hash(text):
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=8).hexdigest()
+
+def normalize_title(title):
+    """공백/전각 문자/대소문자 차이를 없앤 제목."""
+    return " ".join(unicodedata.normalize("NFKC", title or "").split()).lower()
+
+def assign_ids(issuer, events):
+    """이벤트마다 "id"를 붙인 새 목록을 반환합니다 (events는 제목 기준으로 중복이 제거되어 있어야 합니다)."""
+    links = {}
+    for ev in events:
+        link = ev.get("link") or ""
+        links[link] = links.get(link, 0) + 1
+    result = []
+    for ev in events:
+        link = ev.get("link") or ""
+        key = link if re.match(r"https?://", link) and links[link] == 1 else f"title:{normalize_title(ev.get('eventName'))}"
+        result.append({**ev, "id": short_hash(f"{issuer}|{key}")})
+    return result
+
+def content_hash(ev):
+    return short_hash(json.dumps([ev.get(f) for f in CONTENT_FIELDS], ensure_ascii=False))
+
+def current_seq(issuer):
+    snapshot = read_json(snapshot_path(issuer))
+    return snapshot.get("seq", 0) if snapshot else 0
+
+def event_count(issuer):
+    """직전 스냅샷의 이벤트 수 (스냅샷이 없으면 0)."""
+    snapshot = read_json(snapshot_path(issuer))
+    return len(snapshot.get("events") or {}) if snapshot else 0
+
+def diff_events(issuer, events, last_updated):
+    """직전 스냅샷과 비교하여 (로그 항목 또는 None, 새 스냅샷)을 반환합니다. 기록은 commit_changes()에서 합니다.
+    첫 실행(직전 스냅샷 없음)은 전체 목록을 added로 담은 replace 항목입니다."""
+    prev = read_json(snapshot_path(issuer))
+    curr = {ev["id"]: {"h": content_hash(ev), "event": ev} for ev in events}
+    seq = max(prev.get("seq", 0) if prev else 0, last_seq(log_path(issuer)))
+    entry = None
+    if not prev or prev.get("events") is None:
+        seq += 1
+        entry = {"seq": seq, "issuer": issuer, "last_updated": last_updated, "previous": None, "replace": True,
+                 "added": events, "removed": [], "changed": []}
+    else:
+        old_events = prev["events"]
+        added, changed = [], []
+        for event_id, item in curr.items():
+            old = old_events.get(event_id)
+            if old is None:
+                added.append(item["event"])
+            elif old["h"] != item["h"]:
+                before = {f: old["event"].get(f) for f in CONTENT_FIELDS if old["event"].get(f) != item["event"].get(f)}
+                changed.append({**item["event"], "before": before})
+        removed = [old["event"] for event_id, old in old_events.items() if event_id not in curr]
+        if added or removed or changed:
+            seq += 1
+            entry = {"seq": seq, "issuer": issuer, "last_updated": last_updated, "previous": prev.get("last_updated"),
+                     "added": added, "removed": removed, "changed": changed}
+    return entry, {"seq": seq, "last_updated": last_updated, "events": curr}
+
+def commit_changes(issuer, entry, snapshot):
+    os.makedirs(CHANGES_DIR, exist_ok=True)
+    if entry: append_entry(log_path(issuer), entry, CHANGES_KEEP)
+    write_atomic(snapshot_path(issuer), json.dumps(snapshot, ensure_ascii=False))
+
+def encode_cursor(seqs):
+    return ",".join(f"{issuer}:{seq}" for issuer, seq in seqs.items())
+
+def decode_cursor(cursor):
+    """"kb:3,bc:5" -> {"kb": 3, "bc": 5}. 형식이 잘못되면 ValueError."""
+    seqs = {}
+    for part in (cursor or "").split(","):
+        if not part.strip(): continue
+        issuer, sep, seq = part.strip().partition(":")
+        if not sep or not seq.isdigit(): raise ValueError(f"invalid cursor part: {part}")
+        seqs[issuer.lower()] = int(seq)
+    return seqs
+
+def changes_since(seqs, limit):
+    """카드사별 since 이후의 변경. 카드사마다 limit개까지 돌려주며, 항목은 게시 시각 순으로 합칩니다."""
+    changes, cursors, reset, more = [], {}, [], False
+    for issuer, since in seqs.items():
+        entries, cursor, issuer_reset, issuer_more = entries_since(log_path(issuer), since, limit)
+        changes.extend(entries)
+        cursors[issuer] = cursor
+        more = more or issuer_more
+        if issuer_reset: reset.append(issuer)
+    changes.sort(key=lambda e: (e.get("last_updated") or "", e["issuer"], e["seq"]))
+    return {"cursor": encode_cursor(cursors), "reset": reset, "more": more, "changes": changes}
@@ -1,5 +1,5 @@
 import httpx
-from fastapi import APIRouter, HTTPException, BackgroundTasks
+from fastapi import APIRouter, HTTPException, Request
 from fastapi.responses import HTMLResponse
 import os
 import json
@@ -7,7 +7,16 @@ import ssl
 from datetime import datetime
 from bs4 import BeautifulSoup
 import re
-from shared import r, seoul_tz, CACHE_EXPIRE, get_cached_data
+import time
+import math
+from urllib.parse import urljoin
+import asyncio
+from collections import OrderedDict
+from search_index import CardEventIndex
+from browser_pool import new_page, MOBILE_UA
+import jobs
+import card_changes
+from shared import r, seoul_tz, CACHE_EXPIRE, cached_response, publish_cached_data, template_response, load_cached_entry, build_entry, compress_body, entry_response, data_path
 
 router = APIRouter()
 
@@ -22,20 +31,99 @@ SAMSUNG_CACHE_KEY = "samsung_card_events_cache_v1"
 HYUNDAI_CACHE_KEY = "hyundai_card_events_cache_v1"
 LOTTE_CACHE_KEY = "lotte_card_events_cache_v1"
 
-def render_template(filename: str):
-    path = os.path.join("templates", filename)
-    try:
-        with open(path, "r", encoding="utf-8") as f:
-            return f.read()
-    except FileNotFoundError:
-        return f"Template {filename} not found"
+# 카드사 레지스트리 (통합 API에서 사용하는 순서)
+CARD_ISSUERS = {
+    "shinhan": {"name": "신한카드", "cache_key": SHINHAN_CACHE_KEY, "file": "shinhan_data.json"},
+    "kb": {"name": "KB국민카드", "cache_key": KB_CACHE_KEY, "file": "kb_data.json"},
+    "hana": {"name": "하나카드", "cache_key": HANA_CACHE_KEY, "file": "hana_data.json"},
+    "woori": {"name": "우리카드", "cache_key": WOORI_CACHE_KEY, "file": "woori_data.json"},
+    "bc": {"name": "BC카드", "cache_key": BC_CACHE_KEY, "file": "bc_data.json"},
+    "samsung": {"name": "삼성카드", "cache_key": SAMSUNG_CACHE_KEY, "file": "samsung_data.json"},
+    "hyundai": {"name": "현대카드", "cache_key": HYUNDAI_CACHE_KEY, "file": "hyundai_data.json"},
+    "lotte": {"name": "롯데카드", "cache_key": LOTTE_CACHE_KEY, "file": "lotte_data.json"},
+}
+EVENT_FIELDS = ("id", "issuer", "companyName", "category", "eventName", "period", "link", "image", "bgColor")
+
+def issuer_data_path(issuer):
+    return data_path(CARD_ISSUERS[issuer]["file"])
+
+async def save_card_events(issuer, all_events):
+    """크롤링 결과를 저장하고 통합 스냅샷에서 해당 카드사 부분만 다시 만듭니다.
+    직전 결과와 비교한 변경(신규/종료/변경 이벤트)은 게시한 뒤 카드사별 변경 로그에 추가합니다."""
+    data = {"last_updated":datetime.now(seoul_tz).strftime('%Y-%m-%d %H:%M:%S'), "data":all_events}
+    entry, snapshot = await asyncio.to_thread(card_changes.diff_events, issuer, build_issuer_part(issuer, data), data["last_updated"])
+    data["change_seq"] = snapshot["seq"]
+    await publish_cached_data(CARD_ISSUERS[issuer]["cache_key"], issuer_data_path(issuer), data)
+    await asyncio.to_thread(card_changes.commit_changes, issuer, entry, snapshot)
+    if entry: print(f"[{datetime.now(seoul_tz)}] {issuer} changes #{entry['seq']}: {len(entry['added'])} added, {len(entry['removed'])} removed, {len(entry['changed'])} changed.")
+    await refresh_card_snapshot([issuer])
+
+# --- 통합 스냅샷 ---
+# 카드사별 부분(parts)을 원본 캐시 엔트리의 ETag로 추적하여, 바뀐 카드사만 다시 만들고 합칩니다.
+# 다른 프로세스의 크롤링 결과도 L1 만료 후 Redis에서 새 ETag로 올라오면 같은 방식으로 반영됩니다.
+SNAPSHOT_MAX_RESPONSES = 32
+_snapshot = {"etags": {}, "parts": {}, "updated": {}, "seqs": {}, "version": None, "responses": OrderedDict()}
+# 통합 검색용 역색인 (카드사 부분이 바뀔 때 해당 카드사만 다시 색인)
+card_index = CardEventIndex()
+
+def build_issuer_part(issuer, data):
+    name = CARD_ISSUERS[issuer]["name"]; part = []; seen = set()
+    for ev in data.get("data", []):
+        title = ev.get("eventName")
+        if not title or title in seen: continue
+        seen.add(title)
+        part.append({"issuer": issuer, "companyName": name, **ev})
+    return card_changes.assign_ids(issuer, part)
+
+async def refresh_card_snapshot(issuers=None):
+    changed = False
+    for issuer in (issuers or CARD_ISSUERS):
+        entry = await load_cached_entry(CARD_ISSUERS[issuer]["cache_key"], issuer_data_path(issuer))
+        etag = entry["etag"] if entry else None
+        if issuer in _snapshot["parts"] and _snapshot["etags"].get(issuer) == etag: continue
+        data = entry["data"] if entry else {}
+        _snapshot["etags"][issuer] = etag
+        _snapshot["parts"][issuer] = build_issuer_part(issuer, data)
+        card_index.update(issuer, _snapshot["parts"][issuer])
+        _snapshot["updated"][issuer] = data.get("last_updated")
+        _snapshot["seqs"][issuer] = data.get("change_seq", 0)
+        changed = True
+    if changed:
+        _snapshot["version"] = "|".join(str(_snapshot["etags"].get(i)) for i in CARD_ISSUERS)
+        _snapshot["responses"].clear()
+    return changed
+
+async def card_events_entry(issuers, fields):
+    """(카드사, 필드) 조합별 응답 엔트리. 스냅샷 버전이 바뀔 때까지 직렬화/압축 결과를 재사용합니다."""
+    key = (issuers, fields)
+    entry = _snapshot["responses"].get(key)
+    if entry: return entry
+    events = []
+    for issuer in issuers:
+        part = _snapshot["parts"].get(issuer, [])
+        events.extend([{f: ev[f] for f in fields if f in ev} for ev in part] if fields else part)
+    updated = {i: _snapshot["updated"].get(i) for i in issuers}
+    # cursor는 이 응답에 반영된 카드사별 변경 로그 위치입니다 (/api/card-events/changes?since=).
+    cursor = card_changes.encode_cursor({i: _snapshot["seqs"].get(i, 0) for i in issuers})
+    data = {"last_updated": max((u for u in updated.values() if u), default=None), "issuers": updated, "cursor": cursor, "data": events}
+    body = json.dumps(data).encode("utf-8")
+    # 전체 조회는 크롤링 직후 한 번만 만들어지므로 최대 압축, 부분 조회는 빠른 압축을 사용합니다.
+    variants = await asyncio.to_thread(compress_body, body, 11 if not fields and len(issuers) == len(CARD_ISSUERS) else 5)
+    entry = build_entry(data, body, variants)
+    _snapshot["responses"][key] = entry
+    while len(_snapshot["responses"]) > SNAPSHOT_MAX_RESPONSES:
+        _snapshot["responses"].popitem(last=False)
+    return entry
+
+def parse_csv(value):
+    return [v.strip().lower() for v in (value or "").split(",") if v.strip()]
 
 # --- API Endpoints ---
 @router.get("/api/shinhan-myshop")
 async def get_shinhan_myshop():
     try:
         if r:
-            cached = r.get(SHINHAN_MYSHOP_CACHE_KEY)
+            cached = await r.get(SHINHAN_MYSHOP_CACHE_KEY)
             if cached: return json.loads(cached)
         api_url = "https://www.shinhancard.com/mob/MOBFM501N/MOBFM501R21.ajax"
         base_url = "https://www.shinhancard.com"
@@ -65,70 +153,270 @@ async def get_shinhan_myshop():
                         if len(end) == 8: end = f"~ {end[:4]}.{end[4:6]}.{end[6:]}"
                         all_coupons.append({"category": "마이샵 쿠폰", "eventName": full_name, "period": end, "link": link, "image": img, "bgColor": "#ffffff"})
                     res = {"data": all_coupons}
-                    if r: r.setex(SHINHAN_MYSHOP_CACHE_KEY, CACHE_EXPIRE, json.dumps(res))
+                    if r: await r.setex(SHINHAN_MYSHOP_CACHE_KEY, CACHE_EXPIRE, json.dumps(res))
                     return res
         return {"data": []}
     except Exception as e: print(f"Shinhan MyShop API Error: {e}"); return {"data": []}
 
 @router.get("/api/shinhan-cards")
-async def get_shinhan_cards(): return get_cached_data(SHINHAN_CACHE_KEY, os.path.join(os.getcwd(), 'shinhan_data.json'))
+async def get_shinhan_cards(request: Request): return await cached_response(request, SHINHAN_CACHE_KEY, issuer_data_path("shinhan"))
 @router.get("/api/shinhan-myshop")
-async def get_shinhan_myshop(): return get_cached_data(SHINHAN_MYSHOP_CACHE_KEY, os.path.join(os.getcwd(), 'shinhan_myshop_data.json'))
+async def get_shinhan_myshop(request: Request): return await cached_response(request, SHINHAN_MYSHOP_CACHE_KEY, data_path('shinhan_myshop_data.json'))
 @router.get("/api/kb-cards")
-async def get_kb_cards(): return get_cached_data(KB_CACHE_KEY, os.path.join(os.getcwd(), 'kb_data.json'))
+async def get_kb_cards(request: Request): return await cached_response(request, KB_CACHE_KEY, issuer_data_path("kb"))
 @router.get("/api/hana-cards")
-async def get_hana_cards(): return get_cached_data(HANA_CACHE_KEY, os.path.join(os.getcwd(), 'hana_data.json'))
+async def get_hana_cards(request: Request): return await cached_response(request, HANA_CACHE_KEY, issuer_data_path("hana"))
 @router.get("/api/woori-cards")
-async def get_woori_cards(): return get_cached_data(WOORI_CACHE_KEY, os.path.join(os.getcwd(), 'woori_data.json'))
+async def get_woori_cards(request: Request): return await cached_response(request, WOORI_CACHE_KEY, issuer_data_path("woori"))
 @router.get("/api/bc-cards")
-async def get_bc_cards(): return get_cached_data(BC_CACHE_KEY, os.path.join(os.getcwd(), 'bc_data.json'))
+async def get_bc_cards(request: Request): return await cached_response(request, BC_CACHE_KEY, issuer_data_path("bc"))
 @router.get("/api/samsung-cards")
-async def get_samsung_cards(): return get_cached_data(SAMSUNG_CACHE_KEY, os.path.join(os.getcwd(), 'samsung_data.json'))
+async def get_samsung_cards(request: Request): return await cached_response(request, SAMSUNG_CACHE_KEY, issuer_data_path("samsung"))
 @router.get("/api/hyundai-cards")
-async def get_hyundai_cards(): return get_cached_data(HYUNDAI_CACHE_KEY, os.path.join(os.getcwd(), "hyundai_data.json"))
+async def get_hyundai_cards(request: Request): return await cached_response(request, HYUNDAI_CACHE_KEY, issuer_data_path("hyundai"))
 @router.get("/api/lotte-cards")
-async def get_lotte_cards(): return get_cached_data(LOTTE_CACHE_KEY, os.path.join(os.getcwd(), "lotte_data.json"))
+async def get_lotte_cards(request: Request): return await cached_response(request, LOTTE_CACHE_KEY, issuer_data_path("lotte"))
+
+@router.get("/api/card-events")
+async def get_card_events(request: Request, issuers: str = "", fields: str = ""):
+    """모든 카드사 이벤트를 하나의 응답으로 제공합니다. issuers=kb,bc / fields=eventName,link 로 범위를 줄일 수 있습니다."""
+    issuer_keys = tuple(parse_csv(issuers)) or tuple(CARD_ISSUERS)
+    unknown = [i for i in issuer_keys if i not in CARD_ISSUERS]
+    if unknown: raise HTTPException(status_code=404, detail=f"Card '{unknown[0]}' not found")
+    field_map = {f.lower(): f for f in EVENT_FIELDS}
+    field_keys = tuple(field_map[f] for f in parse_csv(fields) if f in field_map)
+    await refresh_card_snapshot()
+    return entry_response(request, await card_events_entry(issuer_keys, field_keys))
+
+@router.get("/api/card-events/changes")
+async def get_card_event_changes(since: str = "", issuers: str = "", limit: int = 20):
+    """since(통합 응답의 cursor, 예: "kb:3,bc:5") 이후 추가/종료/변경된 이벤트만 돌려줍니다.
+    since가 없으면 issuers(기본: 전체)의 현재 cursor만 돌려줍니다. reset에 있는 카드사는 전체 데이터를 다시 받아야 합니다."""
+    try:
+        seqs = card_changes.decode_cursor(since)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    issuer_keys = parse_csv(issuers) or list(seqs) or list(CARD_ISSUERS)
+    unknown = [i for i in [*issuer_keys, *seqs] if i not in CARD_ISSUERS]
+    if unknown: raise HTTPException(status_code=404, detail=f"Card '{unknown[0]}' not found")
+    limit = min(max(limit, 1), 100)
+    if not since:
+        current = await asyncio.to_thread(lambda: {i: card_changes.current_seq(i) for i in issuer_keys})
+        return {"cursor": card_changes.encode_cursor(current), "reset": [], "more": False, "changes": []}
+    # cursor에 없는 카드사는 처음부터(0) 받습니다.
+    return await asyncio.to_thread(card_changes.changes_since, {i: seqs.get(i, 0) for i in issuer_keys}, limit)
+
+@router.get("/api/card-events/search")
+async def search_card_events(q: str = "", issuers: str = "", page: int = 1, size: int = 20):
+    """서버 측 통합 검색. "따옴표 구문"은 모두 포함, 나머지 단어는 하나 이상 포함(템플릿 parseQuery와 동일)."""
+    issuer_keys = set(parse_csv(issuers))
+    unknown = [i for i in issuer_keys if i not in CARD_ISSUERS]
+    if unknown: raise HTTPException(status_code=404, detail=f"Card '{unknown[0]}' not found")
+    page = max(page, 1); size = min(max(size, 1), 100)
+    await refresh_card_snapshot()
+    total, events = card_index.search(q, issuer_keys or None, (page - 1) * size, size)
+    return {"query": q, "total": total, "page": page, "size": size, "data": events}
 
 # --- 통합 업데이트 API (이름 기반) ---
 @router.post("/api/card-update/{card_name}")
-async def unified_card_update(card_name: str, bg_tasks: BackgroundTasks):
-    crawlers = {
-        "shinhan": crawl_shinhan_bg,
-        "kb": crawl_kb_bg,
-        "hana": crawl_hana_bg,
-        "woori": crawl_woori_bg,
-        "bc": crawl_bc_bg,
-        "samsung": crawl_samsung_bg,
-        "hyundai": crawl_hyundai_bg,
-        "lotte": crawl_lotte_bg
-    }
-    
+async def unified_card_update(card_name: str):
+    # 크롤링은 크롤러 워커가 실행합니다. 같은 카드사 작업(또는 일괄 크롤링)이 대기/실행 중이거나 방금 끝났으면 그 작업을 돌려줍니다.
     card_name = card_name.lower().strip().replace("-cards", "").replace("-card", "")
-    if card_name in crawlers:
-        print(f"[{datetime.now(seoul_tz)}] Manual update STARTED for: {card_name}")
-        bg_tasks.add_task(crawlers[card_name])
-        return {"status": "started", "card": card_name, "message": "Background task initiated."}
+    if card_name in CARD_ISSUERS:
+        job, created = await jobs.enqueue(f"card:{card_name}")
+        print(f"[{datetime.now(seoul_tz)}] Manual update {'QUEUED' if created else 'ATTACHED to ' + job['name']} for: {card_name} ({job['id']}, {job['status']})")
+        return jobs.job_response(job, created, card=card_name)
     
     print(f"[{datetime.now(seoul_tz)}] Manual update FAILED: Card '{card_name}' not found")
     raise HTTPException(status_code=404, detail=f"Card '{card_name}' not found")
 
 # 구버전 호환성을 위한 개별 엔드포인트 유지
 @router.post("/api/shinhan/update")
-async def update_shinhan(bg_tasks: BackgroundTasks): return await unified_card_update("shinhan", bg_tasks)
+async def update_shinhan(): return await unified_card_update("shinhan")
 @router.post("/api/kb/update")
-async def update_kb(bg_tasks: BackgroundTasks): return await unified_card_update("kb", bg_tasks)
+async def update_kb(): return await unified_card_update("kb")
 @router.post("/api/hana/update")
-async def update_hana(bg_tasks: BackgroundTasks): return await unified_card_update("hana", bg_tasks)
+async def update_hana(): return await unified_card_update("hana")
 @router.post("/api/woori/update")
-async def update_woori(bg_tasks: BackgroundTasks): return await unified_card_update("woori", bg_tasks)
+async def update_woori(): return await unified_card_update("woori")
 @router.post("/api/bc/update")
-async def update_bc(bg_tasks: BackgroundTasks): return await unified_card_update("bc", bg_tasks)
+async def update_bc(): return await unified_card_update("bc")
 @router.post("/api/samsung/update")
-async def update_samsung(bg_tasks: BackgroundTasks): return await unified_card_update("samsung", bg_tasks)
+async def update_samsung(): return await unified_card_update("samsung")
 @router.post("/api/hyundai/update")
-async def update_hyundai(bg_tasks: BackgroundTasks): return await unified_card_update("hyundai", bg_tasks)
+async def update_hyundai(): return await unified_card_update("hyundai")
 @router.post("/api/lotte/update")
-async def update_lotte(bg_tasks: BackgroundTasks): return await unified_card_update("lotte", bg_tasks)
+async def update_lotte(): return await unified_card_update("lotte")
+
+# --- Playwright 페이지 준비 조건 ---
+# 고정 대기(wait_for_timeout) 대신, 이벤트 목록이 DOM에 나타나는 즉시 추출을 시작합니다.
+# 제한 시간 안에 조건이 충족되지 않으면 networkidle을 짧게 기다린 뒤 그대로 진행합니다.
+DATED_LIST_ITEM_JS = """() => Array.from(document.querySelectorAll('li')).some(li =>
+    li.querySelector('img') && /\\d{4}\\.\\s*\\d{1,2}\\.\\s*\\d{1,2}\\s*~/.test(li.innerText))"""
+PAGE_READY = {
+    "KB": {"selector": '.event-list__item, .list_type2 li, .event_list li, a[href^="javascript:goDetail"]', "timeout": 15000},
+    "Samsung": {"selector": 'li a[onclick*="GoDtlBrws"]', "timeout": 15000},
+    "Hyundai": {"function": DATED_LIST_ITEM_JS, "timeout": 15000},
+    "Lotte": {"function": DATED_LIST_ITEM_JS, "timeout": 15000},
+}
+READY_FALLBACK_TIMEOUT = 5000
+
+async def wait_until_ready(page, site):
+    rule = PAGE_READY[site]; started = time.monotonic()
+    try:
+        if "selector" in rule:
+            await page.wait_for_selector(rule["selector"], state="attached", timeout=rule["timeout"])
+        else:
+            await page.wait_for_function(rule["function"], timeout=rule["timeout"])
+        how = "ready"
+    except Exception:
+        try:
+            await page.wait_for_load_state("networkidle", timeout=READY_FALLBACK_TIMEOUT)
+            how = "networkidle fallback"
+        except Exception:
+            how = "fallback timeout"
+    print(f"[{datetime.now(seoul_tz)}] {site} - page {how} after {time.monotonic() - started:.1f}s")
+
+# --- 브라우저 없는 직접 경로 (Direct path) ---
+# Playwright 기반 카드사도 먼저 httpx로 JSON API 또는 서버 렌더링 HTML을 받아 파싱합니다.
+# 결과가 검증을 통과하지 못할 때만 Playwright(공유 Chromium)로 대체합니다.
+WOORI_BASE_URL = "https://m.wooricard.com"
+WOORI_LIST_URL = f"{WOORI_BASE_URL}/dcmw/yh1/bnf/bnf02/prgevnt/M1BNF202S00.do"
+WOORI_API_URL = f"{WOORI_BASE_URL}/dcmw/yh1/bnf/bnf02/prgevnt/getPrgEvntList.pwkjson"
+KB_EVENT_URL = "https://m.kbcard.com/BON/DVIEW/MBBV0002"
+SAMSUNG_EVENT_URL = "https://m.samsungcard.com/personal/event/ing/UHPPBE1401M0.jsp"
+HYUNDAI_EVENT_URL = "https://www.hyundaicard.com/cpb/ev/CPBEV0101_01.hc"
+LOTTE_EVENT_URL = "https://m.lottecard.co.kr/app/LPBNFDA_V100.lc"
+DIRECT_TIMEOUT = 20.0
+# 직접 경로 결과의 최소 개수: 카드사별 하한과 직전 게시 개수의 DIRECT_MIN_RATIO 중 큰 값.
+# 페이지 일부만 파싱된 결과가 Playwright 대체를 건너뛰고 전체 목록을 덮어쓰지 않게 합니다.
+MIN_DIRECT_EVENTS = {"kb": 5, "woori": 5, "samsung": 5, "hyundai": 5, "lotte": 5}
+DIRECT_MIN_RATIO = 0.5
+DATE_RANGE_RE = re.compile(r"\d{4}\.\s*\d{1,2}\.\s*\d{1,2}\s*~\s*\d{4}\.\s*\d{1,2}\.\s*\d{1,2}")
+
+def clean_text(text):
+    return " ".join((text or "").split())
+
+def direct_min_events(issuer, previous_count):
+    return max(MIN_DIRECT_EVENTS.get(issuer, 1), math.ceil(previous_count * DIRECT_MIN_RATIO))
+
+def valid_events(events, min_count=1):
+    return len(events) >= max(min_count, 1) and all(ev.get("eventName") and ev.get("period") for ev in events)
+
+def parse_woori_events(data, base_url=WOORI_BASE_URL):
+    """getPrgEvntList.pwkjson 응답을 이벤트 목록으로 변환합니다."""
+    all_events = []
+    for ev in data.get('prgEvntList', []):
+        title = (ev.get('cardEvntNm') or ev.get('mblDocTitlTxt') or "").strip(); s, e = ev.get('evntSdt',''), ev.get('evntEdt','')
+        if not title: continue
+        if len(s)==8: s=f"{s[:4]}.{s[4:6]}.{s[6:]}"
+        if len(e)==8: e=f"{e[:4]}.{e[4:6]}.{e[6:]}"
+        img = f"{base_url}{ev.get('fileCoursWeb')}" if ev.get('fileCoursWeb') and not ev.get('fileCoursWeb').startswith('http') else ev.get('fileCoursWeb')
+        link = f"https://pc.wooricard.com/dcpc/yh1/bnf/bnf02/prgevnt/H1BNF202S01.do?evntSrno={ev.get('evntSrno')}" if ev.get('evntSrno') else base_url
+        all_events.append({"category":"우리카드", "eventName":title, "period":f"{s} ~ {e}", "link":link, "image":img, "bgColor":"#007bc3"})
+    return all_events
+
+def parse_dated_list_items(html, base_url):
+    """이미지와 'YYYY.MM.DD ~ YYYY.MM.DD' 기간을 가진 <li>를 추출합니다 (브라우저 경로도 렌더링된 HTML에 이 함수를 씁니다)."""
+    soup = BeautifulSoup(html, "lxml"); items = []
+    for li in soup.select("li"):
+        img = li.select_one("img")
+        if not img or li.select_one("li"): continue
+        text = clean_text(li.get_text(" "))
+        m = DATE_RANGE_RE.search(text)
+        if not m: continue
+        title_el = li.select_one(".tit, .txt_title, .title, dt, strong")
+        title = clean_text(title_el.get_text(" ")) if title_el else text.replace(m.group(0), "").strip()[:100]
+        a = li.select_one("a"); href = (a.get("href") or "") if a else ""
+        items.append({
+            "title": title, "period": clean_text(m.group(0)),
+            "image": urljoin(base_url, img.get("src") or ""),
+            "link": urljoin(base_url, href) if href and not href.startswith("javascript") else "",
+            "onclick": (a.get("onclick") or "") if a else "",
+        })
+    return items
+
+def parse_samsung_events(html, base_url=SAMSUNG_EVENT_URL):
+    all_events = []
+    for ev in parse_dated_list_items(html, base_url):
+        m = re.search(r"GoDtlBrws\(['\"](\d+)['\"]", ev["onclick"])
+        if not m: continue
+        all_events.append({"category":"삼성카드", "eventName":ev['title'], "period":ev['period'], "link":f"https://www.samsungcard.com/personal/event/ing/UHPPBE1403M0.jsp?cms_id={m.group(1)}", "image":ev['image'], "bgColor":"#0056b3"})
+    return all_events
+
+def parse_hyundai_events(html, base_url=HYUNDAI_EVENT_URL):
+    return [{"category":"현대카드", "eventName":ev['title'], "period":ev['period'], "link":ev['link'] or HYUNDAI_EVENT_URL, "image":ev['image'], "bgColor":"#000000"}
+            for ev in parse_dated_list_items(html, base_url)]
+
+def parse_lotte_events(html, base_url=LOTTE_EVENT_URL):
+    return [{"category":"롯데카드", "eventName":ev['title'], "period":ev['period'], "link":ev['link'] or LOTTE_EVENT_URL, "image":ev['image'], "bgColor":"#ed1c24"}
+            for ev in parse_dated_list_items(html, base_url)]
+
+def parse_kb_events(html, base_url=KB_EVENT_URL):
+    """KB 이벤트 목록 HTML 파싱 (Playwright 추출 스크립트와 같은 선택자)."""
+    soup = BeautifulSoup(html, "lxml"); all_events = []; seen = set()
+    for el in soup.select('.event-list__item, li.event-list__item, a[href^="javascript:goDetail"], .list_type2 li, .event_list li'):
+        li = el.find_parent("li") if el.name != "li" else el
+        li = li or el
+        title_el = li.select_one('.tit, dt, strong, .event-list__title, h2, h3, p')
+        period_el = li.select_one('.date, .period, dd, .event-list__date, .time')
+        img = li.select_one('img'); a = li.select_one('a')
+        title = title_el.get_text(strip=True) if title_el else ""
+        if len(title) <= 2 or title in seen: continue
+        seen.add(title)
+        href = (a.get("href") or "") if a else ""
+        all_events.append({
+            "category": "KB국민카드",
+            "eventName": title,
+            "period": period_el.get_text(strip=True) if period_el else "",
+            "link": href if href.startswith("javascript") else urljoin(base_url, href) if href else "",
+            "image": urljoin(base_url, img.get("src") or "") if img else "",
+            "bgColor": "#ffffff"
+        })
+    return all_events
+
+async def fetch_html(url):
+    async with httpx.AsyncClient(timeout=DIRECT_TIMEOUT, follow_redirects=True, verify=False) as client:
+        res = await client.get(url, headers={"User-Agent": MOBILE_UA, "Accept": "text/html,application/xhtml+xml,*/*;q=0.8"})
+        res.raise_for_status()
+        return res.text
+
+async def fetch_woori_events_direct():
+    """우리카드 이벤트 목록 API를 직접 호출합니다 (페이지 단위)."""
+    all_events = []
+    headers = {"User-Agent": MOBILE_UA, "Content-Type": "application/json", "X-Requested-With": "XMLHttpRequest", "Referer": WOORI_LIST_URL}
+    async with httpx.AsyncClient(timeout=DIRECT_TIMEOUT, follow_redirects=True) as client:
+        # 세션 쿠키 확보를 위해 목록 페이지를 먼저 엽니다.
+        await client.get(WOORI_LIST_URL, headers={"User-Agent": MOBILE_UA})
+        for page_idx in range(1, 21):
+            payload = {"bnf02PrgEvntVo": {"evntCtgrNo": "", "searchKwrd": "", "sortOrd": "orderNew", "pageIndex": str(page_idx), "pageSize": "20", "evntItgCfcd": ""}}
+            res = await client.post(WOORI_API_URL, json=payload, headers=headers)
+            if res.status_code != 200: break
+            data = res.json(); events = data.get("prgEvntList", [])
+            if not events: break
+            all_events.extend(parse_woori_events(data))
+            if page_idx >= int(events[0].get("totalPageCount") or 1): break
+    return all_events
+
+async def fetch_kb_events_direct(): return parse_kb_events(await fetch_html(KB_EVENT_URL))
+async def fetch_samsung_events_direct(): return parse_samsung_events(await fetch_html(SAMSUNG_EVENT_URL))
+async def fetch_hyundai_events_direct(): return parse_hyundai_events(await fetch_html(HYUNDAI_EVENT_URL))
+async def fetch_lotte_events_direct(): return parse_lotte_events(await fetch_html(LOTTE_EVENT_URL))
+
+async def fetch_events_with_fallback(issuer, name, direct, browser):
+    """직접 경로를 먼저 시도하고, 결과가 검증을 통과하지 못하면 Playwright로 대체합니다."""
+    started = time.monotonic()
+    min_count = direct_min_events(issuer, await asyncio.to_thread(card_changes.event_count, issuer))
+    try:
+        events = await direct()
+    except Exception as e:
+        print(f"{name} direct path error: {e}")
+        events = []
+    if valid_events(events, min_count):
+        print(f"[{datetime.now(seoul_tz)}] {name} - direct path: {len(events)} events in {time.monotonic() - started:.1f}s (browser skipped)")
+        return events
+    print(f"[{datetime.now(seoul_tz)}] {name} - direct path failed validation ({len(events)} events, need {min_count}), falling back to Playwright")
+    return await browser()
 
 # --- Crawl Background Tasks ---
 async def crawl_shinhan_bg():
@@ -152,14 +440,14 @@ async def crawl_shinhan_bg():
                         all_events.append({"category":ev.get('hpgEvtKindNm','이벤트'), "eventName":title, "period":f"{s} ~ {e}", "link":link, "image":img, "bgColor":"#ffffff"})
                 except: continue
         if all_events:
-            data = {"last_updated":datetime.now(seoul_tz).strftime('%Y-%m-%d %H:%M:%S'), "data":all_events}
-            file_path = os.path.join(os.getcwd(), "shinhan_data.json")
-            with open(file_path,"w",encoding="utf-8") as f: json.dump(data,f,ensure_ascii=False)
-            if r: r.setex(SHINHAN_CACHE_KEY, CACHE_EXPIRE, json.dumps(data))
+            await save_card_events("shinhan", all_events)
             print(f"[{datetime.now(seoul_tz)}] Shinhan crawl finished: {len(all_events)} events saved.")
         else:
             print(f"[{datetime.now(seoul_tz)}] Shinhan crawl finished: No events found.")
-    except Exception as e: print(f"Shinhan crawl error: {e}")
+            raise RuntimeError("Shinhan crawl found no events")
+    except Exception as e:
+        print(f"Shinhan crawl error: {e}")
+        raise
 
 async def crawl_hana_bg():
     try:
@@ -195,116 +483,110 @@ async def crawl_hana_bg():
                     print(f"Hana crawl page {page} error: {e}")
                     break
         if all_events:
-            data = {"last_updated":datetime.now(seoul_tz).strftime('%Y-%m-%d %H:%M:%S'), "data":all_events}
-            file_path = os.path.join(os.getcwd(), "hana_data.json")
-            with open(file_path,"w",encoding="utf-8") as f: json.dump(data,f,ensure_ascii=False)
-            if r: r.setex(HANA_CACHE_KEY, CACHE_EXPIRE, json.dumps(data))
+            await save_card_events("hana", all_events)
             print(f"[{datetime.now(seoul_tz)}] Hana crawl finished: {len(all_events)} events saved.")
-    except Exception as e: print(f"Hana crawl error: {e}")
+        else:
+            print(f"[{datetime.now(seoul_tz)}] Hana crawl finished: No events found.")
+            raise RuntimeError("Hana crawl found no events")
+    except Exception as e:
+        print(f"Hana crawl error: {e}")
+        raise
 
-async def crawl_kb_bg():
-    try:
-        print(f"[{datetime.now(seoul_tz)}] Starting KB background crawl (Playwright)...")
-        from playwright.async_api import async_playwright
-        all_events = []; seen = set()
-        async with async_playwright() as p:
-            browser = await p.chromium.launch(
-                headless=True,
-                args=['--no-sandbox', '--disable-setuid-sandbox', '--disable-dev-shm-usage', '--disable-gpu']
-            )
-            ctx = await browser.new_context(user_agent="Mozilla/5.0 (iPhone; CPU iPhone OS 16_6 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/16.6 Mobile/15E148 Safari/604.1")
-            page = await ctx.new_page()
+async def fetch_kb_events_browser():
+    all_events = []; seen = set()
+    async with new_page() as page:
+        try:
+            # KB Card event list page - FIXED URL
+            print(f"[{datetime.now(seoul_tz)}] KB - Navigating to CORRECT list page: https://m.kbcard.com/BON/DVIEW/MBBV0002")
             try:
-                # KB Card event list page - FIXED URL
-                print(f"[{datetime.now(seoul_tz)}] KB - Navigating to CORRECT list page: https://m.kbcard.com/BON/DVIEW/MBBV0002")
-                try:
-                    await page.goto("https://m.kbcard.com/BON/DVIEW/MBBV0002", timeout=60000, wait_until="load")
-                except Exception as e:
-                    print(f"KB goto error: {e}")
-                
-                await page.wait_for_timeout(10000)
-                
-                # Check for popups (Common on KB site)
-                try:
-                    await page.click('button:has-text("확인"), .btn_confirm, #pop_confirm', timeout=3000)
-                    print(f"[{datetime.now(seoul_tz)}] KB - Popup/Confirm clicked.")
-                except: pass
-
-                # Extracting with refined selectors for the MBBV0002 page
-                res = await page.evaluate('''() => {
-                    const items = document.querySelectorAll('.event-list__item, li.event-list__item, a[href^="javascript:goDetail"], .list_type2 li, .event_list li');
-                    return Array.from(items).map(el => {
-                        let li = el.closest('li') || el;
-                        const titleEl = li.querySelector('.tit, dt, strong, .event-list__title, h2, h3, p');
-                        const periodEl = li.querySelector('.date, .period, dd, .event-list__date, .time');
-                        const imgEl = li.querySelector('img');
-                        const linkEl = li.querySelector('a');
-                        if(!titleEl || titleEl.innerText.length < 2) return null;
-                        return {
-                            title: titleEl.innerText.trim(),
-                            period: periodEl ? periodEl.innerText.trim() : "",
-                            image: imgEl ? imgEl.src : "",
-                            link: linkEl ? linkEl.href : ""
-                        };
-                    }).filter(x => x && x.title && x.title.length > 2);
-                }''')
-                
-                print(f"[{datetime.now(seoul_tz)}] KB - Extracted {len(res)} candidate events.")
-                
-                for ev in res:
-                    if ev['title'] in seen: continue
-                    seen.add(ev['title'])
-                    all_events.append({
-                        "category": "KB국민카드",
-                        "eventName": ev['title'],
-                        "period": ev['period'],
-                        "link": ev['link'],
-                        "image": ev['image'],
-                        "bgColor": "#ffffff"
-                    })
-            except Exception as e: print(f"KB PW error: {e}")
-            finally: await browser.close()
+                await page.goto("https://m.kbcard.com/BON/DVIEW/MBBV0002", timeout=60000, wait_until="load")
+            except Exception as e:
+                print(f"KB goto error: {e}")
             
+            await wait_until_ready(page, "KB")
+            
+            # Check for popups (Common on KB site)
+            try:
+                await page.click('button:has-text("확인"), .btn_confirm, #pop_confirm', timeout=3000)
+                print(f"[{datetime.now(seoul_tz)}] KB - Popup/Confirm clicked.")
+            except: pass
+
+            # Extracting with refined selectors for the MBBV0002 page
+            res = await page.evaluate('''() => {
+                const items = document.querySelectorAll('.event-list__item, li.event-list__item, a[href^="javascript:goDetail"], .list_type2 li, .event_list li');
+                return Array.from(items).map(el => {
+                    let li = el.closest('li') || el;
+                    const titleEl = li.querySelector('.tit, dt, strong, .event-list__title, h2, h3, p');
+                    const periodEl = li.querySelector('.date, .period, dd, .event-list__date, .time');
+                    const imgEl = li.querySelector('img');
+                    const linkEl = li.querySelector('a');
+                    if(!titleEl || titleEl.innerText.length < 2) return null;
+                    return {
+                        title: titleEl.innerText.trim(),
+                        period: periodEl ? periodEl.innerText.trim() : "",
+                        image: imgEl ? imgEl.src : "",
+                        link: linkEl ? linkEl.href : ""
+                    };
+                }).filter(x => x && x.title && x.title.length > 2);
+            }''')
+            
+            print(f"[{datetime.now(seoul_tz)}] KB - Extracted {len(res)} candidate events.")
+            
+            for ev in res:
+                if ev['title'] in seen: continue
+                seen.add(ev['title'])
+                all_events.append({
+                    "category": "KB국민카드",
+                    "eventName": ev['title'],
+                    "period": ev['period'],
+                    "link": ev['link'],
+                    "image": ev['image'],
+                    "bgColor": "#ffffff"
+                })
+        except Exception as e: print(f"KB PW error: {e}")
+    return all_events
+
+async def crawl_kb_bg():
+    try:
+        print(f"[{datetime.now(seoul_tz)}] Starting KB background crawl...")
+        started = time.monotonic()
+        all_events = await fetch_events_with_fallback("kb", "KB", fetch_kb_events_direct, fetch_kb_events_browser)
         if all_events:
-            data = {"last_updated":datetime.now(seoul_tz).strftime('%Y-%m-%d %H:%M:%S'), "data":all_events}
-            file_path = os.path.join(os.getcwd(), "kb_data.json")
-            with open(file_path,"w",encoding="utf-8") as f: json.dump(data,f,ensure_ascii=False)
-            if r: r.setex(KB_CACHE_KEY, CACHE_EXPIRE, json.dumps(data))
-            print(f"[{datetime.now(seoul_tz)}] KB crawl finished: {len(all_events)} events saved.")
-    except Exception as e: print(f"KB crawl error: {e}")
+            await save_card_events("kb", all_events)
+            print(f"[{datetime.now(seoul_tz)}] KB crawl finished in {time.monotonic() - started:.1f}s: {len(all_events)} events saved.")
+        else:
+            print(f"[{datetime.now(seoul_tz)}] KB crawl finished in {time.monotonic() - started:.1f}s: No events found.")
+            raise RuntimeError("KB crawl found no events")
+    except Exception as e:
+        print(f"KB crawl error: {e}")
+        raise
+
+async def fetch_woori_events_browser():
+    all_events = []; base_url = WOORI_BASE_URL
+    async with new_page(user_agent="Mozilla/5.0") as page:
+        try:
+            # Use expect_response context manager for Woori Card
+            async with page.expect_response(lambda r: "getPrgEvntList.pwkjson" in r.url, timeout=30000) as resp_info:
+                await page.goto(f"{base_url}/dcmw/yh1/bnf/bnf02/prgevnt/M1BNF202S00.do", timeout=60000)
+            res = await resp_info.value
+            all_events.extend(parse_woori_events(await res.json()))
+        except Exception as e: print(f"Woori PW error: {e}")
+    return all_events
 
 async def crawl_woori_bg():
     try:
         print(f"[{datetime.now(seoul_tz)}] Starting Woori background crawl...")
-        from playwright.async_api import async_playwright
-        all_events = []; base_url = "https://m.wooricard.com"
-        async with async_playwright() as p:
-            browser = await p.chromium.launch(headless=True)
-            ctx = await browser.new_context(user_agent="Mozilla/5.0"); page = await ctx.new_page()
-            try:
-                # Use expect_response context manager for Woori Card
-                async with page.expect_response(lambda r: "getPrgEvntList.pwkjson" in r.url, timeout=30000) as resp_info:
-                    await page.goto(f"{base_url}/dcmw/yh1/bnf/bnf02/prgevnt/M1BNF202S00.do", timeout=60000)
-                res = await resp_info.value
-                data = await res.json(); events = data.get('prgEvntList', [])
-                for ev in events:
-                    title = (ev.get('cardEvntNm') or ev.get('mblDocTitlTxt')).strip(); s, e = ev.get('evntSdt',''), ev.get('evntEdt','')
-                    if len(s)==8: s=f"{s[:4]}.{s[4:6]}.{s[6:]}"
-                    if len(e)==8: e=f"{e[:4]}.{e[4:6]}.{e[6:]}"
-                    img = f"{base_url}{ev.get('fileCoursWeb')}" if ev.get('fileCoursWeb') and not ev.get('fileCoursWeb').startswith('http') else ev.get('fileCoursWeb')
-                    link = f"https://pc.wooricard.com/dcpc/yh1/bnf/bnf02/prgevnt/H1BNF202S01.do?evntSrno={ev.get('evntSrno')}" if ev.get('evntSrno') else base_url
-                    all_events.append({"category":"우리카드", "eventName":title, "period":f"{s} ~ {e}", "link":link, "image":img, "bgColor":"#007bc3"})
-            except Exception as e: print(f"Woori PW error: {e}")
-            finally: await browser.close()
+        started = time.monotonic()
+        all_events = await fetch_events_with_fallback("woori", "Woori", fetch_woori_events_direct, fetch_woori_events_browser)
         if all_events:
-            data = {"last_updated":datetime.now(seoul_tz).strftime('%Y-%m-%d %H:%M:%S'), "data":all_events}
-            file_path = os.path.join(os.getcwd(), "woori_data.json")
-            with open(file_path,"w",encoding="utf-8") as f: json.dump(data,f,ensure_ascii=False)
-            if r: r.setex(WOORI_CACHE_KEY, CACHE_EXPIRE, json.dumps(data))
-            print(f"[{datetime.now(seoul_tz)}] Woori crawl finished: {len(all_events)} events saved.")
+            await save_card_events("woori", all_events)
+            print(f"[{datetime.now(seoul_tz)}] Woori crawl finished in {time.monotonic() - started:.1f}s: {len(all_events)} events saved.")
         else:
-            print(f"[{datetime.now(seoul_tz)}] Woori crawl finished: No events found.")
-    except Exception as e: print(f"Woori crawl error: {e}")
+            print(f"[{datetime.now(seoul_tz)}] Woori crawl finished in {time.monotonic() - started:.1f}s: No events found.")
+            raise RuntimeError("Woori crawl found no events")
+    except Exception as e:
+        print(f"Woori crawl error: {e}")
+        raise
 
 async def crawl_bc_bg():
     try:
@@ -324,147 +606,111 @@ async def crawl_bc_bg():
                         all_events.append({"category":"BC카드", "eventName":title, "period":f"{s} ~ {e}", "link":f"{base_url}/web/evnt/evnt-dts?pybcUnifEvntNo={ev.get('pybcUnifEvntNo')}", "image":ev.get("evntBsImgUrlAddr"), "bgColor":ev.get("evntBsBgColrVal","#ffffff")})
                 except: break
         if all_events:
-            data = {"last_updated":datetime.now(seoul_tz).strftime('%Y-%m-%d %H:%M:%S'), "data":all_events}
-            file_path = os.path.join(os.getcwd(), "bc_data.json")
-            with open(file_path,"w",encoding="utf-8") as f: json.dump(data,f,ensure_ascii=False)
-            if r: r.setex(BC_CACHE_KEY, CACHE_EXPIRE, json.dumps(data))
+            await save_card_events("bc", all_events)
             print(f"[{datetime.now(seoul_tz)}] BC crawl finished: {len(all_events)} events saved.")
         else:
             print(f"[{datetime.now(seoul_tz)}] BC crawl finished: No events found.")
-    except Exception as e: print(f"BC crawl error: {e}")
+            raise RuntimeError("BC crawl found no events")
+    except Exception as e:
+        print(f"BC crawl error: {e}")
+        raise
+
+async def fetch_samsung_events_browser():
+    all_events = []
+    async with new_page() as page:
+        try:
+            await page.goto("https://m.samsungcard.com/personal/event/ing/UHPPBE1401M0.jsp", timeout=90000, wait_until="domcontentloaded")
+            await wait_until_ready(page, "Samsung")
+            # 렌더링된 HTML을 직접 경로와 같은 파서로 추출하여, 경로가 바뀌어도 제목/기간/링크가 같게 나오게 합니다.
+            all_events = parse_samsung_events(await page.content(), page.url)
+        except Exception as e: print(f"Samsung PW error: {e}")
+    return all_events
 
 async def crawl_samsung_bg():
     try:
         print(f"[{datetime.now(seoul_tz)}] Starting Samsung background crawl...")
-        from playwright.async_api import async_playwright
-        all_events = []
-        async with async_playwright() as p:
-            browser = await p.chromium.launch(
-                headless=True,
-                args=['--no-sandbox', '--disable-setuid-sandbox', '--disable-dev-shm-usage', '--disable-gpu']
-            )
-            ctx = await browser.new_context(user_agent="Mozilla/5.0 (iPhone; CPU iPhone OS 16_6 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/16.6 Mobile/15E148 Safari/604.1")
-            page = await ctx.new_page()
-            try:
-                await page.goto("https://m.samsungcard.com/personal/event/ing/UHPPBE1401M0.jsp", timeout=90000, wait_until="domcontentloaded")
-                await page.wait_for_timeout(10000)
-                res = await page.evaluate('''() => {
-                    return Array.from(document.querySelectorAll('li')).map(li => {
-                        const img = li.querySelector('img'), a = li.querySelector('a');
-                        if(!img || !a) return null;
-                        const text = li.innerText.replace(/\\n/g,' ').trim();
-                        const dm = text.match(/(\\d{4}\\.\\d{2}\\.\\d{2})\\s*~\\s*(\\d{4}\\.\\d{2}\\.\\d{2})/);
-                        const idm = (a.getAttribute('onclick')||"").match(/GoDtlBrws\\(['"](\\d+)['"]/);
-                        if(dm && idm) return {title:text.replace(dm[0],'').substring(0,100).trim(), period:dm[0], image:img.src, id:idm[1]};
-                        return null;
-                    }).filter(x=>x);
-                }''')
-                for ev in res:
-                    all_events.append({"category":"삼성카드", "eventName":ev['title'], "period":ev['period'], "link":f"https://www.samsungcard.com/personal/event/ing/UHPPBE1403M0.jsp?cms_id={ev['id']}", "image":ev['image'], "bgColor":"#0056b3"})
-            except Exception as e: print(f"Samsung PW error: {e}")
-            finally: await browser.close()
+        started = time.monotonic()
+        all_events = await fetch_events_with_fallback("samsung", "Samsung", fetch_samsung_events_direct, fetch_samsung_events_browser)
         if all_events:
-            data = {"last_updated":datetime.now(seoul_tz).strftime('%Y-%m-%d %H:%M:%S'), "data":all_events}
-            file_path = os.path.join(os.getcwd(), "samsung_data.json")
-            with open(file_path,"w",encoding="utf-8") as f: json.dump(data,f,ensure_ascii=False)
-            if r: r.setex(SAMSUNG_CACHE_KEY, CACHE_EXPIRE, json.dumps(data))
-            print(f"[{datetime.now(seoul_tz)}] Samsung crawl finished: {len(all_events)} events saved.")
+            await save_card_events("samsung", all_events)
+            print(f"[{datetime.now(seoul_tz)}] Samsung crawl finished in {time.monotonic() - started:.1f}s: {len(all_events)} events saved.")
         else:
-            print(f"[{datetime.now(seoul_tz)}] Samsung crawl finished: No events found.")
-    except Exception as e: print(f"Samsung crawl error: {e}")
+            print(f"[{datetime.now(seoul_tz)}] Samsung crawl finished in {time.monotonic() - started:.1f}s: No events found.")
+            raise RuntimeError("Samsung crawl found no events")
+    except Exception as e:
+        print(f"Samsung crawl error: {e}")
+        raise
+
+async def fetch_hyundai_events_browser():
+    all_events = []
+    async with new_page() as page:
+        try:
+            await page.goto("https://www.hyundaicard.com/cpb/ev/CPBEV0101_01.hc", timeout=90000, wait_until="domcontentloaded")
+            await wait_until_ready(page, "Hyundai")
+            # 렌더링된 HTML을 직접 경로와 같은 파서로 추출하여, 경로가 바뀌어도 제목/기간/링크가 같게 나오게 합니다.
+            all_events = parse_hyundai_events(await page.content(), page.url)
+        except Exception as e: print(f"Hyundai PW error: {e}")
+    return all_events
 
 async def crawl_hyundai_bg():
     try:
         print(f"[{datetime.now(seoul_tz)}] Starting Hyundai background crawl...")
-        from playwright.async_api import async_playwright
-        all_events = []
-        async with async_playwright() as p:
-            browser = await p.chromium.launch(
-                headless=True,
-                args=['--no-sandbox', '--disable-setuid-sandbox', '--disable-dev-shm-usage', '--disable-gpu']
-            )
-            ctx = await browser.new_context(user_agent="Mozilla/5.0 (iPhone; CPU iPhone OS 16_6 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/16.6 Mobile/15E148 Safari/604.1")
-            page = await ctx.new_page()
-            try:
-                await page.goto("https://www.hyundaicard.com/cpb/ev/CPBEV0101_01.hc", timeout=90000, wait_until="domcontentloaded")
-                await page.wait_for_timeout(10000)
-                res = await page.evaluate('''() => {
-                    return Array.from(document.querySelectorAll('li')).map(li => {
-                        const img = li.querySelector('img'), a = li.querySelector('a');
-                        if(!img) return null;
-                        const text = li.innerText.replace(/\\n/g,' ').trim();
-                        const dm = text.match(/(\\d{4}\\.\\s*\\d{1,2}\\.\\s*\\d{1,2})\\s*~\\s*(\\d{4}\\.\\s*\\d{1,2}\\.\\s*\\d{1,2})/);
-                        if(dm) return {title:text.replace(dm[0],'').substring(0,100).trim(), period:dm[0], image:img.src, link:a?a.href:""};
-                        return null;
-                    }).filter(x=>x);
-                }''')
-                for ev in res:
-                    all_events.append({"category":"현대카드", "eventName":ev['title'], "period":ev['period'], "link":ev['link'] if ev['link'] and "javascript" not in ev['link'] else "https://www.hyundaicard.com/cpb/ev/CPBEV0101_01.hc", "image":ev['image'], "bgColor":"#000000"})
-            except Exception as e: print(f"Hyundai PW error: {e}")
-            finally: await browser.close()
+        started = time.monotonic()
+        all_events = await fetch_events_with_fallback("hyundai", "Hyundai", fetch_hyundai_events_direct, fetch_hyundai_events_browser)
         if all_events:
-            data = {"last_updated":datetime.now(seoul_tz).strftime('%Y-%m-%d %H:%M:%S'), "data":all_events}
-            file_path = os.path.join(os.getcwd(), "hyundai_data.json")
-            with open(file_path,"w",encoding="utf-8") as f: json.dump(data,f,ensure_ascii=False)
-            if r: r.setex(HYUNDAI_CACHE_KEY, CACHE_EXPIRE, json.dumps(data))
-            print(f"[{datetime.now(seoul_tz)}] Hyundai crawl finished: {len(all_events)} events saved.")
-    except Exception as e: print(f"Hyundai crawl error: {e}")
+            await save_card_events("hyundai", all_events)
+            print(f"[{datetime.now(seoul_tz)}] Hyundai crawl finished in {time.monotonic() - started:.1f}s: {len(all_events)} events saved.")
+        else:
+            print(f"[{datetime.now(seoul_tz)}] Hyundai crawl finished in {time.monotonic() - started:.1f}s: No events found.")
+            raise RuntimeError("Hyundai crawl found no events")
+    except Exception as e:
+        print(f"Hyundai crawl error: {e}")
+        raise
+
+async def fetch_lotte_events_browser():
+    all_events = []
+    async with new_page() as page:
+        try:
+            await page.goto("https://m.lottecard.co.kr/app/LPBNFDA_V100.lc", timeout=90000, wait_until="domcontentloaded")
+            await wait_until_ready(page, "Lotte")
+            # 렌더링된 HTML을 직접 경로와 같은 파서로 추출하여, 경로가 바뀌어도 제목/기간/링크가 같게 나오게 합니다.
+            all_events = parse_lotte_events(await page.content(), page.url)
+        except Exception as e: print(f"Lotte PW error: {e}")
+    return all_events
 
 async def crawl_lotte_bg():
     try:
         print(f"[{datetime.now(seoul_tz)}] Starting Lotte background crawl...")
-        from playwright.async_api import async_playwright
-        all_events = []
-        async with async_playwright() as p:
-            browser = await p.chromium.launch(
-                headless=True,
-                args=['--no-sandbox', '--disable-setuid-sandbox', '--disable-dev-shm-usage', '--disable-gpu']
-            )
-            ctx = await browser.new_context(user_agent="Mozilla/5.0 (iPhone; CPU iPhone OS 16_6 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/16.6 Mobile/15E148 Safari/604.1")
-            page = await ctx.new_page()
-            try:
-                await page.goto("https://m.lottecard.co.kr/app/LPBNFDA_V100.lc", timeout=90000, wait_until="domcontentloaded")
-                await page.wait_for_timeout(10000)
-                res = await page.evaluate('''() => {
-                    return Array.from(document.querySelectorAll('li')).map(li => {
-                        const img = li.querySelector('img'), a = li.querySelector('a');
-                        if(!img) return null;
-                        const text = li.innerText.replace(/\\n/g,' ').trim();
-                        const dm = text.match(/(\\d{4}\\.\\d{2}\\.\\d{2})\\s*~\\s*(\\d{4}\\.\\d{2}\\.\\d{2})/);
-                        if(dm) return {title:text.replace(dm[0],'').substring(0,100).trim(), period:dm[0], image:img.src, link:a?a.href:""};
-                        return null;
-                    }).filter(x=>x);
-                }''')
-                for ev in res:
-                    all_events.append({"category":"롯데카드", "eventName":ev['title'], "period":ev['period'], "link":ev['link'] if ev['link'] and "javascript" not in ev['link'] else "https://m.lottecard.co.kr/app/LPBNFDA_V100.lc", "image":ev['image'], "bgColor":"#ed1c24"})
-            except Exception as e: print(f"Lotte PW error: {e}")
-            finally: await browser.close()
+        started = time.monotonic()
+        all_events = await fetch_events_with_fallback("lotte", "Lotte", fetch_lotte_events_direct, fetch_lotte_events_browser)
         if all_events:
-            data = {"last_updated":datetime.now(seoul_tz).strftime('%Y-%m-%d %H:%M:%S'), "data":all_events}
-            file_path = os.path.join(os.getcwd(), "lotte_data.json")
-            with open(file_path,"w",encoding="utf-8") as f: json.dump(data,f,ensure_ascii=False)
-            if r: r.setex(LOTTE_CACHE_KEY, CACHE_EXPIRE, json.dumps(data))
-            print(f"[{datetime.now(seoul_tz)}] Lotte crawl finished: {len(all_events)} events saved.")
-    except Exception as e: print(f"Lotte crawl error: {e}")
+            await save_card_events("lotte", all_events)
+            print(f"[{datetime.now(seoul_tz)}] Lotte crawl finished in {time.monotonic() - started:.1f}s: {len(all_events)} events saved.")
+        else:
+            print(f"[{datetime.now(seoul_tz)}] Lotte crawl finished in {time.monotonic() - started:.1f}s: No events found.")
+            raise RuntimeError("Lotte crawl found no events")
+    except Exception as e:
+        print(f"Lotte crawl error: {e}")
+        raise
 
 # --- HTML Handlers ---
 @router.get("/card-events", response_class=HTMLResponse)
-def card_events(): return HTMLResponse(content=render_template("card_events_main.html"))
+def card_events(request: Request): return template_response(request, "card_events_main.html")
 @router.get("/card-events/kb", response_class=HTMLResponse)
-def kb_card_events(): return HTMLResponse(content=render_template("kb_card_events.html"))
+def kb_card_events(request: Request): return template_response(request, "kb_card_events.html")
 @router.get("/card-events/hana", response_class=HTMLResponse)
-def hana_card_events(): return HTMLResponse(content=render_template("hana_card_events.html"))
+def hana_card_events(request: Request): return template_response(request, "hana_card_events.html")
 @router.get("/card-events/shinhan", response_class=HTMLResponse)
-def shinhan_card_events(): return HTMLResponse(content=render_template("shinhan_card_events.html"))
+def shinhan_card_events(request: Request): return template_response(request, "shinhan_card_events.html")
 @router.get("/card-events/woori", response_class=HTMLResponse)
-def woori_card_events(): return HTMLResponse(content=render_template("woori_card_events.html"))
+def woori_card_events(request: Request): return template_response(request, "woori_card_events.html")
 @router.get("/card-events/bc", response_class=HTMLResponse)
-def bc_card_events(): return HTMLResponse(content=render_template("bc_card_events.html"))
+def bc_card_events(request: Request): return template_response(request, "bc_card_events.html")
 @router.get("/card-events/samsung", response_class=HTMLResponse)
-def samsung_card_events(): return HTMLResponse(content=render_template("samsung_card_events.html"))
+def samsung_card_events(request: Request): return template_response(request, "samsung_card_events.html")
 @router.get("/card-events/hyundai", response_class=HTMLResponse)
-def hyundai_cards_page(): return HTMLResponse(content=render_template("hyundai_card_events.html"))
+def hyundai_cards_page(request: Request): return template_response(request, "hyundai_card_events.html")
 @router.get("/card-events/lotte", response_class=HTMLResponse)
-def lotte_cards_page(): return HTMLResponse(content=render_template("lotte_card_events.html"))
+def lotte_cards_page(request: Request): return template_response(request, "lotte_card_events.html")
 @router.get("/card-events/search", response_class=HTMLResponse)
-def card_events_search(): return HTMLResponse(content=render_template("card_events_search.html"))
+def card_events_search(request: Request): return template_response(request, "card_events_search.html")
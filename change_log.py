@@ -0,0 +1,58 @@
+import os
+import json
+
+# 변경 로그 (NDJSON) 공통 도구
+# - 항목마다 일련번호(seq)를 붙여 한 줄씩 기록하고, 최근 keep개만 남깁니다 (임시 파일 + rename으로 교체).
+# - 읽은 로그는 파일의 (수정 시각, 크기)와 함께 프로세스 안에 보관하고, 워커 프로세스가 파일을 바꾸면 다시 읽습니다.
+# - 클라이언트는 마지막으로 받은 seq(since) 이후의 항목만 받아 갑니다. since가 보관 범위보다 오래되었거나
+#   서버의 최신 seq보다 크면(로그가 초기화됨) reset으로 알려 전체 데이터를 다시 받게 합니다.
+
+_log_cache = {}  # path -> ((mtime_ns, size), entries)
+
+def read_json(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f: return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def write_atomic(path, text):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f: f.write(text)
+    os.replace(tmp, path)
+
+def load_entries(path):
+    """로그 항목 목록 (seq 오름차순). 파일이 바뀌었을 때만 다시 읽습니다."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return []
+    version = (st.st_mtime_ns, st.st_size)
+    cached = _log_cache.get(path)
+    if cached and cached[0] == version: return cached[1]
+    entries = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try: entries.append(json.loads(line))
+            except ValueError: continue  # 기록 도중 끊긴 줄
+    _log_cache[path] = (version, entries)
+    return entries
+
+def last_seq(path):
+    entries = load_entries(path)
+    return entries[-1]["seq"] if entries else 0
+
+def append_entry(path, entry, keep):
+    """entry(seq 포함)를 로그 끝에 추가하고 최근 keep개만 남깁니다."""
+    kept = load_entries(path)[-(keep - 1):] if keep > 1 else []
+    write_atomic(path, "".join(json.dumps(e, ensure_ascii=False) + "\n" for e in kept + [entry]))
+
+def entries_since(path, since, limit):
+    """since 이후의 항목을 limit개까지 (항목, 다음 cursor, reset, more)로 반환합니다."""
+    entries = load_entries(path)
+    cursor = entries[-1]["seq"] if entries else 0
+    reset = since > cursor or (bool(entries) and since < entries[0]["seq"] - 1)
+    newer = [] if reset else [e for e in entries if e["seq"] > since]
+    # 한 번에 limit개까지만 주고, 남은 항목은 돌려준 cursor로 이어서 받게 합니다.
+    changes = newer[:limit]
+    return changes, changes[-1]["seq"] if changes else cursor, reset, len(newer) > limit
@@ -0,0 +1,92 @@
+import os
+import time
+import asyncio
+from datetime import datetime
+from shared import seoul_tz
+import jobs
+from browser_pool import browser_session, browser_rss_mb
+import card_events
+import kfcc
+
+# 일괄 크롤링 오케스트레이터
+# - httpx 기반 크롤러와 Playwright 기반 크롤러를 동시에 실행합니다.
+# - 브라우저 크롤러도 먼저 직접 경로(httpx)를 시도하므로 모든 크롤러가 같은 동시성 한도를 씁니다.
+#   Playwright로 대체될 때의 동시 컨텍스트 수는 browser_pool(PLAYWRIGHT_MAX_CONTEXTS)이 제한합니다.
+# - 새 크롤러를 시작하기 전 프로세스 트리 RSS가 예산(CRAWL_RSS_BUDGET_MB)을 넘으면, 다른 크롤러가 끝날 때까지 기다립니다.
+
+HTTP_CONCURRENCY = int(os.getenv("CRAWL_HTTP_CONCURRENCY", "4"))
+RSS_BUDGET_MB = float(os.getenv("CRAWL_RSS_BUDGET_MB", "1536"))
+RSS_POLL_SECONDS = 2
+
+# (이름, 크롤러, Playwright 대체 경로 여부)
+DAILY_CRAWLERS = [
+    ("KFCC", kfcc.background_crawl_kfcc, False),
+    ("신한", card_events.crawl_shinhan_bg, False),
+    ("하나", card_events.crawl_hana_bg, False),
+    ("BC", card_events.crawl_bc_bg, False),
+    ("KB", card_events.crawl_kb_bg, True),
+    ("우리", card_events.crawl_woori_bg, True),
+    ("삼성", card_events.crawl_samsung_bg, True),
+    ("현대", card_events.crawl_hyundai_bg, True),
+    ("롯데", card_events.crawl_lotte_bg, True),
+]
+
+_running = {"count": 0, "names": [], "done": 0}
+
+async def wait_for_rss_budget(name):
+    """RSS가 예산 이하로 내려가거나, 실행 중인 다른 크롤러가 없을 때까지 대기합니다."""
+    waited = False
+    while _running["count"] > 0 and browser_rss_mb() > RSS_BUDGET_MB:
+        if not waited:
+            print(f"[{datetime.now(seoul_tz)}] Crawl - {name} waiting for memory budget ({browser_rss_mb():.2f} MB > {RSS_BUDGET_MB:.0f} MB)")
+            waited = True
+        await asyncio.sleep(RSS_POLL_SECONDS)
+
+async def run_one(name, func, slots):
+    async with slots:
+        await wait_for_rss_budget(name)
+        _running["count"] += 1
+        _running["names"].append(name)
+        jobs.report_progress(running=list(_running["names"]))
+        started = time.monotonic()
+        try:
+            print(f"[{datetime.now(seoul_tz)}] Crawl - {name} starting...")
+            await func()
+            print(f"[{datetime.now(seoul_tz)}] Crawl - {name} finished in {time.monotonic() - started:.1f}s. Current memory: {browser_rss_mb():.2f} MB")
+            return name, True, time.monotonic() - started
+        except Exception as e:
+            print(f"Crawl - {name} error: {e}")
+            return name, False, time.monotonic() - started
+        finally:
+            _running["count"] -= 1
+            _running["names"].remove(name)
+            _running["done"] += 1
+            jobs.report_progress(crawlers_done=_running["done"], running=list(_running["names"]))
+
+async def run_crawlers(crawlers=None):
+    """크롤러 목록을 동시에 실행하고 (이름, 성공 여부, 소요 시간) 목록을 반환합니다.
+    하나라도 실패하면 모두 끝난 뒤 RuntimeError를 올려, 작업 큐가 일괄 작업을 실패로 기록하고 쿨다운을 걸지 않게 합니다."""
+    crawlers = crawlers or DAILY_CRAWLERS
+    slots = asyncio.Semaphore(HTTP_CONCURRENCY)
+    started = time.monotonic()
+    uses_browser = any(pw for _, _, pw in crawlers)
+    _running["done"] = 0
+    jobs.report_progress(crawlers_done=0, crawlers_total=len(crawlers))
+    print(f"[{datetime.now(seoul_tz)}] Starting concurrent crawl of {len(crawlers)} crawlers. Initial memory: {browser_rss_mb():.2f} MB")
+
+    async def run_all():
+        return await asyncio.gather(*[run_one(name, func, slots) for name, func, _ in crawlers])
+
+    if uses_browser:
+        # 일괄 크롤링 동안 Chromium을 한 번만 띄워 모든 Playwright 대체 경로가 공유합니다 (필요할 때만 실행).
+        async with browser_session():
+            results = await run_all()
+    else:
+        results = await run_all()
+
+    total = time.monotonic() - started
+    slowest = max((elapsed for _, _, elapsed in results), default=0)
+    print(f"[{datetime.now(seoul_tz)}] All crawl tasks finished in {total:.1f}s (sum {sum(e for _, _, e in results):.1f}s, slowest {slowest:.1f}s). Final memory: {browser_rss_mb():.2f} MB")
+    failed = [name for name, ok, _ in results if not ok]
+    if failed: raise RuntimeError(f"{len(failed)} of {len(results)} crawlers failed: {', '.join(failed)}")
+    return results
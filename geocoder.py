@@ -0,0 +1,148 @@
+import os
+import re
+import time
+import asyncio
+import unicodedata
+import httpx
+from datetime import datetime
+from sqlalchemy import Column, String, Float, select
+from shared import Base, r, seoul_tz, insert_for
+from adaptive_limiter import RateLimiter
+
+# 주소 -> 좌표 변환 (Kakao 주소 검색)
+# - 정규화한 주소를 키로 결과를 geocode_cache 테이블에 보관하여 동기화마다 다시 요청하지 않습니다.
+# - 찾지 못한 주소도 NEGATIVE_TTL 동안 기억하여(negative caching) 매번 할당량을 쓰지 않습니다.
+#   네트워크 오류/5xx/할당량 초과/깨진 응답 본문처럼 일시적인 실패는 저장하지 않습니다 (다음 동기화에서 다시 요청).
+# - 동기화 1회 동안 연결을 재사용하는 클라이언트 하나로, 동시 요청 수와 초당 요청 수(토큰 버킷)를 제한하여 요청합니다.
+# - 일일 할당량(KAKAO_DAILY_QUOTA)을 Redis(없으면 프로세스 내)에서 세고, 소진되거나 429를 받으면 그 실행에서는 더 요청하지 않습니다.
+
+KAKAO_REST_KEY = os.getenv("KAKAO_REST_KEY", "8220fce5d491da93dda89d8cf3682514") # JS Key may sometimes work or User should provide REST Key
+KAKAO_GEOCODE_URL = "https://dapi.kakao.com/v2/local/search/address.json"
+GEOCODE_CONCURRENCY = int(os.getenv("GEOCODE_CONCURRENCY", "4"))
+GEOCODE_RATE = float(os.getenv("GEOCODE_RATE_PER_SEC", "10"))
+DAILY_QUOTA = int(os.getenv("KAKAO_DAILY_QUOTA", "100000"))
+NEGATIVE_TTL = float(os.getenv("GEOCODE_NEGATIVE_TTL_DAYS", "30")) * 86400
+
+_local_quota = {}
+
+class GeocodeCache(Base):
+    __tablename__ = "geocode_cache"
+    address_key = Column(String, primary_key=True)  # normalize_address() 결과
+    lat = Column(Float)  # 찾지 못한 주소는 NULL
+    lon = Column(Float)
+    updated_at = Column(Float)  # epoch seconds
+
+def normalize_address(address):
+    """캐시 키와 검색어로 쓰는 주소. 전각 문자/공백/괄호 안 부가 정보 차이를 없앱니다.
+    예: '서울시  종로구 종로 1 (종로1가)' -> '서울시 종로구 종로 1'"""
+    address = unicodedata.normalize("NFKC", address or "")
+    address = re.sub(r"\([^)]*\)", " ", address).replace(",", " ")
+    return " ".join(address.split())
+
+def load_geocodes(keys, bind):
+    """캐시에서 유효한 결과 {key: (lat, lon) 또는 (None, None)}를 읽습니다. 만료된 실패 결과는 제외합니다."""
+    if not keys: return {}
+    now = time.time()
+    with bind.connect() as conn:
+        rows = conn.execute(select(GeocodeCache.address_key, GeocodeCache.lat, GeocodeCache.lon, GeocodeCache.updated_at)
+                            .where(GeocodeCache.address_key.in_(keys)))
+        return {key: (lat, lon) for key, lat, lon, updated_at in rows
+                if lat is not None or now - (updated_at or 0) < NEGATIVE_TTL}
+
+def store_geocodes(results, bind):
+    if not results: return
+    insert = insert_for(bind)
+    now = time.time()
+    stmt = insert(GeocodeCache.__table__)
+    stmt = stmt.on_conflict_do_update(index_elements=["address_key"], set_={
+        "lat": stmt.excluded.lat, "lon": stmt.excluded.lon, "updated_at": stmt.excluded.updated_at})
+    with bind.begin() as conn:
+        conn.execute(stmt, [{"address_key": key, "lat": lat, "lon": lon, "updated_at": now} for key, (lat, lon) in results.items()])
+
+async def take_quota():
+    """오늘 할당량에서 1건을 씁니다. 남아 있으면 True."""
+    day = datetime.now(seoul_tz).strftime("%Y%m%d")
+    if r:
+        try:
+            key = f"geocode:quota:{day}"
+            used = await r.incr(key)
+            if used == 1: await r.expire(key, 2 * 86400)
+            return used <= DAILY_QUOTA
+        except Exception as e:
+            print(f"Geocode quota counter error: {e}")
+    _local_quota[day] = _local_quota.get(day, 0) + 1
+    return _local_quota[day] <= DAILY_QUOTA
+
+class Geocoder:
+    """동기화 1회 동안 쓰는 지오코더. geocode_many()로 페이지 단위 주소를 한 번에 변환합니다."""
+
+    def __init__(self, bind, concurrency=GEOCODE_CONCURRENCY, rate=GEOCODE_RATE):
+        self.bind = bind
+        self.client = httpx.AsyncClient(timeout=10.0, headers={"Authorization": f"KakaoAK {KAKAO_REST_KEY}"},
+                                        limits=httpx.Limits(max_connections=concurrency))
+        self.slots = asyncio.Semaphore(concurrency)
+        self.rate = RateLimiter(rate)
+        self.exhausted = not KAKAO_REST_KEY
+        self.stats = {"lookups": 0, "hits": 0, "negative_hits": 0, "requests": 0, "found": 0, "not_found": 0, "errors": 0}
+
+    async def _request(self, key):
+        """(lat, lon), 찾지 못하면 (None, None), 일시적인 실패면 None."""
+        if self.exhausted: return None
+        async with self.slots:
+            await self.rate.acquire()
+            if self.exhausted or not await take_quota():
+                if not self.exhausted: print("Geocoding daily quota exhausted; remaining addresses are left for the next sync.")
+                self.exhausted = True
+                return None
+            self.stats["requests"] += 1
+            try:
+                resp = await self.client.get(KAKAO_GEOCODE_URL, params={"query": key})
+            except httpx.HTTPError as e:
+                self.stats["errors"] += 1
+                print(f"Geocoding error for {key}: {e}")
+                return None
+        if resp.status_code == 429:
+            self.exhausted = True
+            print("Geocoding rate limited by Kakao (429); remaining addresses are left for the next sync.")
+            return None
+        if resp.status_code != 200:
+            self.stats["errors"] += 1
+            return None
+        try:
+            documents = resp.json().get("documents", [])
+            coords = (float(documents[0]["y"]), float(documents[0]["x"])) if documents else None
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            # JSON이 아닌 오류 페이지나 형식이 다른 응답은 이 주소 하나의 일시적인 실패로 셉니다.
+            self.stats["errors"] += 1
+            print(f"Geocoding error for {key}: malformed response ({e})")
+            return None
+        if not coords:
+            self.stats["not_found"] += 1
+            return None, None
+        self.stats["found"] += 1
+        return coords
+
+    async def geocode_many(self, addresses):
+        """{address: (lat, lon)}. 좌표를 얻지 못한 주소는 (None, None)입니다."""
+        keys = {address: normalize_address(address) for address in addresses}
+        unique = list(dict.fromkeys(keys.values()))
+        cached = await asyncio.to_thread(load_geocodes, unique, self.bind)
+        misses = [key for key in unique if key not in cached]
+        self.stats["lookups"] += len(unique)
+        self.stats["hits"] += len(unique) - len(misses)
+        self.stats["negative_hits"] += sum(1 for lat, _ in cached.values() if lat is None)
+
+        fetched = dict(zip(misses, await asyncio.gather(*[self._request(key) for key in misses])))
+        fetched = {key: coords for key, coords in fetched.items() if coords is not None}
+        await asyncio.to_thread(store_geocodes, fetched, self.bind)
+        results = {**cached, **fetched}
+        return {address: results.get(key, (None, None)) for address, key in keys.items()}
+
+    def hit_ratio(self):
+        return self.stats["hits"] / self.stats["lookups"] if self.stats["lookups"] else 0.0
+
+    def summary(self):
+        return {**self.stats, "hit_ratio": round(self.hit_ratio(), 3)}
+
+    async def close(self):
+        await self.client.aclose()
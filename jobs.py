@@ -0,0 +1,394 @@
+import os
+import json
+import time
+import uuid
+import asyncio
+import importlib
+import contextvars
+from collections import OrderedDict
+from datetime import datetime
+from fastapi import APIRouter, HTTPException
+from shared import r, seoul_tz, PROCESS_ID, DATA_DIR, data_path
+
+router = APIRouter()
+
+# 크롤링 작업 큐 (Job queue)
+# - 수동 업데이트 API와 스케줄러는 크롤러를 직접 실행하지 않고 작업을 큐에 넣기만 합니다.
+# - 작업은 크롤러 워커(worker.py)가 꺼내 실행합니다. CRAWL_WORKER=inline(기본값)이면 웹 프로세스 안에서 같은 루프가 돕니다.
+# - Redis가 있으면 Redis 리스트를 큐로 쓰고 작업 상태를 해시에 저장하며, 없으면 프로세스 내 asyncio.Queue로 대체합니다.
+# - 같은 작업(이름 기준)이나 그 데이터셋을 포함하는 일괄 작업이 대기/실행 중이면 새로 넣지 않고 기존 작업을 돌려줍니다.
+#   수동 요청은 작업이 성공한 뒤 JOB_COOLDOWN 동안에도 방금 끝난 작업을 돌려줍니다.
+# - 매일 04:00 작업은 리더 잠금을 잡은 프로세스 하나만 큐에 넣습니다 (uvicorn 워커가 여러 개여도 한 번).
+# - Redis 큐에서는 BLMOVE로 작업을 꺼내면서 처리 중 목록(PROCESSING_KEY)으로 옮기고, 실행하는 동안 임대 키(lease)를 연장합니다.
+#   워커가 작업 도중 죽어 임대가 끊긴 작업은 워커가 시작할 때(그리고 스케줄러 리더가 주기적으로) 큐에 다시 넣습니다.
+# - CRAWL_WORKER=external이면 웹 서버와 워커가 같은 CRAWL_DATA_DIR 볼륨을 봐야 합니다 (크롤러가 쓰는 데이터 파일을 웹 서버가 읽고, 캐시가 만료되면 다시 게시함).
+#   워커는 시작할 때 그 디렉터리와 Redis에 같은 표식을 남기고, 웹 서버는 둘을 비교하여 볼륨이 공유되지 않으면 경고합니다.
+
+WORKER_MODE = os.getenv("CRAWL_WORKER", "inline")  # inline | external
+JOB_CONCURRENCY = int(os.getenv("CRAWL_JOB_CONCURRENCY", "2"))
+JOB_TIMEOUT = int(os.getenv("CRAWL_JOB_TIMEOUT", "7200"))  # 실행 중 표시(중복 방지 키)의 최대 수명
+JOB_COOLDOWN = int(os.getenv("CRAWL_JOB_COOLDOWN", "300"))  # 성공한 작업 직후 같은 수동 요청은 새로 실행하지 않는 시간(초)
+JOB_TTL = 86400
+RECENT_JOBS = 50
+LEADER_TTL = 60
+LEADER_RENEW = 20
+LEADER_LOCK_FILE = os.getenv("CRAWL_LEADER_LOCK_FILE", "/tmp/inbestlab_scheduler.lock")
+LEASE_TTL = int(os.getenv("CRAWL_JOB_LEASE_TTL", "60"))  # 실행 중인 작업의 임대 수명. LEASE_TTL/3마다 연장합니다.
+SHUTDOWN_GRACE = float(os.getenv("CRAWL_SHUTDOWN_GRACE", "5"))  # 종료 시 실행 중인 작업이 끝나기를 기다리는 시간(초). 넘으면 취소합니다.
+ORPHAN_GRACE = 2  # BLMOVE 직후 아직 임대를 잡지 못한 작업을 고아로 보지 않도록 두 번 확인하는 간격(초)
+
+QUEUE_KEY = "crawl:jobs:queue"
+PROCESSING_KEY = "crawl:jobs:processing"
+RECENT_KEY = "crawl:jobs:recent"
+DATA_MARKER_KEY = "crawl:data_dir:marker"
+DATA_MARKER_FILE = ".crawl_worker"
+LEADER_KEY = "crawl:scheduler:leader"
+
+CARD_ISSUER_KEYS = ["shinhan", "kb", "hana", "woori", "bc", "samsung", "hyundai", "lotte"]
+# 작업 이름 -> (모듈, 함수). 웹 프로세스가 크롤러 모듈을 불필요하게 읽지 않도록 실행 시점에 import 합니다.
+JOB_TARGETS = {
+    "daily": ("crawl_orchestrator", "run_crawlers"),
+    "kfcc": ("kfcc", "background_crawl_kfcc"),
+    "local-currency": ("local_currency", "sync_all_data"),
+    **{f"card:{issuer}": ("card_events", f"crawl_{issuer}_bg") for issuer in CARD_ISSUER_KEYS},
+}
+
+# 일괄 작업이 포함하는 데이터셋. 일괄 크롤링이 대기/실행 중(또는 방금 끝남)이면 해당 데이터셋의 수동 요청은 그 작업에 합류합니다.
+JOB_COVERS = {"daily": {"kfcc", *(f"card:{issuer}" for issuer in CARD_ISSUER_KEYS)}}
+
+# 값이 ARGV[1]과 같을 때만 키를 지우거나(release) 만료를 연장(renew)합니다.
+RELEASE_SCRIPT = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) else return 0 end"
+RENEW_SCRIPT = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('expire', KEYS[1], ARGV[2]) else return 0 end"
+
+_local = {"queue": None, "jobs": OrderedDict(), "inflight": {}, "cooldown": {}}
+_leader = {"is_leader": False, "lock_fd": None}
+_current_job = contextvars.ContextVar("current_job", default=None)
+_pending_writes = set()
+
+def job_key(job_id): return f"crawl:job:{job_id}"
+def inflight_key(name): return f"crawl:inflight:{name}"
+def cooldown_key(name): return f"crawl:cooldown:{name}"
+def lease_key(job_id): return f"crawl:lease:{job_id}"
+def covering_jobs(name): return [name] + [parent for parent, covered in JOB_COVERS.items() if name in covered]
+def now_str(): return datetime.now(seoul_tz).strftime('%Y-%m-%d %H:%M:%S')
+
+def _local_queue():
+    if _local["queue"] is None: _local["queue"] = asyncio.Queue()
+    return _local["queue"]
+
+def _decode(raw):
+    if not raw: return None
+    job = dict(raw)
+    job["progress"] = json.loads(job.get("progress") or "{}")
+    job["created_ts"] = float(job.get("created_ts") or 0)
+    return job
+
+async def get_job(job_id):
+    if r: return _decode(await r.hgetall(job_key(job_id)))
+    return _local["jobs"].get(job_id)
+
+async def update_job(job_id, **fields):
+    if r:
+        if "progress" in fields: fields["progress"] = json.dumps(fields["progress"], ensure_ascii=False)
+        await r.hset(job_key(job_id), mapping={k: "" if v is None else v for k, v in fields.items()})
+        return
+    job = _local["jobs"].get(job_id)
+    if job: job.update(fields)
+
+async def recent_jobs(limit=20):
+    if r:
+        ids = await r.lrange(RECENT_KEY, 0, limit - 1)
+        async with r.pipeline(transaction=False) as pipe:
+            for job_id in ids: pipe.hgetall(job_key(job_id))
+            rows = await pipe.execute()
+        return [job for job in map(_decode, rows) if job]
+    return list(reversed(_local["jobs"].values()))[:limit]
+
+async def queue_length():
+    if r: return await r.llen(QUEUE_KEY)
+    return _local_queue().qsize()
+
+async def find_inflight(name):
+    """대기/실행 중인 같은 이름의 작업."""
+    job_id = await r.get(inflight_key(name)) if r else _local["inflight"].get(name)
+    if not job_id: return None
+    job = await get_job(job_id)
+    if job and job["status"] in ("queued", "running"): return job
+    # 상태가 사라졌거나 끝난 작업을 가리키는 표시는 정리합니다.
+    if r: await r.eval(RELEASE_SCRIPT, 1, inflight_key(name), job_id)
+    else: _local["inflight"].pop(name, None)
+    return None
+
+async def find_recent(name):
+    """JOB_COOLDOWN 안에 성공적으로 끝난 같은 이름의 작업. 남은 시간을 cooldown_remaining에 담습니다."""
+    if r:
+        async with r.pipeline(transaction=False) as pipe:
+            pipe.get(cooldown_key(name)); pipe.ttl(cooldown_key(name))
+            job_id, remaining = await pipe.execute()
+    else:
+        job_id, until = _local["cooldown"].get(name, (None, 0))
+        remaining = int(until - time.monotonic())
+    if not job_id or remaining <= 0: return None
+    job = await get_job(job_id)
+    return {**job, "cooldown_remaining": remaining} if job else None
+
+async def start_cooldown(name, job_id):
+    if JOB_COOLDOWN <= 0: return
+    if r: await r.set(cooldown_key(name), job_id, ex=JOB_COOLDOWN)
+    else: _local["cooldown"][name] = (job_id, time.monotonic() + JOB_COOLDOWN)
+
+async def find_existing(name, source):
+    """새 작업 대신 합류할 작업: 같은 데이터셋을 다루는 대기/실행 중인 작업, 또는 (수동 요청이면) 쿨다운 중인 완료 작업."""
+    names = covering_jobs(name)
+    for candidate in names:
+        job = await find_inflight(candidate)
+        if job: return job
+    if source == "schedule": return None
+    for candidate in names:
+        job = await find_recent(candidate)
+        if job: return job
+    return None
+
+async def enqueue(name, source="manual"):
+    """작업을 큐에 넣고 (작업, 새로 만들었는지)를 반환합니다.
+    같은 데이터셋의 작업이 대기/실행 중이거나 쿨다운 중이면 새로 넣지 않고 그 작업을 돌려줍니다."""
+    if name not in JOB_TARGETS: raise KeyError(name)
+    job = {"id": uuid.uuid4().hex[:12], "name": name, "status": "queued", "source": source,
+           "created_at": now_str(), "created_ts": time.time(), "started_at": None, "finished_at": None,
+           "error": None, "worker": None, "progress": {}}
+    for _ in range(2):
+        existing = await find_existing(name, source)
+        if existing: return existing, False
+        if r:
+            if not await r.set(inflight_key(name), job["id"], nx=True, ex=JOB_TIMEOUT): continue
+            async with r.pipeline(transaction=True) as pipe:
+                pipe.hset(job_key(job["id"]), mapping={**{k: "" if v is None else v for k, v in job.items()}, "progress": "{}"})
+                pipe.expire(job_key(job["id"]), JOB_TTL)
+                pipe.lpush(RECENT_KEY, job["id"]); pipe.ltrim(RECENT_KEY, 0, RECENT_JOBS - 1)
+                pipe.lpush(QUEUE_KEY, job["id"])
+                await pipe.execute()
+        else:
+            _local["inflight"][name] = job["id"]
+            _local["jobs"][job["id"]] = job
+            while len(_local["jobs"]) > RECENT_JOBS: _local["jobs"].popitem(last=False)
+            _local_queue().put_nowait(job["id"])
+        print(f"[{datetime.now(seoul_tz)}] Job queued: {name} ({job['id']}, {source})")
+        return job, True
+    return await find_existing(name, source), False
+
+def job_response(job, created, **extra):
+    """수동 업데이트 API의 공통 응답. 클라이언트는 job_id로 /api/jobs/{id}를 폴링합니다."""
+    res = {"status": job["status"], "job_id": job["id"], "job": job["name"], "deduplicated": not created, **extra}
+    if "cooldown_remaining" in job: res["cooldown_remaining"] = job["cooldown_remaining"]
+    return res
+
+def report_progress(**progress):
+    """실행 중인 작업의 진행 상황을 기록합니다. 작업 밖에서 호출되면 아무 일도 하지 않습니다."""
+    state = _current_job.get()
+    if state is None: return
+    state["progress"].update(progress)
+    task = asyncio.get_running_loop().create_task(update_job(state["id"], progress=dict(state["progress"])))
+    _pending_writes.add(task); task.add_done_callback(_pending_writes.discard)
+
+async def keep_lease(job_id):
+    while True:
+        await asyncio.sleep(LEASE_TTL / 3)
+        try: await r.set(lease_key(job_id), PROCESS_ID, ex=LEASE_TTL)
+        except Exception as e: print(f"Job lease renew failed ({job_id}): {e}")
+
+async def ack_job(job_id):
+    """처리 중 목록에서 작업을 빼고 임대를 풉니다."""
+    if not r: return
+    async with r.pipeline(transaction=True) as pipe:
+        pipe.lrem(PROCESSING_KEY, 1, job_id); pipe.delete(lease_key(job_id))
+        await pipe.execute()
+
+async def requeue_orphans():
+    """처리 중 목록에서 임대가 끊긴 작업(실행하던 워커가 죽음)을 큐의 맨 앞에 다시 넣습니다. 다시 넣은 작업 수를 반환합니다."""
+    if not r: return 0
+    suspects = [job_id for job_id in await r.lrange(PROCESSING_KEY, 0, -1) if not await r.exists(lease_key(job_id))]
+    if not suspects: return 0
+    await asyncio.sleep(ORPHAN_GRACE)
+    count = 0
+    for job_id in suspects:
+        if await r.exists(lease_key(job_id)) or not await r.lrem(PROCESSING_KEY, 1, job_id): continue
+        job = await get_job(job_id)
+        if not job or job["status"] not in ("queued", "running"): continue
+        async with r.pipeline(transaction=True) as pipe:
+            pipe.hset(job_key(job_id), mapping={"status": "queued", "worker": "", "error": "requeued after worker exit"})
+            pipe.set(inflight_key(job["name"]), job_id, ex=JOB_TIMEOUT)
+            pipe.rpush(QUEUE_KEY, job_id)  # 큐는 오른쪽에서 꺼내므로 다음 차례가 됩니다.
+            await pipe.execute()
+        count += 1
+        print(f"[{datetime.now(seoul_tz)}] Job requeued: {job['name']} ({job_id}), its worker stopped without finishing it")
+    return count
+
+async def run_job(job_id):
+    job = await get_job(job_id)
+    if not job or job["status"] != "queued":
+        await ack_job(job_id)
+        return
+    name = job["name"]
+    started = time.monotonic()
+    await update_job(job_id, status="running", started_at=now_str(), worker=PROCESS_ID, error=None)
+    print(f"[{datetime.now(seoul_tz)}] Job started: {name} ({job_id})")
+    token = _current_job.set({"id": job_id, "progress": {}})
+    lease = asyncio.create_task(keep_lease(job_id)) if r else None
+    status, error = "done", None
+    try:
+        module, func = JOB_TARGETS[name]
+        await getattr(importlib.import_module(module), func)()
+    except asyncio.CancelledError:
+        # 종료 중 취소된 작업도 상태를 남기고 중복 방지 표시를 풀어 다음 요청이 막히지 않게 합니다.
+        status, error = "cancelled", "worker shutdown"
+        raise
+    except Exception as e:
+        status, error = "failed", str(e)
+        print(f"Job {name} ({job_id}) failed: {e}")
+    finally:
+        _current_job.reset(token)
+        if lease: lease.cancel()
+        await update_job(job_id, status=status, error=error, finished_at=now_str(), elapsed=round(time.monotonic() - started, 1))
+        if status == "done": await start_cooldown(name, job_id)
+        if r: await r.eval(RELEASE_SCRIPT, 1, inflight_key(name), job_id)
+        elif _local["inflight"].get(name) == job_id: _local["inflight"].pop(name)
+        await ack_job(job_id)
+    print(f"[{datetime.now(seoul_tz)}] Job {status}: {name} ({job_id}) in {time.monotonic() - started:.1f}s")
+
+async def next_job_id():
+    if r:
+        # 꺼낸 작업은 처리 중 목록으로 옮겨 두고 바로 임대를 잡습니다. 대기 시간은 소켓 타임아웃(5초)보다 짧아야 합니다.
+        job_id = await r.blmove(QUEUE_KEY, PROCESSING_KEY, 2, "RIGHT", "LEFT")
+        if job_id: await r.set(lease_key(job_id), PROCESS_ID, ex=LEASE_TTL)
+        return job_id
+    return await _local_queue().get()
+
+async def worker_loop():
+    """큐에서 작업을 꺼내 최대 JOB_CONCURRENCY개까지 동시에 실행합니다."""
+    slots = asyncio.Semaphore(JOB_CONCURRENCY)
+    running = set()
+    print(f"[{datetime.now(seoul_tz)}] Crawl worker started ({'redis' if r else 'local'} queue, concurrency {JOB_CONCURRENCY})")
+    try:
+        await requeue_orphans()
+    except Exception as e:
+        print(f"Crawl worker - requeue check failed: {e}")
+
+    async def run(job_id):
+        try: await run_job(job_id)
+        finally: slots.release()
+
+    try:
+        while True:
+            await slots.acquire()
+            try:
+                job_id = await next_job_id()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Crawl worker - queue error: {e}")
+                slots.release(); await asyncio.sleep(5)
+                continue
+            if not job_id:
+                slots.release(); continue
+            task = asyncio.create_task(run(job_id))
+            running.add(task); task.add_done_callback(running.discard)
+    finally:
+        # 취소(종료)되어도 실행 중인 작업의 마무리(상태 기록, ack, 임대 해제)가 끝날 때까지 기다립니다.
+        # 호출한 쪽은 이 태스크를 기다린 뒤에 Redis 풀을 닫아야 합니다.
+        await drain_jobs(running)
+
+async def drain_jobs(running):
+    """실행 중인 작업을 SHUTDOWN_GRACE초까지 기다리고, 남은 작업은 취소한 뒤 끝날 때까지 기다립니다."""
+    if not running: return
+    print(f"[{datetime.now(seoul_tz)}] Crawl worker - waiting up to {SHUTDOWN_GRACE:.0f}s for {len(running)} running job(s)")
+    _, pending = await asyncio.wait(set(running), timeout=SHUTDOWN_GRACE)
+    for task in pending: task.cancel()
+    await asyncio.gather(*pending, return_exceptions=True)
+
+# --- 스케줄러 리더 잠금 ---
+def _try_file_lock():
+    """Redis가 없을 때는 같은 호스트의 프로세스끼리 파일 잠금으로 리더를 정합니다."""
+    if _leader["lock_fd"] is not None: return True
+    import fcntl
+    fd = os.open(LEADER_LOCK_FILE, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        os.close(fd)
+        return False
+    _leader["lock_fd"] = fd
+    return True
+
+async def try_lead():
+    if not r: return _try_file_lock()
+    if await r.set(LEADER_KEY, PROCESS_ID, nx=True, ex=LEADER_TTL): return True
+    return bool(await r.eval(RENEW_SCRIPT, 1, LEADER_KEY, PROCESS_ID, LEADER_TTL))
+
+async def leader_loop():
+    while True:
+        try:
+            is_leader = await try_lead()
+        except Exception as e:
+            print(f"Scheduler leader check failed: {e}")
+            is_leader = False
+        if is_leader != _leader["is_leader"]:
+            print(f"[{datetime.now(seoul_tz)}] Scheduler leadership {'acquired' if is_leader else 'lost'} ({PROCESS_ID})")
+        _leader["is_leader"] = is_leader
+        if is_leader:
+            try: await requeue_orphans()
+            except Exception as e: print(f"Requeue check failed: {e}")
+        await asyncio.sleep(LEADER_RENEW)
+
+async def scheduled_daily_crawl():
+    if not _leader["is_leader"]: return
+    await enqueue("daily", source="schedule")
+
+def create_scheduler():
+    from apscheduler.schedulers.asyncio import AsyncIOScheduler
+    # misfire_grace_time을 설정하여 서버 재시작 시점에 밀린 작업들이 한꺼번에 실행되어 메모리 부족(OOM)으로 크래시되는 것을 방지합니다.
+    job_defaults = {
+        'misfire_grace_time': 300, # 5분 이상 지연된 작업은 무시
+        'coalesce': True,
+        'max_instances': 1
+    }
+    scheduler = AsyncIOScheduler(timezone=seoul_tz, job_defaults=job_defaults)
+    # 매일 새벽 4시에 통합 크롤링 작업을 큐에 넣습니다 (리더 프로세스만)
+    scheduler.add_job(scheduled_daily_crawl, 'cron', hour=4, minute=0)
+    return scheduler
+
+# --- 웹 서버와 워커의 데이터 볼륨 공유 확인 ---
+async def mark_data_dir():
+    """워커가 CRAWL_DATA_DIR과 Redis에 같은 표식(PROCESS_ID)을 남깁니다."""
+    os.makedirs(DATA_DIR or ".", exist_ok=True)
+    with open(data_path(DATA_MARKER_FILE), "w", encoding="utf-8") as f: f.write(PROCESS_ID)
+    await r.set(DATA_MARKER_KEY, PROCESS_ID)
+
+async def data_dir_shared():
+    """웹 서버가 워커와 같은 CRAWL_DATA_DIR을 보는지. inline이면 True, 워커가 아직 표식을 남기지 않았으면 None."""
+    if WORKER_MODE != "external" or not r: return True
+    marker = await r.get(DATA_MARKER_KEY)
+    if not marker: return None
+    try:
+        with open(data_path(DATA_MARKER_FILE), "r", encoding="utf-8") as f: return f.read().strip() == marker
+    except OSError:
+        return False
+
+def start_worker():
+    """크롤러 워커 구성요소(작업 루프, 리더 잠금, 스케줄러)를 현재 이벤트 루프에서 시작합니다."""
+    tasks = [asyncio.create_task(worker_loop()), asyncio.create_task(leader_loop())]
+    scheduler = create_scheduler()
+    scheduler.start()
+    return scheduler, tasks
+
+# --- 작업 상태 API ---
+@router.get("/api/jobs")
+async def list_jobs(limit: int = 20):
+    jobs = await recent_jobs(min(max(limit, 1), RECENT_JOBS))
+    return {"mode": WORKER_MODE, "backend": "redis" if r else "local", "queued": await queue_length(),
+            "data_dir_shared": await data_dir_shared(), "jobs": jobs}
+
+@router.get("/api/jobs/{job_id}")
+async def job_status(job_id: str):
+    job = await get_job(job_id)
+    if not job: raise HTTPException(status_code=404, detail="Job not found")
+    return job
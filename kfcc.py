@@ -1,76 +1,278 @@
-from fastapi import APIRouter, HTTPException, BackgroundTasks
+from fastapi import APIRouter, HTTPException, Query, Request
 from fastapi.responses import HTMLResponse
 import os
 import json
+import asyncio
+import hashlib
+import numpy as np
 from datetime import datetime
-from shared import r, seoul_tz, CACHE_EXPIRE
+from shared import seoul_tz, rb, CACHE_EXPIRE, l1_get, l1_set, redis_load_entry, store_entry, read_sidecars, entry_response, publish_cached_file, template_response, invalidate_cache, broadcast_invalidation, etag_matches, compress_body, data_path
+import jobs
+import kfcc_history
+import kfcc_changes
+from kfcc_common import to_rate, region_of
 
 router = APIRouter()
 
 KFCC_CACHE_KEY = "kfcc_rates_cache_v1"
+KFCC_DATA_FILE = data_path("kfcc_data.json")
+
+# 상품별 정렬 인덱스 (Top-N)
+# - 게시 시점에 한 번, 금리를 숫자로 바꾼 행 목록과 (상품, 지역)별로 금리 내림차순 정렬한 행 번호 목록을 만들어 둡니다.
+#   지역 키는 "" (전국), "r1", "r1/r2" 세 단계입니다.
+# - /api/kfcc/top은 해당 목록에서 offset..offset+n 구간만 잘라 응답하므로, 전체 데이터를 내려받아 브라우저에서 정렬할 필요가 없습니다.
+# - 인덱스는 Redis(KFCC_INDEX_KEY)와 L1에 보관하고, 다른 프로세스의 L1은 무효화 메시지로 비웁니다.
+KFCC_INDEX_KEY = "kfcc_top_index_v1"
+PRODUCT_ALIASES = {"dep": "MG더뱅킹정기예금", "sav": "MG더뱅킹정기적금", "free": "MG더뱅킹자유적금"}
+TOP_DEFAULT, TOP_MAX = 10, 100
+HISTORY_DEFAULT_DAYS, HISTORY_MAX_DAYS = 90, 366 * 3
+
+# 상품/지역별 집계 통계
+# - 게시 시점에 상품별로 전국, 시도(r1), 시군구(r1/r2) 단위의 건수/최소/최대/평균/중앙값/백분위수를 계산해 둡니다.
+# - (지점 x 상품) 금리 행렬과 지역 코드 배열을 만든 뒤, 그룹별 집계를 bincount와 정렬된 배열의 위치 계산으로 한 번에 처리하므로
+#   상품이나 지역이 늘어도 파이썬 반복 횟수는 상품 수만큼입니다.
+# - 결과는 다른 캐시와 같이 압축본과 함께 Redis/L1에 보관하고 /api/kfcc/stats에서 그대로 응답합니다.
+KFCC_STATS_KEY = "kfcc_stats_cache_v1"
+PERCENTILES = (10, 25, 75, 90)
+
+async def load_kfcc_entry():
+    """L1 -> Redis -> 로컬 파일 순으로 KFCC 데이터를 조회하여 L1 엔트리를 반환합니다."""
+    # 1. 프로세스 내 L1 캐시 확인
+    entry = l1_get(KFCC_CACHE_KEY)
+    if entry: return entry
+
+    # 2. Redis 캐시 확인 (본문 + 사전 압축본)
+    entry = await redis_load_entry(KFCC_CACHE_KEY)
+    if entry: return entry
+    
+    # 3. 로컬 파일 확인
+    local_path = KFCC_DATA_FILE
+    if os.path.exists(local_path):
+        with open(local_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        
+        # 데이터 구조 확인 (기존 리스트 형태 vs 신규 딕셔너리 형태)
+        if isinstance(data, dict) and "data" in data and "last_updated" in data:
+            res = data
+        elif isinstance(data, list):
+            mtime = os.path.getmtime(local_path)
+            last_updated = datetime.fromtimestamp(mtime).strftime('%Y-%m-%d %H:%M:%S')
+            res = {"last_updated": last_updated, "data": data}
+        else:
+            return l1_set(KFCC_CACHE_KEY, {"last_updated": None, "message": "데이터 형식이 올바르지 않습니다.", "data": []})
+
+        # 캐시 업데이트 및 반환 (크롤러가 저장한 압축본이 있으면 재사용)
+        return await store_entry(KFCC_CACHE_KEY, res, None, read_sidecars(local_path) if res is data else None)
+    return None
 
 @router.get("/api/kfcc")
-async def get_kfcc_data():
+async def get_kfcc_data(request: Request):
     try:
-        # 1. Redis 캐시 확인
-        if r:
-            cached = r.get(KFCC_CACHE_KEY)
-            if cached:
-                return json.loads(cached)
-        
-        # 2. 로컬 파일 확인
-        local_path = "kfcc_data.json"
-        if os.path.exists(local_path):
-            with open(local_path, "r", encoding="utf-8") as f:
-                data = json.load(f)
-            
-            # 데이터 구조 확인 (기존 리스트 형태 vs 신규 딕셔너리 형태)
-            if isinstance(data, dict) and "data" in data and "last_updated" in data:
-                res = data
-            elif isinstance(data, list):
-                mtime = os.path.getmtime(local_path)
-                last_updated = datetime.fromtimestamp(mtime).strftime('%Y-%m-%d %H:%M:%S')
-                res = {"last_updated": last_updated, "data": data}
-            else:
-                return {"last_updated": None, "message": "데이터 형식이 올바르지 않습니다.", "data": []}
-
-            # 캐시 업데이트 및 반환
-            if r:
-                r.setex(KFCC_CACHE_KEY, CACHE_EXPIRE, json.dumps(res))
-            return res
-            
+        entry = await load_kfcc_entry()
+        if entry: return entry_response(request, entry)
         return {"last_updated": None, "message": "데이터가 없습니다.", "data": []}
     except Exception as e:
         print(f"Error in get_kfcc_data: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+def build_kfcc_index(data):
+    """KFCC 결과({"last_updated", "data"})로 상품/지역별 정렬 인덱스를 만듭니다."""
+    rows, buckets = [], {}
+    for item in data.get("data") or []:
+        r1, r2 = region_of(item)
+        rates = {product: rate for product, value in (item.get("rates") or {}).items() if (rate := to_rate(value)) is not None}
+        row_id = len(rows)
+        rows.append({"gmgoCd": item.get("gmgoCd"), "gmgoNm": item.get("gmgoNm"), "location": item.get("location"),
+                     "r1": r1, "r2": r2, "rates": rates, "기준일": item.get("기준일")})
+        for product, rate in rates.items():
+            regions = buckets.setdefault(product, {})
+            # 지역을 알 수 없는 지점은 전국("")에만 넣습니다. 빈 r1이 ""와 겹쳐 두 번 들어가지 않게 합니다.
+            for region in ("", r1, f"{r1}/{r2}") if r1 else ("",):
+                regions.setdefault(region, []).append((-rate, item.get("gmgoNm") or "", row_id))
+    lists = {product: {region: [row_id for *_, row_id in sorted(entries)] for region, entries in regions.items()}
+             for product, regions in buckets.items()}
+    return {"last_updated": data.get("last_updated"), "rows": rows, "lists": lists}
+
+def group_stats(rates, codes, n_groups):
+    """rates(NaN = 금리 없음)를 codes(0..n_groups-1) 그룹별로 집계하여 {열 이름: 그룹별 배열}을 반환합니다."""
+    valid = ~np.isnan(rates)
+    values, codes = rates[valid], codes[valid]
+    counts = np.bincount(codes, minlength=n_groups)
+    if not len(values): return {"count": counts}
+    order = np.lexsort((values, codes))  # 그룹 -> 금리 순으로 정렬하면 그룹마다 연속 구간이 됩니다.
+    values, codes = values[order], codes[order]
+    starts = np.cumsum(counts) - counts
+    spans = np.maximum(counts - 1, 0)
+
+    def clip(pos):
+        # 빈 그룹은 위치 0을 읽게 하고, 결과에서 count == 0으로 걸러냅니다.
+        return np.where(counts > 0, pos, 0)
+
+    def quantile(q):
+        # 선형 보간 (numpy.percentile 기본값과 같은 방식)
+        pos = starts + q * spans
+        lo = np.floor(pos).astype(np.int64)
+        hi = np.minimum(lo + 1, starts + spans)
+        return values[clip(lo)] + (pos - lo) * (values[clip(hi)] - values[clip(lo)])
+
+    return {"count": counts, "min": values[clip(starts)], "max": values[clip(starts + spans)],
+            "mean": np.bincount(codes, weights=values, minlength=n_groups) / np.maximum(counts, 1),
+            "median": quantile(0.5), **{f"p{p}": quantile(p / 100) for p in PERCENTILES}}
+
+def stats_by_name(columns, names):
+    return {name: {key: int(col[g]) if key == "count" else round(float(col[g]), 4) for key, col in columns.items()}
+            for g, name in enumerate(names) if columns["count"][g]}
+
+def build_kfcc_stats(data):
+    """KFCC 결과로 상품별 전국/시도/시군구 통계를 만듭니다."""
+    items = data.get("data") or []
+    stats = {"last_updated": data.get("last_updated"), "branches": {"all": len(items), "regions": {}, "districts": {}}, "products": {}}
+    if not items: return stats
+
+    regions = [region_of(item) for item in items]
+    products = sorted({product for item in items for product in (item.get("rates") or {})})
+    rates = np.array([[to_rate((item.get("rates") or {}).get(product)) or np.nan for product in products] for item in items],
+                     dtype=np.float64).reshape(len(items), len(products))
+    r1_names, r1_codes = np.unique([r1 for r1, _ in regions], return_inverse=True)
+    district_names, district_codes = np.unique([f"{r1}/{r2}" for r1, r2 in regions], return_inverse=True)
+    levels = {"regions": (r1_names.tolist(), r1_codes.ravel()), "districts": (district_names.tolist(), district_codes.ravel())}
+
+    for level, (names, codes) in levels.items():
+        stats["branches"][level] = {name: int(c) for name, c in zip(names, np.bincount(codes, minlength=len(names)))}
+    for j, product in enumerate(products):
+        column = rates[:, j]
+        entry = {"all": stats_by_name(group_stats(column, np.zeros(len(items), dtype=np.int64), 1), ["all"]).get("all", {"count": 0})}
+        for level, (names, codes) in levels.items():
+            entry[level] = stats_by_name(group_stats(column, codes, len(names)), names)
+        stats["products"][product] = entry
+    return stats
+
+async def load_kfcc_stats():
+    """L1 -> Redis -> KFCC 데이터에서 새로 계산 순으로 통계 엔트리를 반환합니다."""
+    entry = l1_get(KFCC_STATS_KEY)
+    if entry: return entry
+    entry = await redis_load_entry(KFCC_STATS_KEY)
+    if entry: return entry
+    kfcc = await load_kfcc_entry()
+    if not kfcc or not kfcc["data"].get("data"): return None
+    return await store_entry(KFCC_STATS_KEY, await asyncio.to_thread(build_kfcc_stats, kfcc["data"]))
+
+@router.get("/api/kfcc/stats")
+async def get_kfcc_stats(request: Request):
+    """상품별 전국(all) / 시도(regions) / 시군구(districts, "r1/r2") 금리 통계와 지역별 지점 수(branches)."""
+    entry = await load_kfcc_stats()
+    if entry: return entry_response(request, entry)
+    return {"last_updated": None, "message": "데이터가 없습니다.", "branches": {}, "products": {}}
+
+async def store_kfcc_index(index):
+    body = json.dumps(index, ensure_ascii=False).encode("utf-8")
+    if rb:
+        try: await rb.setex(KFCC_INDEX_KEY, CACHE_EXPIRE, body)
+        except Exception as e: print(f"KFCC index store failed: {e}")
+    return l1_set(KFCC_INDEX_KEY, index, body)
+
+async def load_kfcc_index():
+    """L1 -> Redis -> KFCC 데이터에서 새로 만들기 순으로 정렬 인덱스 엔트리를 반환합니다."""
+    entry = l1_get(KFCC_INDEX_KEY)
+    if entry: return entry
+    if rb:
+        try:
+            body = await rb.get(KFCC_INDEX_KEY)
+            if body: return l1_set(KFCC_INDEX_KEY, json.loads(body), body)
+        except Exception as e: print(f"KFCC index load failed: {e}")
+    kfcc = await load_kfcc_entry()
+    if not kfcc or not kfcc["data"].get("data"): return None
+    return await store_kfcc_index(build_kfcc_index(kfcc["data"]))
+
+def resolve_product(product):
+    return PRODUCT_ALIASES.get(product, product)
+
+@router.get("/api/kfcc/top")
+async def get_kfcc_top(request: Request, product: str = "dep", region: str = "", order: str = "desc",
+                       n: int = Query(TOP_DEFAULT, ge=1, le=TOP_MAX), offset: int = Query(0, ge=0)):
+    """상품별 금리 순위. region은 "서울" 또는 "서울/강남구" 형식이며, order는 desc(높은 순) | asc입니다."""
+    if order not in ("desc", "asc"): raise HTTPException(status_code=400, detail="order must be desc or asc")
+    entry = await load_kfcc_index()
+    if not entry: return {"last_updated": None, "message": "데이터가 없습니다.", "total": 0, "data": []}
+    index, name = entry["data"], resolve_product(product)
+    if name not in index["lists"]: raise HTTPException(status_code=400, detail=f"unknown product: {product}")
+
+    # 같은 인덱스 + 같은 조회 조건이면 같은 응답이므로 ETag로 재전송을 생략합니다.
+    query = hashlib.sha1(f"{name}|{region}|{order}|{n}|{offset}".encode()).hexdigest()[:8]
+    etag = f'{entry["etag"][:-1]}-{query}"'
+    if etag_matches(request, etag): return entry_response(request, {"etag": etag, "variants": {}})
+
+    ids = index["lists"][name].get(region.strip("/"), [])
+    if order == "asc": ids = ids[::-1]
+    rows = [{**index["rows"][row_id], "rank": offset + i + 1} for i, row_id in enumerate(ids[offset:offset + n])]
+    body = json.dumps({"last_updated": index["last_updated"], "product": name, "region": region, "order": order,
+                       "branches": len(index["rows"]), "total": len(ids),
+                       "offset": offset, "next_offset": offset + n if offset + n < len(ids) else None, "data": rows},
+                      ensure_ascii=False).encode("utf-8")
+    return entry_response(request, {"body": body, "etag": etag, "variants": compress_body(body, quality=5)})
+
+@router.get("/api/kfcc/history")
+def get_kfcc_history(gmgoCd: str | None = None, product: str | None = None, interval: str = "day",
+                     start: str | None = Query(None, alias="from"), end: str | None = Query(None, alias="to")):
+    """금리 이력. gmgoCd가 있으면 그 지점, 없으면 전체 지점의 상품별 시계열입니다.
+    from/to는 YYYY-MM-DD(기본: 최근 90일), interval은 day | week | month이며 day가 아니면 구간별 평균/최소/최대로 묶습니다."""
+    if interval not in kfcc_history.INTERVALS: raise HTTPException(status_code=400, detail="interval must be day, week or month")
+    last = kfcc_history.to_day(end) if end else kfcc_history.to_day(datetime.now(seoul_tz).strftime("%Y-%m-%d"))
+    first = kfcc_history.to_day(start) if start else (last - HISTORY_DEFAULT_DAYS + 1 if last is not None else None)
+    if first is None or last is None: raise HTTPException(status_code=400, detail="from/to must be YYYY-MM-DD")
+    if first > last or last - first >= HISTORY_MAX_DAYS:
+        raise HTTPException(status_code=400, detail=f"date range must be within {HISTORY_MAX_DAYS} days")
+    series = kfcc_history.series(first, last, gmgoCd, resolve_product(product) if product else None, interval)
+    return {"gmgoCd": gmgoCd, "from": kfcc_history.day_text(first), "to": kfcc_history.day_text(last), "interval": interval, "series": series}
+
+@router.get("/api/kfcc/changes")
+def get_kfcc_changes(since: int | None = Query(None, ge=0), limit: int = Query(30, ge=1, le=100)):
+    """수집 간 금리 변경 피드. since(마지막으로 받은 cursor) 이후의 신규/삭제/변경 지점만 돌려줍니다.
+    reset이 true이면 보관 범위를 벗어난 것이므로 /api/kfcc 전체를 다시 받아야 합니다."""
+    return kfcc_changes.changes_since(since, limit)
+
 @router.get("/kfcc", response_class=HTMLResponse)
-def view_kfcc_page():
-    try:
-        # Assuming kfcc.html is in the templates folder for consistency
-        path = os.path.join("templates", "kfcc.html")
-        if not os.path.exists(path):
-            # Fallback to root directory if not found in templates
-            path = "kfcc.html"
-            
-        with open(path, "r", encoding="utf-8") as f: return f.read()
-    except: return "kfcc.html not found"
+def view_kfcc_page(request: Request):
+    return template_response(request, "kfcc.html")
 
 @router.post("/api/kfcc/update")
-async def update_kfcc_data(background_tasks: BackgroundTasks):
-    background_tasks.add_task(background_crawl_kfcc)
-    return {"status": "started"}
+async def update_kfcc_data():
+    job, created = await jobs.enqueue("kfcc")
+    return jobs.job_response(job, created)
+
+def read_json(path):
+    with open(path, "r", encoding="utf-8") as f: return json.load(f)
+
+async def publish_kfcc_index(data):
+    """게시된 KFCC 결과로 정렬 인덱스와 통계를 다시 만들어 Redis/L1에 올리고, 다른 프로세스의 L1을 비웁니다."""
+    invalidate_cache(KFCC_INDEX_KEY)
+    index = await asyncio.to_thread(build_kfcc_index, data)
+    await store_kfcc_index(index)
+    await broadcast_invalidation(KFCC_INDEX_KEY)
+    invalidate_cache(KFCC_STATS_KEY)
+    await store_entry(KFCC_STATS_KEY, await asyncio.to_thread(build_kfcc_stats, data))
+    await broadcast_invalidation(KFCC_STATS_KEY)
+
+def report_bank_progress(done, total):
+    jobs.report_progress(banks_done=done, banks_total=total)
 
 async def background_crawl_kfcc():
     try:
         print(f"[{datetime.now(seoul_tz)}] Starting KFCC background crawl...")
         from kfcc_crawler import run_crawler
-        data = await run_crawler()
-        if not data: return
         current_time = datetime.now(seoul_tz).strftime('%Y-%m-%d %H:%M:%S')
-        save_data = {"last_updated": current_time, "data": data}
-        with open("kfcc_data.json", "w", encoding="utf-8") as f:
-            json.dump(save_data, f, ensure_ascii=False, indent=2)
-        if r: r.setex(KFCC_CACHE_KEY, CACHE_EXPIRE, json.dumps(save_data))
+        # 크롤러가 결과를 KFCC_DATA_FILE에 스트리밍으로 기록(임시 파일 + rename)하므로, 여기서는 파일을 그대로 게시합니다.
+        count = await run_crawler(output_path=KFCC_DATA_FILE, last_updated=current_time, on_progress=report_bank_progress)
+        if not count: raise RuntimeError("KFCC crawl returned no branches")
+        await publish_cached_file(KFCC_CACHE_KEY, KFCC_DATA_FILE)
+        data = await asyncio.to_thread(read_json, KFCC_DATA_FILE)
+        await publish_kfcc_index(data)
+        rows = await asyncio.to_thread(kfcc_history.append_snapshot, data)
+        print(f"[{datetime.now(seoul_tz)}] KFCC history: {rows} rates appended.")
+        change = await asyncio.to_thread(kfcc_changes.record_changes, data)
+        if change: print(f"[{datetime.now(seoul_tz)}] KFCC changes #{change['seq']}: {len(change['added'])} added, {len(change['removed'])} removed, {len(change['changed'])} changed.")
         print(f"[{datetime.now(seoul_tz)}] KFCC crawl finished.")
-    except Exception as e: print(f"KFCC crawl failed: {e}")
+    except Exception as e:
+        # 작업 큐가 실패로 기록하고 쿨다운을 걸지 않도록 다시 올립니다.
+        print(f"KFCC crawl failed: {e}")
+        raise
@@ -0,0 +1,69 @@
+import os
+import json
+import hashlib
+from shared import data_path
+from kfcc_common import to_rate
+from change_log import read_json, write_atomic, load_entries, last_seq, append_entry, entries_since
+
+# KFCC 금리 변경 피드 (Diff feed)
+# - 게시할 때마다 직전 스냅샷과 지점 코드(gmgoCd) 기준으로 비교하여 신규/삭제/금리 변경 지점을 구합니다.
+#   직전 스냅샷은 SNAPSHOT_FILE에 지점별 금리 해시와 (숫자로 바꾼) 금리만 보관하므로, 비교는 해시가 다른 지점만
+#   금리를 들여다보는 한 번의 선형 순회입니다. 기준일만 바뀐 지점은 변경으로 보지 않습니다.
+# - 변경이 있으면 일련번호(seq)를 붙여 CHANGES_FILE(NDJSON)에 한 줄로 추가하고, 최근 CHANGES_KEEP개만 남깁니다.
+# - 클라이언트는 /api/kfcc/changes?since=<마지막으로 받은 seq>로 그 뒤의 변경만 받아 갑니다 (change_log 참고).
+SNAPSHOT_FILE = os.getenv("KFCC_SNAPSHOT_FILE", data_path("kfcc_snapshot.json"))
+CHANGES_FILE = os.getenv("KFCC_CHANGES_FILE", data_path("kfcc_changes.ndjson"))
+CHANGES_KEEP = int(os.getenv("KFCC_CHANGES_KEEP", "90"))
+
+def normalized_rates(item):
+    return {product: rate for product, value in sorted((item.get("rates") or {}).items()) if (rate := to_rate(value)) is not None}
+
+def rates_hash(rates):
+    return hashlib.blake2b(json.dumps(rates, sort_keys=True).encode(), digest_size=8).hexdigest()
+
+def build_snapshot(data):
+    branches = {}
+    for item in data.get("data") or []:
+        if not item.get("gmgoCd"): continue
+        rates = normalized_rates(item)
+        branches[str(item["gmgoCd"])] = {"h": rates_hash(rates), "gmgoNm": item.get("gmgoNm"), "rates": rates}
+    return {"last_updated": data.get("last_updated"), "branches": branches}
+
+def diff_snapshots(prev, curr):
+    """(추가, 삭제, 변경) 목록. 변경은 바뀐 상품만 {상품: {"old", "new"}}로 담습니다 (없어진 상품은 new=None)."""
+    added, changed = [], []
+    old_branches = prev["branches"]
+    for code, branch in curr["branches"].items():
+        old = old_branches.get(code)
+        if old is None:
+            added.append({"gmgoCd": code, "gmgoNm": branch["gmgoNm"], "rates": branch["rates"]})
+        elif old["h"] != branch["h"]:
+            rates = {product: {"old": old["rates"].get(product), "new": branch["rates"].get(product)}
+                     for product in sorted(old["rates"].keys() | branch["rates"].keys())
+                     if old["rates"].get(product) != branch["rates"].get(product)}
+            if rates: changed.append({"gmgoCd": code, "gmgoNm": branch["gmgoNm"], "rates": rates})
+    removed = [{"gmgoCd": code, "gmgoNm": old["gmgoNm"], "rates": old["rates"]}
+               for code, old in old_branches.items() if code not in curr["branches"]]
+    return added, removed, changed
+
+def record_changes(data):
+    """직전 스냅샷과 비교하여 변경 로그에 추가하고 스냅샷을 교체합니다. 추가한 항목(없으면 None)을 반환합니다.
+    첫 실행(직전 스냅샷 없음)은 기준점만 저장합니다."""
+    prev, curr = read_json(SNAPSHOT_FILE), build_snapshot(data)
+    entry = None
+    if prev and prev.get("branches") is not None:
+        added, removed, changed = diff_snapshots(prev, curr)
+        if added or removed or changed:
+            entry = {"seq": last_seq(CHANGES_FILE) + 1, "last_updated": curr["last_updated"],
+                     "previous": prev.get("last_updated"), "added": added, "removed": removed, "changed": changed}
+            append_entry(CHANGES_FILE, entry, CHANGES_KEEP)
+    write_atomic(SNAPSHOT_FILE, json.dumps(curr, ensure_ascii=False))
+    return entry
+
+def changes_since(since=None, limit=CHANGES_KEEP):
+    """since 이후의 변경 항목. since가 없으면 최근 limit개입니다."""
+    if since is None:
+        entries = load_entries(CHANGES_FILE)
+        return {"cursor": entries[-1]["seq"] if entries else 0, "reset": False, "more": False, "changes": entries[-limit:]}
+    changes, cursor, reset, more = entries_since(CHANGES_FILE, since, limit)
+    return {"cursor": cursor, "reset": reset, "more": more, "changes": changes}
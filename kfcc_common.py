@@ -0,0 +1,14 @@
+# KFCC 결과 레코드를 읽는 공통 함수 (kfcc, kfcc_history, kfcc_changes가 함께 씁니다)
+
+def to_rate(value):
+    """금리 문자열 -> 숫자. 숫자가 아니거나 0 이하면 None."""
+    try:
+        rate = float(value)
+    except (TypeError, ValueError):
+        return None
+    return rate if rate > 0 else None
+
+def region_of(item):
+    """(r1, r2). r1/r2가 없는 이전 형식의 레코드는 주소 앞부분으로 대신합니다."""
+    words = (item.get("location") or "").split()
+    return item.get("r1") or (words[0] if words else ""), item.get("r2") or (words[1] if len(words) > 1 else "")
@@ -1,8 +1,14 @@
 import asyncio
 import httpx
-from bs4 import BeautifulSoup
+import lxml.html
+from lxml import etree
 import re
 import json
+import os
+import time
+import hashlib
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from adaptive_limiter import AdaptiveLimiter, request_with_retry
 
 # KFCC 지역 데이터 (Regions)
 ALL_REGIONS = [
@@ -30,6 +36,41 @@ HEADERS = {
     "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
 }
 
+# 증분 크롤링 (Incremental crawl)
+# - 지역 -> 금고 목록은 자주 바뀌지 않으므로 REGION_TTL 동안 상태 파일의 목록을 재사용합니다.
+# - 금고별로 금리 페이지 지문(금리표 + 기준일 영역의 해시)을 저장해 두고, 지문이 같으면 파싱을 건너뛰고 이전 결과를 재사용합니다.
+# - 서버가 ETag / Last-Modified를 주면 다음 실행에서 조건부 요청(If-None-Match / If-Modified-Since)을 보냅니다.
+BASE_URL = os.getenv("KFCC_BASE_URL", "https://www.kfcc.co.kr")
+# 재시도를 모두 소진한 요청은 전체 수집이 끝난 뒤 SWEEP_DELAY초 쉬고 한 번 더 시도합니다.
+SWEEP_DELAY = float(os.getenv("KFCC_SWEEP_DELAY", "5"))
+PROGRESS_EVERY = 100
+# 상태/결과 파일은 CRAWL_DATA_DIR(shared.data_path와 같은 규칙) 아래에 둡니다. 워커 컨테이너를 다시 띄워도 이어서 증분 수집합니다.
+# (파싱 프로세스 풀이 이 모듈을 import하므로 Redis에 연결하는 shared는 가져오지 않습니다.)
+DATA_DIR = os.getenv("CRAWL_DATA_DIR", "")
+STATE_FILE = os.getenv("KFCC_STATE_FILE", os.path.join(DATA_DIR, "kfcc_crawl_state.json"))
+# 결과 영속화 (Streaming persistence)
+# - 금고별 결과는 끝나는 즉시 PARTIAL_FILE(NDJSON)에 한 줄씩 추가하므로, 결과 목록을 메모리에 들고 있지 않습니다.
+# - 중간에 프로세스가 죽어도 RESUME_TTL 이내에 다시 실행하면 이미 끝난 금고는 건너뛰고 이어서 수집합니다.
+# - 수집이 끝나면 출력 파일을 임시 파일에 스트리밍으로 쓴 뒤 rename으로 교체하고, PARTIAL_FILE은 BRANCHES_FILE이 되어
+#   다음 증분 실행의 금고별 이전 상태(지문 + 결과)로 쓰입니다.
+PARTIAL_FILE = os.getenv("KFCC_PARTIAL_FILE", os.path.join(DATA_DIR, "kfcc_crawl_partial.ndjson"))
+BRANCHES_FILE = os.getenv("KFCC_BRANCHES_FILE", os.path.join(DATA_DIR, "kfcc_branches.ndjson"))
+RESUME_TTL = int(os.getenv("KFCC_RESUME_HOURS", "12")) * 3600
+# 파싱 단계 (Parse stage)
+# - 금리 페이지 파싱은 이벤트 루프 밖(프로세스 풀)에서 실행하여, 같은 프로세스의 API 응답이 크롤링 중에도 지연되지 않게 합니다.
+# - 수집 워커와 파싱 워커 사이에는 크기가 제한된 큐를 두어, 파싱이 밀리면 수집도 함께 기다립니다 (backpressure).
+PARSE_EXECUTOR = os.getenv("KFCC_PARSE_EXECUTOR", "process")  # process | thread
+PARSE_WORKERS = int(os.getenv("KFCC_PARSE_WORKERS", str(min(4, os.cpu_count() or 1))))
+PARSE_QUEUE_SIZE = int(os.getenv("KFCC_PARSE_QUEUE_SIZE", "32"))
+INCREMENTAL = os.getenv("KFCC_INCREMENTAL", "1") == "1"
+REGION_TTL = int(os.getenv("KFCC_REGION_TTL_HOURS", "168")) * 3600
+GUBUN_CODES = ("13", "14")  # 13: 거치식예탁금, 14: 적립식예탁금
+FINGERPRINT_START = 'class="base-date"'
+FINGERPRINT_END = "<!-- 요구불예금 조회 내용 끝 -->"
+
+# 마지막 실행 통계 (skipped: 변경 없음, refreshed: 다시 파싱, failed: 재시도 후에도 요청/파싱 실패, parse_errors: 파싱 예외 횟수)
+last_run_stats = {}
+
 # 수집 대상 상품 (MG더뱅킹 3종)
 TARGET_PRODUCTS = ["MG더뱅킹정기예금", "MG더뱅킹정기적금", "MG더뱅킹자유적금"]
 
@@ -43,32 +84,41 @@ def parse_rate(val):
 def cleanup_title(title):
     return re.sub(r"\s+", "", title)
 
+# lxml의 HTML 파서 + XPath로 직접 탐색합니다 (BeautifulSoup 래퍼 없이 같은 libxml2 트리를 사용).
+UTF8_PARSER = lxml.html.HTMLParser(encoding="utf-8")
+BASE_DATE_XPATH = etree.XPath('(//*[contains(concat(" ", normalize-space(@class), " "), " base-date ")])[1]')
+SECTION_XPATH = etree.XPath('//*[@id="divTmp1"]')
+TITLE_XPATH = etree.XPath('(.//*[contains(concat(" ", normalize-space(@class), " "), " tbl-tit ")])[1]')
+ROW_XPATH = etree.XPath('.//tbody//tr')
+COL_XPATH = etree.XPath('.//td')
+ROW_ANY_XPATH = etree.XPath('//tr')
+SPAN_TITLE_XPATH = etree.XPath('.//span[@title]')
+
 def parse_html(html):
-    soup = BeautifulSoup(html, "lxml")
+    if isinstance(html, str): html = html.encode("utf-8")
+    doc = lxml.html.document_fromstring(html, parser=UTF8_PARSER)
     
     base_date = ""
-    date_elem = soup.select_one(".base-date")
+    date_elem = BASE_DATE_XPATH(doc)
     if date_elem:
-        m = re.search(r"\d{4}/\d{2}/\d{2}", date_elem.text)
+        m = re.search(r"\d{4}/\d{2}/\d{2}", date_elem[0].text_content())
         if m: base_date = m.group(0)
 
     # 12개월 금리만 추출
     rates = {}
     
-    sections = soup.select("#divTmp1")
-    for sec in sections:
-        tit_elem = sec.select_one(".tbl-tit")
+    for sec in SECTION_XPATH(doc):
+        tit_elem = TITLE_XPATH(sec)
         if not tit_elem: continue
-        title = cleanup_title(tit_elem.text.strip())
+        title = cleanup_title(tit_elem[0].text_content().strip())
         
         # 지정된 3가지 상품만 수집
         if title in TARGET_PRODUCTS:
-            rows = sec.select("tbody tr")
-            for row in rows:
-                cols = row.select("td")
+            for row in ROW_XPATH(sec):
+                cols = COL_XPATH(row)
                 if len(cols) >= 2:
-                    period_txt = cols[-2].text.strip()
-                    rate_txt = cols[-1].text.strip()
+                    period_txt = cols[-2].text_content().strip()
+                    rate_txt = cols[-1].text_content().strip()
                     
                     # "12개월" 키워드 정밀 매칭
                     if "12" in period_txt and "개월" in period_txt:
@@ -79,117 +129,428 @@ def parse_html(html):
                             
     return base_date, rates
 
-async def fetch_region_banks(client, r1, r2):
-    url = f"https://www.kfcc.co.kr/map/list.do?r1={r1}&r2={r2}"
-    if r1 == "세종": url = f"https://www.kfcc.co.kr/map/list.do?r1={r1}&r2="
-    
+def parse_bank_pages(bodies):
+    """금고 하나의 금리 페이지들(gubuncode -> HTML)을 파싱합니다. 프로세스 풀에서 실행됩니다.
+    기준일은 거치식(13) 페이지를 우선합니다."""
+    base_date, rates = None, {}
+    for gubun in GUBUN_CODES:
+        html = bodies.get(gubun)
+        if not html: continue
+        date, page_rates = parse_html(html)
+        if date and not base_date: base_date = date
+        rates.update(page_rates)
+    return base_date, rates
+
+def bank_data(bank, base_date, rates):
+    return {"gmgoCd": bank["gmgoCd"], "gmgoNm": bank["gmgoNm"], "location": bank["addr"], "r1": bank.get("r1"), "r2": bank.get("r2"), "rates": rates, "기준일": base_date}
+
+def create_parse_pool():
+    """파싱 전용 실행기. 프로세스 풀을 만들 수 없는 환경이면 스레드 풀로 대체합니다 (lxml은 파싱 중 GIL을 놓습니다)."""
+    if PARSE_EXECUTOR == "process":
+        try:
+            return ProcessPoolExecutor(max_workers=PARSE_WORKERS)
+        except (OSError, NotImplementedError, ImportError) as e:
+            print(f"[KFCC] Process pool unavailable ({e}), parsing in threads.")
+    return ThreadPoolExecutor(max_workers=PARSE_WORKERS, thread_name_prefix="kfcc-parse")
+
+def page_fingerprint(html):
+    """금리표와 조회기준일이 들어 있는 영역만 잘라 공백을 정리한 뒤 해시합니다 (파싱 없이 계산)."""
+    start = html.find(FINGERPRINT_START)
+    end = html.find(FINGERPRINT_END, start if start >= 0 else 0)
+    section = html[start if start >= 0 else 0:end if end >= 0 else len(html)]
+    return hashlib.sha1(" ".join(section.split()).encode("utf-8")).hexdigest()
+
+def load_state(path=STATE_FILE):
     try:
-        resp = await client.get(url, headers=HEADERS, timeout=15)
-        if resp.status_code != 200: return []
+        with open(path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+        if isinstance(state, dict): return {"regions": state.get("regions") or {}}
+    except (OSError, ValueError): pass
+    return {"regions": {}}
+
+def save_state(state, path=STATE_FILE):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+class BranchLog:
+    """금고 결과를 한 줄에 하나씩 담는 추가 전용 NDJSON 파일.
+    메모리에는 gmgoCd -> 파일 오프셋만 두고, 레코드는 필요할 때 파일에서 읽습니다. 같은 금고가 여러 번 기록되면 마지막 줄이 유효합니다."""
+
+    def __init__(self, path, writable=False):
+        self.path = path
+        self.offsets = {}
+        self.meta = {}
+        self._reader = None
+        self._writer = None
+        if os.path.exists(path): self._index()
+        if writable:
+            self._writer = open(path, "ab")
+
+    def _index(self):
+        good = 0
+        with open(self.path, "rb") as f:
+            while True:
+                offset = f.tell()
+                line = f.readline()
+                if not line: break
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break  # 기록 도중 중단된 마지막 줄
+                if not line.endswith(b"\n"): break
+                good = f.tell()
+                if "_meta" in record: self.meta = record["_meta"]
+                elif record.get("gmgoCd"): self.offsets[record["gmgoCd"]] = offset
+        if good < os.path.getsize(self.path):
+            # 잘린 꼬리는 잘라내어 이어 쓰기가 올바른 줄 경계에서 시작되도록 합니다.
+            with open(self.path, "r+b") as f: f.truncate(good)
+
+    def __contains__(self, gmgoCd):
+        return gmgoCd in self.offsets
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def get(self, gmgoCd):
+        offset = self.offsets.get(gmgoCd)
+        if offset is None: return None
+        if self._writer: self._writer.flush()
+        if self._reader is None: self._reader = open(self.path, "rb")
+        self._reader.seek(offset)
+        return json.loads(self._reader.readline())
+
+    def append(self, record):
+        line = (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+        offset = self._writer.tell()
+        self._writer.write(line)
+        if "_meta" in record: self.meta = record["_meta"]
+        else: self.offsets[record["gmgoCd"]] = offset
+
+    def flush(self, sync=False):
+        if not self._writer: return
+        self._writer.flush()
+        if sync: os.fsync(self._writer.fileno())
+
+    def close(self):
+        for f in (self._reader, self._writer):
+            if f: f.close()
+        self._reader = self._writer = None
+
+def open_partial_log(incremental):
+    """이전 실행이 남긴 부분 결과가 RESUME_TTL 이내이고 같은 모드면 이어 쓰고, 아니면 새로 시작합니다."""
+    if os.path.exists(PARTIAL_FILE):
+        log = BranchLog(PARTIAL_FILE)
+        log.close()
+        fresh = time.time() - log.meta.get("started", 0) < RESUME_TTL and log.meta.get("incremental") == incremental
+        if fresh and len(log):
+            print(f"[KFCC] Resuming partial crawl: {len(log)} banks already done.")
+            return BranchLog(PARTIAL_FILE, writable=True)
+        os.remove(PARTIAL_FILE)
+    log = BranchLog(PARTIAL_FILE, writable=True)
+    log.append({"_meta": {"started": time.time(), "incremental": incremental}})
+    return log
+
+def write_output(log, banks, output_path, last_updated, stats):
+    """부분 결과 파일에서 금고 목록 순서대로 레코드를 읽어 출력 JSON을 스트리밍으로 쓰고, rename으로 원자적으로 교체합니다."""
+    tmp = f"{output_path}.tmp"
+    count = 0
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write('{"last_updated": ' + json.dumps(last_updated) + ', "crawl_stats": ' + json.dumps(stats, ensure_ascii=False) + ', "data": [')
+        for bank in banks:
+            record = log.get(bank["gmgoCd"])
+            data = record and record.get("data")
+            if not data or not data.get("rates"): continue
+            f.write(("\n" if count == 0 else ",\n") + json.dumps(data, ensure_ascii=False))
+            count += 1
+        f.write("\n]}\n")
+        f.flush(); os.fsync(f.fileno())
+    if count == 0:
+        # 결과가 없으면 기존 파일을 덮어쓰지 않습니다.
+        os.remove(tmp)
+        return 0
+    os.replace(tmp, output_path)
+    return count
+
+def page_state_from(res):
+    """저장할 페이지 상태: 지문과 다음 조건부 요청에 쓸 ETag / Last-Modified."""
+    return {"hash": page_fingerprint(res.text), "etag": res.headers.get("etag"), "last_modified": res.headers.get("last-modified")}
+
+def bank_fingerprint(pages):
+    return hashlib.sha1("|".join(pages[g]["hash"] for g in GUBUN_CODES).encode()).hexdigest()
+
+def conditional_headers(page_state):
+    headers = dict(HEADERS)
+    if page_state.get("etag"): headers["If-None-Match"] = page_state["etag"]
+    if page_state.get("last_modified"): headers["If-Modified-Since"] = page_state["last_modified"]
+    return headers
+
+async def fetch_region_banks(client, r1, r2, limiter):
+    """지역 하나의 금고 목록. 재시도 후에도 실패하면 예외를 올려 호출자가 누락을 알 수 있게 합니다."""
+    url = f"{BASE_URL}/map/list.do?r1={r1}&r2={r2}"
+    if r1 == "세종": url = f"{BASE_URL}/map/list.do?r1={r1}&r2="
+    
+    resp = await request_with_retry(client, limiter, "GET", url, headers=HEADERS, timeout=15)
+    if resp.status_code != 200: return []
+    
+    doc = lxml.html.document_fromstring(resp.text.encode("utf-8"), parser=UTF8_PARSER) if resp.text.strip() else None
+    banks = []
+    for row in (ROW_ANY_XPATH(doc) if doc is not None else []):
+        td = COL_XPATH(row)
+        if not td: continue
+        meta = {}
+        for s in SPAN_TITLE_XPATH(td[0]): meta[s.get("title")] = s.text_content().strip()
         
-        soup = BeautifulSoup(resp.text, "lxml")
-        rows = soup.select("tr")
-        banks = []
-        for row in rows:
-            td = row.select_one("td")
-            if not td: continue
-            meta = {}
-            for s in td.select("span"):
-                if s.has_attr("title"): meta[s["title"]] = s.text.strip()
-            
-            cd = meta.get("gmgoCd") or meta.get("새마을금고코드")
-            nm = meta.get("gmgoNm") or meta.get("새마을금고명")
-            if cd and nm:
-                banks.append({
-                    "gmgoCd": cd,
-                    "gmgoNm": nm,
-                    "r1": r1,
-                    "r2": r2,
-                    "addr": meta.get("addr") or f"{r1} {r2}"
-                })
+        cd = meta.get("gmgoCd") or meta.get("새마을금고코드")
+        nm = meta.get("gmgoNm") or meta.get("새마을금고명")
+        if cd and nm:
+            banks.append({
+                "gmgoCd": cd,
+                "gmgoNm": nm,
+                "r1": r1,
+                "r2": r2,
+                "addr": meta.get("addr") or f"{r1} {r2}"
+            })
+    return banks
+
+async def fetch_all_region_banks(client, limiter, stats):
+    """모든 지역의 금고 목록. 실패한 지역은 마지막에 한 번 더 시도하고, 그래도 실패하면 (r1, r2) 목록으로 돌려줍니다."""
+    pending = [(reg[0], r2) for reg in ALL_REGIONS for r2 in reg[1:]]
+    order = {region: i for i, region in enumerate(pending)}
+    by_region = {}
+
+    async def worker(queue, failed):
+        for r1, r2 in queue:
+            try:
+                by_region[(r1, r2)] = await fetch_region_banks(client, r1, r2, limiter)
+            except Exception:
+                failed.append((r1, r2))
+
+    for sweep in range(2):
+        queue, failed = iter(pending), []
+        await asyncio.gather(*[worker(queue, failed) for _ in range(int(limiter.max_limit))])
+        pending = failed
+        if not pending: break
+        if sweep == 0:
+            print(f"[KFCC] {len(pending)} region lists failed, retrying after {SWEEP_DELAY}s...")
+            await asyncio.sleep(SWEEP_DELAY)
+    if pending: print(f"[KFCC] Region lists failed after retries: {pending}")
+    stats["failed_regions"] = len(pending)
+    # 지역 목록 순서대로 합쳐 출력 순서를 실행마다 같게 유지합니다.
+    banks = {}
+    for region in sorted(by_region, key=order.get):
+        for bank in by_region[region]: banks[bank["gmgoCd"]] = bank
+    return list(banks.values()), pending
+
+async def fetch_bank_pages(client, bank, limiter):
+    """금고 하나의 금리 페이지(gubuncode -> HTML)를 받습니다. 200이 아닌 페이지는 None입니다."""
+    bodies = {}
+    # 13: 거치식예탁금 - MG더뱅킹정기예금 포함 / 14: 적립식예탁금 - MG더뱅킹정기적금/자유적금 포함
+    for gubun in GUBUN_CODES:
+        res = await request_with_retry(client, limiter, "GET", f"{BASE_URL}/map/goods_19.do?OPEN_TRMID={bank['gmgoCd']}&gubuncode={gubun}", headers=HEADERS)
+        bodies[gubun] = res.text if res.status_code == 200 else None
+    return bodies
+
+async def fetch_bank_pages_incremental(client, bank, limiter, prev, stats):
+    """조건부 요청과 페이지 지문으로 바뀐 금고만 골라냅니다.
+    (레코드, 파싱할 페이지)를 반환하며, 바뀌지 않은 금고는 파싱할 페이지가 None이고 레코드에 이전 결과가 들어 있습니다."""
+    gmgoCd = bank["gmgoCd"]
+    pages = prev.get("pages") or {}
+    new_pages, bodies = {}, {}
+    for gubun in GUBUN_CODES:
+        page_state = pages.get(gubun) or {}
+        res = await request_with_retry(client, limiter, "GET", f"{BASE_URL}/map/goods_19.do?OPEN_TRMID={gmgoCd}&gubuncode={gubun}", headers=conditional_headers(page_state))
+        if res.status_code == 304 and page_state.get("hash"):
+            stats["not_modified"] += 1
+            new_pages[gubun] = page_state
+            continue
+        if res.status_code != 200: raise httpx.HTTPStatusError(f"HTTP {res.status_code}", request=res.request, response=res)
+        bodies[gubun] = res.text
+        new_pages[gubun] = page_state_from(res)
+
+    fingerprint = bank_fingerprint(new_pages)
+    if prev.get("data") is not None and fingerprint == prev.get("fingerprint"):
+        stats["skipped"] += 1
+        data = {**prev["data"], "gmgoNm": bank["gmgoNm"], "location": bank["addr"], "r1": bank.get("r1"), "r2": bank.get("r2")}
+        return {"gmgoCd": gmgoCd, "fingerprint": fingerprint, "pages": new_pages, "data": data}, None
+
+    if set(bodies) != set(GUBUN_CODES):
+        # 한쪽 페이지만 304인데 지문이 다르면(이전 상태 불일치) 두 페이지를 조건 없이 다시 받고,
+        # 저장할 페이지 상태와 지문도 실제로 파싱할 새 응답으로 다시 만듭니다.
+        bodies, new_pages = {}, {}
+        for gubun in GUBUN_CODES:
+            res = await request_with_retry(client, limiter, "GET", f"{BASE_URL}/map/goods_19.do?OPEN_TRMID={gmgoCd}&gubuncode={gubun}", headers=HEADERS)
+            if res.status_code != 200: raise httpx.HTTPStatusError(f"HTTP {res.status_code}", request=res.request, response=res)
+            bodies[gubun] = res.text
+            new_pages[gubun] = page_state_from(res)
+        fingerprint = bank_fingerprint(new_pages)
+    return {"gmgoCd": gmgoCd, "fingerprint": fingerprint, "pages": new_pages}, bodies
+
+async def load_region_banks(client, state, stats, limiter):
+    """지역 -> 금고 목록. 상태 파일의 목록이 REGION_TTL 이내면 재사용합니다."""
+    regions = state["regions"]
+    if regions.get("banks") and time.time() - regions.get("updated", 0) < REGION_TTL:
+        stats["region_cache"] = "hit"
+        return regions["banks"]
+
+    banks, failed = await fetch_all_region_banks(client, limiter, stats)
+    if failed and regions.get("banks"):
+        # 실패한 지역은 이전 목록의 금고를 그대로 사용합니다 (목록은 다음 실행에서 다시 갱신).
+        failed = set(failed)
+        known = {b["gmgoCd"] for b in banks}
+        banks += [b for b in regions["banks"] if (b.get("r1"), b.get("r2")) in failed and b["gmgoCd"] not in known]
+        stats["region_cache"] = "partial"
         return banks
-    except Exception as e:
-        return []
-
-async def fetch_bank_rates(client, bank, semaphore):
-    async with semaphore:
-        gmgoCd = bank["gmgoCd"]
-        data = {
-            "gmgoCd": gmgoCd,
-            "gmgoNm": bank["gmgoNm"],
-            "location": bank["addr"],
-            "rates": {},
-            "기준일": None
-        }
-        
+    state["regions"] = {"updated": time.time(), "banks": banks}
+    stats["region_cache"] = "miss"
+    return banks
+
+async def crawl_banks(client, banks, limiter, previous, log, stats, incremental, on_progress=None):
+    """금고별 금리 수집. 수집 워커 -> (제한된 큐) -> 파싱 워커(프로세스 풀) -> log(NDJSON) 순으로 흘러가며,
+    결과를 메모리에 모으지 않습니다. 요청이나 파싱에 실패한 금고는 마지막에 한 번 더 시도합니다."""
+    done = {"count": 0}
+    total = len(banks)
+    loop = asyncio.get_running_loop()
+    parse_queue = asyncio.Queue(maxsize=PARSE_QUEUE_SIZE)
+    parse_failed = []
+
+    def progress():
+        done["count"] += 1
+        if done["count"] % PROGRESS_EVERY == 0 or done["count"] == total:
+            log.flush()
+            print(f"[KFCC] Progress: {done['count']}/{total} banks processed. (concurrency {limiter.limit:.1f}, {limiter.stats['retries']} retries, parse queue {parse_queue.qsize()})")
+            if on_progress: on_progress(done=done["count"], total=total)
+
+    async def crawl_one(bank):
+        prev = previous.get(bank["gmgoCd"]) or {}
         try:
-            # 1. 거치식예탁금 (gubuncode 13) - MG더뱅킹정기예금 포함
-            res_dep = await client.get(f"https://www.kfcc.co.kr/map/goods_19.do?OPEN_TRMID={gmgoCd}&gubuncode=13", headers=HEADERS)
-            if res_dep.status_code == 200:
-                date, r_dep = parse_html(res_dep.text)
-                if date: data["기준일"] = date
-                data["rates"].update(r_dep)
-            
-            # 2. 적립식예탁금 (gubuncode 14) - MG더뱅킹정기적금/자유적금 포함
-            res_sav = await client.get(f"https://www.kfcc.co.kr/map/goods_19.do?OPEN_TRMID={gmgoCd}&gubuncode=14", headers=HEADERS)
-            if res_sav.status_code == 200:
-                _, r_sav = parse_html(res_sav.text)
-                data["rates"].update(r_sav)
-                
-            return data
-        except:
-            return data
-
-async def run_crawler():
-    print("[KFCC] Starting 12-month targeted crawl...")
-    async with httpx.AsyncClient(timeout=20, verify=False) as client:
-        # 1. 금고 목록 수집
-        region_tasks = []
-        for reg in ALL_REGIONS:
-            r1 = reg[0]
-            for r2 in reg[1:]: region_tasks.append(fetch_region_banks(client, r1, r2))
-        
-        region_results = await asyncio.gather(*region_tasks)
-        all_banks = []
-        for res in region_results: all_banks.extend(res)
-        
-        unique_banks = {b['gmgoCd']: b for b in all_banks}.values()
-        print(f"[KFCC] Found {len(unique_banks)} unique banks.")
-        
-        # 2. 금리 정보 수집
-        rate_semaphore = asyncio.Semaphore(15) # 병렬성 약간 조절 (메모리 안정성)
-        results = []
-        unique_banks_list = list(unique_banks)
-        total = len(unique_banks_list)
-        
-        # 전체 태스크를 한꺼번에 만들지 않고 배치 단위로 실행하여 메모리 절약
-        batch_size = 100
-        for i in range(0, total, batch_size):
-            batch = unique_banks_list[i : i + batch_size]
-            rate_tasks = [fetch_bank_rates(client, bank, rate_semaphore) for bank in batch]
-            
-            batch_results = await asyncio.gather(*rate_tasks)
-            for res in batch_results:
-                if res and res.get("rates"):
-                    results.append(res)
+            if incremental:
+                record, bodies = await fetch_bank_pages_incremental(client, bank, limiter, prev, stats)
+            else:
+                record, bodies = {"gmgoCd": bank["gmgoCd"]}, await fetch_bank_pages(client, bank, limiter)
+        except Exception:
+            progress()
+            return False
+        if bodies is None:
+            log.append(record); progress()
+        else:
+            await parse_queue.put((bank, record, bodies))
+        return True
+
+    async def fetch_worker(queue, failed):
+        # 금고마다 태스크를 만들지 않고 고정된 수의 워커가 목록을 나눠 가져가므로, 금고 수와 무관하게 메모리가 일정합니다.
+        for bank in queue:
+            if not await crawl_one(bank): failed.append(bank)
+
+    async def parse_worker(pool):
+        while True:
+            item = await parse_queue.get()
+            if item is None:
+                parse_queue.task_done()
+                break
+            bank, record, bodies = item
+            try:
+                base_date, rates = await loop.run_in_executor(pool, parse_bank_pages, bodies)
+                record["data"] = bank_data(bank, base_date, rates)
+                log.append(record)
+                if incremental: stats["refreshed"] += 1
+            except Exception as e:
+                # 파서가 깨지면 금고가 조용히 빠지지 않도록 실패로 세어 재시도 대상에 넣습니다.
+                print(f"[KFCC] Parse error for {bank['gmgoNm']}({bank['gmgoCd']}): {e}")
+                stats["parse_errors"] += 1
+                parse_failed.append(bank)
+            finally:
+                parse_queue.task_done()
+            progress()
+
+    pending = banks
+    with create_parse_pool() as pool:
+        parsers = [asyncio.create_task(parse_worker(pool)) for _ in range(PARSE_WORKERS * 2)]
+        try:
+            for sweep in range(2):
+                queue, failed = iter(pending), []
+                await asyncio.gather(*[fetch_worker(queue, failed) for _ in range(int(limiter.max_limit))])
+                await parse_queue.join()  # 이번 차례의 파싱 실패까지 모은 뒤 재시도 대상을 정합니다.
+                pending = failed + parse_failed
+                parse_failed.clear()
+                if not pending: break
+                if sweep == 0:
+                    print(f"[KFCC] {len(pending)} banks failed, retrying after {SWEEP_DELAY}s...")
+                    total += len(pending)
+                    await asyncio.sleep(SWEEP_DELAY)
+            for _ in parsers: await parse_queue.put(None)
+            await asyncio.gather(*parsers)
+        finally:
+            for task in parsers: task.cancel()
+
+    stats["failed"] = len(pending)
+    for bank in pending:
+        print(f"[KFCC] Failed to fetch or parse {bank['gmgoNm']}({bank['gmgoCd']}) after retries.")
+        prev = previous.get(bank["gmgoCd"])
+        if prev:
+            # 이전 결과를 그대로 유지합니다.
+            log.append(prev)
+    log.flush(sync=True)
+
+class _NoPrevious:
+    def get(self, gmgoCd): return None
+    def close(self): pass
+
+async def run_crawler(incremental=None, output_path=None, last_updated=None, on_progress=None):
+    """KFCC 금리 수집. output_path가 주어지면 결과를 그 파일에 원자적으로 기록하고 건수를 반환하며,
+    없으면 (기존 호출 방식대로) 결과 목록을 반환합니다."""
+    incremental = INCREMENTAL if incremental is None else incremental
+    print(f"[KFCC] Starting 12-month targeted crawl ({'incremental' if incremental else 'full'})...")
+    started = time.monotonic()
+    state = load_state() if incremental else {"regions": {}}
+    stats = {"skipped": 0, "refreshed": 0, "failed": 0, "parse_errors": 0, "not_modified": 0, "resumed": 0, "region_cache": "off"}
+    limiter = AdaptiveLimiter()
+    log = open_partial_log(incremental)
+    previous = BranchLog(BRANCHES_FILE) if incremental else _NoPrevious()
+    try:
+        async with httpx.AsyncClient(timeout=20, verify=False, limits=httpx.Limits(max_connections=int(limiter.max_limit))) as client:
+            # 1. 금고 목록 수집
+            if incremental:
+                unique_banks_list = await load_region_banks(client, state, stats, limiter)
+                save_state(state)
+            else:
+                unique_banks_list, _ = await fetch_all_region_banks(client, limiter, stats)
+            print(f"[KFCC] Found {len(unique_banks_list)} unique banks. (region cache: {stats['region_cache']})")
             
-            # 진행 상황 출력
-            print(f"[KFCC] Progress: {min(i + batch_size, total)}/{total} banks processed. (Found {len(results)} valid rates)")
+            # 2. 금리 정보 수집 (동시 요청 수는 AdaptiveLimiter가 서버 응답에 맞춰 조절, 이전 실행에서 끝난 금고는 건너뜀)
+            pending = [bank for bank in unique_banks_list if bank["gmgoCd"] not in log]
+            stats["resumed"] = len(unique_banks_list) - len(pending)
+            await crawl_banks(client, pending, limiter, previous, log, stats, incremental, on_progress)
         
-        print(f"[KFCC] Crawl complete. {len(results)} banks with 12-month targeted rates collected.")
-        return results
+        if incremental:
+            print(f"[KFCC] Incremental stats: {stats['skipped']} skipped, {stats['refreshed']} refreshed, {stats['failed']} failed ({stats['parse_errors']} parse errors), {stats['not_modified']} pages not modified (304).")
+        stats["total"] = len(unique_banks_list)
+        stats["elapsed"] = round(time.monotonic() - started, 1)
+        stats["limiter"] = limiter.snapshot()
+        last_run_stats.clear(); last_run_stats.update(stats)
+        print(f"[KFCC] Limiter: {stats['limiter']}")
+
+        # 3. 결과 기록 (목록 순서대로 스트리밍)
+        if output_path:
+            results = count = write_output(log, unique_banks_list, output_path, last_updated, dict(stats))
+        else:
+            results = [rec["data"] for rec in (log.get(b["gmgoCd"]) for b in unique_banks_list) if rec and rec.get("data") and rec["data"].get("rates")]
+            count = len(results)
+    finally:
+        log.close(); previous.close()
+
+    # 완료된 부분 결과는 다음 증분 실행의 이전 상태가 됩니다.
+    os.replace(PARTIAL_FILE, BRANCHES_FILE)
+    print(f"[KFCC] Crawl complete. {count} banks with 12-month targeted rates collected in {stats['elapsed']}s.")
+    return results
 
 if __name__ == "__main__":
     from datetime import datetime
     import pytz
     seoul_tz = pytz.timezone('Asia/Seoul')
     
-    loop = asyncio.get_event_loop()
-    data = loop.run_until_complete(run_crawler())
-    
     current_time = datetime.now(seoul_tz).strftime('%Y-%m-%d %H:%M:%S')
-    save_data = {"last_updated": current_time, "data": data}
-    
-    with open("kfcc_data.json", "w", encoding="utf-8") as f:
-        json.dump(save_data, f, ensure_ascii=False, indent=2)
-    print(f"Saved {len(data)} items to kfcc_data.json")
+    output_path = os.path.join(DATA_DIR, "kfcc_data.json")
+    count = asyncio.run(run_crawler(output_path=output_path, last_updated=current_time))
+    print(f"Saved {count} items to {output_path}")
@@ -0,0 +1,223 @@
+import os
+import numpy as np
+from shared import data_path
+from kfcc_common import to_rate
+
+# KFCC 금리 이력 (Append-only time series)
+# - (gmgoCd, 상품, 기준일)마다 금리 하나를 월별로 열(column) 단위 배열(npz)에 보관합니다.
+#   지점 코드/상품 이름은 파일마다 사전(codes/products)에 한 번만 두고, 행에는 번호만 저장합니다.
+#   branch(int32), product(uint8), day(int32, 1970-01-01부터의 일수), rate(int32, 0.001%p 단위)
+# - 수집 결과 하나는 월마다 새 조각 파일(HISTORY_DIR/YYYY-MM.NNNN.npz)로 쓰고, 이미 있는 파일은 고치지 않습니다.
+#   지나간 달은 그 달에 더 들어오는 행이 없을 때 조각들을 월 파일(HISTORY_DIR/YYYY-MM.npz) 하나로 합치고 조각을 지웁니다.
+#   (합친 뒤 늦게 들어온 행이 있으면 다시 조각이 생기고 다음 추가 때 다시 합칩니다.)
+# - 행은 (지점, 상품, 날짜) 순으로 정렬되어 있어, 지점 하나의 구간을 searchsorted로 바로 찾고
+#   같은 값이 이어지는 열이 많아 압축(np.savez_compressed)이 잘 됩니다.
+# - 같은 키가 다시 들어오면(같은 기준일에 다시 수집) 나중 조각의 값이 남습니다.
+# - 월 배열에는 (상품, 날짜)별 전체 지점 요약(건수/합계/최소/최대, daily_*)도 함께 두어,
+#   지점을 지정하지 않은 전체 집계는 지점별 행 대신 요약 행(월마다 상품 수 x 일수)만 읽습니다.
+# - 조회할 때는 월 파일과 조각들을 합친 배열을 (파일 목록, 수정 시각)과 함께 프로세스 안에 보관하고,
+#   워커 프로세스가 조각을 추가하거나 월을 합치면 다시 읽습니다.
+HISTORY_DIR = os.getenv("KFCC_HISTORY_DIR", data_path("kfcc_history"))
+RATE_SCALE = 1000
+INTERVALS = ("day", "week", "month")
+
+_months = {}  # month -> (files와 수정 시각, arrays)
+
+def to_day(text):
+    """'2026/02/03' 또는 '2026-02-03 04:00:00' -> 1970-01-01부터의 일수. 형식이 다르면 None."""
+    try:
+        return int(np.datetime64(str(text)[:10].replace("/", "-"), "D").astype(np.int64))
+    except ValueError:
+        return None
+
+def day_text(day):
+    return str(np.datetime64(int(day), "D"))
+
+def month_of(day):
+    return str(np.datetime64(int(day), "D").astype("datetime64[M]"))
+
+def month_path(month):
+    return os.path.join(HISTORY_DIR, f"{month}.npz")
+
+def chunk_paths(month):
+    """month의 조각 파일 (쓴 순서대로)."""
+    if not os.path.isdir(HISTORY_DIR): return []
+    prefix = f"{month}."
+    return sorted(os.path.join(HISTORY_DIR, name) for name in os.listdir(HISTORY_DIR)
+                  if name.startswith(prefix) and name.endswith(".npz") and name[len(prefix):-4].isdigit())
+
+def month_files(month):
+    base = month_path(month)
+    return ([base] if os.path.exists(base) else []) + chunk_paths(month)
+
+def daily_summary(product, day, rate):
+    """(상품, 날짜)별 건수/합계/최소/최대."""
+    keys, codes = np.unique(product.astype(np.int64) << 32 | day.astype(np.int64) & 0xFFFFFFFF, return_inverse=True)
+    codes = codes.ravel()
+    low = np.full(len(keys), np.iinfo(np.int32).max, dtype=np.int32); np.minimum.at(low, codes, rate)
+    high = np.full(len(keys), np.iinfo(np.int32).min, dtype=np.int32); np.maximum.at(high, codes, rate)
+    return {"daily_product": (keys >> 32).astype(np.uint8), "daily_day": (keys & 0xFFFFFFFF).astype(np.uint32).astype(np.int32),
+            "daily_count": np.bincount(codes).astype(np.int32), "daily_sum": np.bincount(codes, weights=rate).astype(np.int64),
+            "daily_min": low, "daily_max": high}
+
+def read_npz(path):
+    with np.load(path) as f:
+        return {key: f[key] for key in f.files}
+
+def load_month(month, retries=2):
+    """월 파일과 조각들을 합친 배열. 아무것도 없으면 None."""
+    try:
+        files = month_files(month)
+        if not files:
+            _months.pop(month, None)
+            return None
+        version = tuple((path, os.path.getmtime(path)) for path in files)
+        cached = _months.get(month)
+        if cached and cached[0] == version: return cached[1]
+        parts = [read_npz(path) for path in files]
+    except FileNotFoundError:
+        # 읽는 도중 워커가 조각을 합쳤으면 파일 목록부터 다시 읽습니다.
+        if retries: return load_month(month, retries - 1)
+        raise
+    arrays = parts[0] if len(parts) == 1 else merge_parts(parts)
+    _months[month] = (version, arrays)
+    return arrays
+
+def write_npz(path, arrays):
+    os.makedirs(HISTORY_DIR, exist_ok=True)
+    tmp = f"{path}.tmp.npz"
+    np.savez_compressed(tmp, **arrays)
+    os.replace(tmp, path)
+
+def write_chunk(month, arrays):
+    """month에 새 조각을 추가합니다. 기존 파일은 건드리지 않습니다."""
+    chunks = chunk_paths(month)
+    last = int(os.path.basename(chunks[-1])[len(month) + 1:-4]) if chunks else 0
+    write_npz(os.path.join(HISTORY_DIR, f"{month}.{last + 1:04d}.npz"), arrays)
+
+def compact_month(month):
+    """지나간 달의 조각들을 월 파일 하나로 합칩니다. 합친 조각 수를 반환합니다."""
+    chunks = chunk_paths(month)
+    if not chunks: return 0
+    write_npz(month_path(month), merge_parts([read_npz(path) for path in month_files(month)]))
+    # 지우기 전에 멈춰도 남은 조각은 같은 값이라 다음에 다시 합쳐도 결과가 같습니다.
+    for path in chunks: os.remove(path)
+    _months.pop(month, None)
+    return len(chunks)
+
+def snapshot_rows(data):
+    """KFCC 결과 -> [(gmgoCd, 상품, 일수, 금리(정수))]. 기준일이 없으면 수집일을 씁니다."""
+    crawl_day = to_day(data.get("last_updated"))
+    rows = []
+    for item in data.get("data") or []:
+        day = to_day(item.get("기준일")) if item.get("기준일") else None
+        if day is None: day = crawl_day
+        if day is None or not item.get("gmgoCd"): continue
+        for product, value in (item.get("rates") or {}).items():
+            rate = to_rate(value)
+            if rate is not None: rows.append((str(item["gmgoCd"]), product, day, round(rate * RATE_SCALE)))
+    return rows
+
+def rows_to_arrays(rows):
+    codes, branch = np.unique(np.array([row[0] for row in rows], dtype=str), return_inverse=True)
+    products, product = np.unique(np.array([row[1] for row in rows], dtype=str), return_inverse=True)
+    return {"codes": codes, "products": products, "branch": branch.ravel().astype(np.int32), "product": product.ravel().astype(np.uint8),
+            "day": np.array([row[2] for row in rows], dtype=np.int32), "rate": np.array([row[3] for row in rows], dtype=np.int32)}
+
+def merge_parts(parts):
+    """월 배열들을 합쳐 (지점, 상품, 날짜) 순으로 정렬된 새 배열을 만듭니다. 같은 키는 뒤쪽 배열의 값이 남습니다."""
+    codes = np.unique(np.concatenate([part["codes"] for part in parts]))
+    products = np.unique(np.concatenate([part["products"] for part in parts]))
+    # 사전이 배열마다 다르므로 행의 번호를 합친 사전 기준으로 바꿉니다.
+    branch = np.concatenate([np.searchsorted(codes, part["codes"])[part["branch"]] if len(part["codes"]) else part["branch"] for part in parts]).astype(np.int32)
+    product = np.concatenate([np.searchsorted(products, part["products"])[part["product"]] if len(part["products"]) else part["product"] for part in parts]).astype(np.uint8)
+    day = np.concatenate([part["day"] for part in parts])
+    rate = np.concatenate([part["rate"] for part in parts])
+    # 뒤쪽 배열의 행이 뒤에 있으므로, 키 순으로 안정 정렬한 뒤 같은 키의 마지막 행만 남깁니다.
+    order = np.lexsort((np.arange(len(day)), day, product, branch))
+    branch, product, day, rate = branch[order], product[order], day[order], rate[order]
+    last = np.ones(len(day), dtype=bool)
+    last[:-1] = (branch[1:] != branch[:-1]) | (product[1:] != product[:-1]) | (day[1:] != day[:-1])
+    branch, product, day, rate = branch[last], product[last], day[last], rate[last]
+    return {"codes": codes, "products": products, "branch": branch, "product": product, "day": day, "rate": rate,
+            **daily_summary(product, day, rate)}
+
+def append_snapshot(data):
+    """크롤링 결과 하나를 월별 조각으로 이력에 추가하고, 이번에 행이 없는 지나간 달은 합칩니다. 추가한 행 수를 반환합니다."""
+    rows = snapshot_rows(data)
+    by_month = {}
+    for row in rows: by_month.setdefault(month_of(row[2]), []).append(row)
+    for month, month_rows in by_month.items():
+        write_chunk(month, merge_parts([rows_to_arrays(month_rows)]))
+    crawl_day = to_day(data.get("last_updated"))
+    current = month_of(crawl_day) if crawl_day is not None else max(by_month, default=None)
+    if current and os.path.isdir(HISTORY_DIR):
+        pending = {name.split(".")[0] for name in os.listdir(HISTORY_DIR) if name.count(".") == 2 and name.endswith(".npz")}
+        for month in sorted(pending):
+            if month < current and month not in by_month: compact_month(month)
+    return len(rows)
+
+def months_between(start, end):
+    first, last = np.datetime64(month_of(start)), np.datetime64(month_of(end))
+    return [str(m) for m in np.arange(first, last + 1)]
+
+def query(start, end, gmgoCd=None, product=None):
+    """기간 [start, end](일수)의 행을 모아 (상품 이름 목록, 상품 번호, 날짜, 건수, 합계, 최소, 최대) 열로 반환합니다.
+    gmgoCd가 있으면 그 지점의 행(건수 1, 합계/최소/최대 = 금리), 없으면 전체 지점의 (상품, 날짜)별 요약 행입니다."""
+    parts = []
+    for month in months_between(start, end):
+        arrays = load_month(month)
+        if arrays is None or not len(arrays["day"]): continue
+        if gmgoCd is None:
+            prod, day = arrays["daily_product"], arrays["daily_day"]
+            columns = [arrays["daily_count"], arrays["daily_sum"], arrays["daily_min"], arrays["daily_max"]]
+        else:
+            # 지점 코드 -> 사전 번호 -> 정렬된 branch 열에서 해당 지점의 구간
+            code = np.searchsorted(arrays["codes"], gmgoCd)
+            if code >= len(arrays["codes"]) or arrays["codes"][code] != gmgoCd: continue
+            lo, hi = np.searchsorted(arrays["branch"], code, "left"), np.searchsorted(arrays["branch"], code, "right")
+            prod, day, rate = arrays["product"][lo:hi], arrays["day"][lo:hi], arrays["rate"][lo:hi]
+            columns = [np.ones(len(day), dtype=np.int32), rate, rate, rate]
+        mask = (day >= start) & (day <= end)
+        if product is not None: mask &= arrays["products"][prod] == product
+        parts.append((arrays["products"], prod[mask], day[mask], *[col[mask] for col in columns]))
+    names = sorted({name for products, *_ in parts for name in products.tolist()})
+    if not parts: return names, *[np.array([], dtype=np.int64)] * 6
+    # 월마다 상품 사전이 다를 수 있으므로 전체 이름 목록 기준 번호로 바꿉니다.
+    prod = np.concatenate([np.searchsorted(names, part[0])[part[1]] for part in parts])
+    return names, prod, *[np.concatenate([part[i] for part in parts]) for i in range(2, 7)]
+
+def bucket_of(day, interval):
+    if interval == "week":
+        return (day + 3) // 7 * 7 - 3  # 월요일 시작 (1970-01-01은 목요일)
+    if interval == "month":
+        return day.astype("datetime64[D]").astype("datetime64[M]").astype("datetime64[D]").astype(np.int64)
+    return day
+
+def series(start, end, gmgoCd=None, product=None, interval="day"):
+    """상품별 시계열 {상품: [{"date", "mean", "min", "max", "count"}...]}. 구간(interval)마다 묶어 집계합니다.
+    지점 하나의 일 단위 조회는 집계 없이 {"date", "rate"}를 돌려줍니다."""
+    names, prod, day, count, total, low, high = query(start, end, gmgoCd, product)
+    # 구간 번호는 기간 안의 날짜마다 한 번만 계산해 두고(표), 행에는 표를 인덱싱하여 붙입니다.
+    buckets, table = np.unique(bucket_of(np.arange(start, end + 1), interval), return_inverse=True)
+    result = {}
+    for p, name in enumerate(names):
+        mask = prod == p
+        if not mask.any(): continue
+        d = day[mask].astype(np.int64)
+        if gmgoCd is not None and interval == "day":
+            order = np.argsort(d, kind="stable")
+            result[name] = [{"date": day_text(x), "rate": round(y / RATE_SCALE, 3)} for x, y in zip(d[order].tolist(), total[mask][order].tolist())]
+            continue
+        codes = table.ravel()[d - start]
+        counts = np.bincount(codes, weights=count[mask], minlength=len(buckets))
+        means = np.bincount(codes, weights=total[mask], minlength=len(buckets)) / np.maximum(counts, 1) / RATE_SCALE
+        mins = np.full(len(buckets), np.inf); np.minimum.at(mins, codes, low[mask])
+        maxs = np.full(len(buckets), -np.inf); np.maximum.at(maxs, codes, high[mask])
+        result[name] = [{"date": day_text(b), "mean": round(float(m), 4), "min": round(lo / RATE_SCALE, 3), "max": round(hi / RATE_SCALE, 3), "count": int(c)}
+                        for b, m, lo, hi, c in zip(buckets, means, mins, maxs, counts) if c]
+    return result
+
+def storage_bytes():
+    if not os.path.isdir(HISTORY_DIR): return 0
+    return sum(os.path.getsize(os.path.join(HISTORY_DIR, name)) for name in os.listdir(HISTORY_DIR) if name.endswith(".npz"))
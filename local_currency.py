@@ -1,11 +1,17 @@
 import httpx
 import os
 import json
-from fastapi import APIRouter, Depends, BackgroundTasks
+import time
+import asyncio
+from fastapi import APIRouter, Depends, Request
 from fastapi.responses import HTMLResponse
-from sqlalchemy import Column, Integer, String, Float, Index
+from fastapi import HTTPException
+from sqlalchemy import Column, Integer, String, Float, Index, inspect, text, select, delete, update, bindparam, union_all, or_
 from sqlalchemy.orm import Session
-from shared import Base, engine, get_db, seoul_tz
+from shared import Base, engine, get_db, seoul_tz, template_response, insert_for, data_path
+from geocoder import Geocoder
+from spatial import geohash_encode, cover_ranges, bounding_box, haversine_km
+import jobs
 from datetime import datetime
 
 router = APIRouter()
@@ -21,42 +27,191 @@ class Merchant(Base):
     lon = Column(Float)
     category = Column(String)
     phone = Column(String)
-    last_updated = Column(String)
+    last_updated = Column(String)  # 마지막으로 원본 데이터에서 확인된 동기화 시각
+    # 원본 데이터 기준의 자연 키 (gg: 이름|위도|경도, onnuri: 이름|주소). (type, source_key)로 upsert 합니다.
+    source_key = Column(String)
+    geohash = Column(String)  # spatial.geohash_encode(lat, lon), 반경 검색용
+
+    __table_args__ = (
+        Index("ux_merchants_type_source_key", "type", "source_key", unique=True),
+        Index("ix_merchants_type_geohash", "type", "geohash"),
+    )
 
 # 테이블 생성 함수
 def init_db():
     if engine is not None:
         try:
             Base.metadata.create_all(bind=engine)
+            migrate_merchants()
             print("PostgreSQL tables created successfully")
         except Exception as e:
             print(f"Failed to create tables: {e}")
 
+def migrate_merchants():
+    """기존 merchants 테이블에 source_key/geohash 컬럼과 인덱스를 추가합니다.
+    키가 없는 기존 행은 다음 전체 동기화가 끝날 때 오래된 행으로 정리됩니다."""
+    columns = {col["name"] for col in inspect(engine).get_columns("merchants")}
+    for column in ("source_key", "geohash"):
+        if column not in columns:
+            with engine.begin() as conn:
+                conn.execute(text(f"ALTER TABLE merchants ADD COLUMN {column} VARCHAR"))
+    backfill_geohash()
+    for index in Merchant.__table__.indexes:
+        index.create(bind=engine, checkfirst=True)
+    if engine.dialect.name == "postgresql":
+        # 키워드 검색(ILIKE '%...%')용 트라이그램 인덱스. 확장을 만들 권한이 없으면 인덱스 없이 동작합니다.
+        try:
+            with engine.begin() as conn:
+                conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+                conn.execute(text("CREATE INDEX IF NOT EXISTS ix_merchants_name_trgm ON merchants USING gin (name gin_trgm_ops)"))
+                conn.execute(text("CREATE INDEX IF NOT EXISTS ix_merchants_address_trgm ON merchants USING gin (address gin_trgm_ops)"))
+        except Exception as e:
+            print(f"Trigram indexes not created: {e}")
+
+def backfill_geohash(batch=5000):
+    """geohash가 비어 있는 기존 행을 채웁니다."""
+    filled = 0
+    while True:
+        with engine.begin() as conn:
+            rows = conn.execute(select(Merchant.id, Merchant.lat, Merchant.lon).where(
+                Merchant.geohash.is_(None), Merchant.lat.is_not(None), Merchant.lon.is_not(None)).limit(batch)).all()
+            if not rows: break
+            conn.execute(update(Merchant.__table__).where(Merchant.__table__.c.id == bindparam("_id")).values(geohash=bindparam("_geohash")),
+                         [{"_id": id_, "_geohash": geohash_encode(lat, lon)} for id_, lat, lon in rows])
+        filled += len(rows)
+    if filled: print(f"Merchants geohash backfilled: {filled} rows")
+
+# --- 대량 적재 (Bulk upsert) ---
+# 행마다 존재 여부를 조회하는 대신, 페이지 단위 배치를 INSERT ... ON CONFLICT (type, source_key) DO UPDATE 한 번으로 적재하고
+# 배치마다 커밋합니다. 동기화가 끝까지 완료되면 이번 실행에서 확인되지 않은 행(원본에서 사라진 가맹점)을 지웁니다.
+UPSERT_BATCH = int(os.getenv("MERCHANT_UPSERT_BATCH", "1000"))
+UPSERT_FIELDS = ("name", "address", "lat", "lon", "category", "phone", "last_updated", "geohash")
+
+def merchant_key(*parts):
+    return "|".join(str(p).strip() for p in parts)
+
+def upsert_merchants(rows, bind=None):
+    """가맹점 행(dict) 목록을 UPSERT_BATCH 단위로 upsert 하고 적재한 행 수를 반환합니다."""
+    bind = bind or engine
+    # 같은 문장 안에서 같은 키가 두 번 나오면 ON CONFLICT DO UPDATE가 실패하므로 마지막 값만 남깁니다.
+    rows = list({(row["type"], row["source_key"]): {**row, "geohash": geohash_encode(row["lat"], row["lon"])} for row in rows}.values())
+    if not rows: return 0
+    insert = insert_for(bind)
+    stmt = insert(Merchant.__table__)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["type", "source_key"],
+        set_={field: stmt.excluded[field] for field in UPSERT_FIELDS},
+    )
+    for i in range(0, len(rows), UPSERT_BATCH):
+        with bind.begin() as conn:
+            conn.execute(stmt, rows[i:i + UPSERT_BATCH])
+    return len(rows)
+
+def remove_stale_merchants(merchant_type, synced_at, bind=None):
+    """이번 동기화(synced_at)에서 확인되지 않은 행을 지웁니다. 동기화가 끝까지 완료된 경우에만 호출합니다."""
+    bind = bind or engine
+    with bind.begin() as conn:
+        result = conn.execute(delete(Merchant).where(
+            Merchant.type == merchant_type,
+            or_(Merchant.last_updated.is_(None), Merchant.last_updated != synced_at),
+        ))
+    return result.rowcount
+
+def existing_coordinates(merchant_type, keys, bind=None):
+    """이미 적재된 가맹점의 좌표 {source_key: (lat, lon)} (지오코딩 생략용)."""
+    bind = bind or engine
+    if not keys: return {}
+    with bind.connect() as conn:
+        rows = conn.execute(select(Merchant.source_key, Merchant.lat, Merchant.lon).where(
+            Merchant.type == merchant_type, Merchant.source_key.in_(keys)))
+        return {key: (lat, lon) for key, lat, lon in rows}
+
+def gg_merchant_row(item, synced_at):
+    name = item.get("CMPNM_NM")
+    lat = item.get("REFINE_WGS84_LAT")
+    lon = item.get("REFINE_WGS84_LOGT")
+    if not name or not lat or not lon: return None
+    try: lat, lon = float(lat), float(lon)
+    except ValueError: return None
+    return {
+        "type": "gg",
+        "source_key": merchant_key(name, f"{lat:.7f}", f"{lon:.7f}"),
+        "name": name,
+        "address": item.get("REFINE_ROADNM_ADDR") or item.get("REFINE_LOTNO_ADDR"),
+        "lat": lat,
+        "lon": lon,
+        "category": item.get("INDUTYPE_NM"),
+        "phone": item.get("TELNO"),
+        "last_updated": synced_at,
+    }
+
 # API Keys
 GG_KEY = "54450ac8d7d048f8b26d5cba3b983663"
 PUBLIC_DATA_KEY = "af1495f8d5985b1ba537c92f59f43f0454398cd2207b752cbfc11defe011f86f"
 
 @router.get("/local-currency", response_class=HTMLResponse)
-def local_currency_page():
-    path = os.path.join("templates", "local_currency_map.html")
-    with open(path, "r", encoding="utf-8") as f:
-        return HTMLResponse(content=f.read())
+def local_currency_page(request: Request):
+    return template_response(request, "local_currency_map.html")
+
+# --- 반경 검색 ---
+# (type, geohash) 인덱스로 반경을 덮는 셀만 읽고, 하버사인 거리로 정확히 거른 뒤 가까운 순으로 반환합니다.
+# 작은 반경부터 두 배씩 넓혀 가며 한 페이지를 채우면 멈추므로, 밀집 지역에서도 반경 전체를 읽지 않습니다.
+# 다음 페이지는 마지막 항목의 (거리, id)를 커서로 받아 그보다 먼 항목부터 이어갑니다.
+MAX_RADIUS_KM = 20.0
+MAX_PAGE_SIZE = 500
+
+def encode_cursor(distance_km, merchant_id):
+    # 거리를 반올림하면 마지막 항목이 다음 페이지에 다시 나올 수 있으므로 float 값을 그대로 보존합니다.
+    return f"{distance_km:.17g}_{merchant_id}"
+
+def decode_cursor(cursor):
+    try:
+        distance_km, merchant_id = cursor.split("_")
+        return float(distance_km), int(merchant_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def escape_like(keyword):
+    return keyword.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+def nearest_merchants(db, merchant_type, lat, lon, radius_km, limit, after=None, keyword=None):
+    """반경 radius_km 안의 가맹점을 가까운 순으로 최대 limit개 반환합니다. after=(거리, id) 이후부터.
+    반환값: ([(거리 km, 가맹점 행)], 다음 페이지 존재 여부)"""
+    after = after or (-1.0, 0)
+    search_radius = min(radius_km, max(after[0], radius_km / 16, 0.05))
+    table = Merchant.__table__
+    while True:
+        min_lat, max_lat, min_lon, max_lon = bounding_box(lat, lon, search_radius)
+        conditions = [table.c.type == merchant_type, table.c.lat.between(min_lat, max_lat), table.c.lon.between(min_lon, max_lon)]
+        if keyword:
+            pattern = f"%{escape_like(keyword)}%"
+            conditions.append(or_(table.c.name.ilike(pattern, escape="\\"), table.c.address.ilike(pattern, escape="\\")))
+        # 셀 범위마다 (type, geohash) 인덱스 범위 조회가 되도록 OR 대신 UNION ALL로 묶습니다.
+        selects = [select(table).where(table.c.geohash >= lo, *([table.c.geohash < hi] if hi else []), *conditions)
+                   for lo, hi in cover_ranges(lat, lon, search_radius)]
+        hits = []
+        for row in db.execute(union_all(*selects) if len(selects) > 1 else selects[0]):
+            distance = haversine_km(lat, lon, row.lat, row.lon)
+            if distance <= search_radius and (distance, row.id) > after:
+                hits.append((distance, row))
+        # 현재 반경 안의 항목은 반경 밖의 어떤 항목보다도 가까우므로, 한 페이지가 차면 더 넓힐 필요가 없습니다.
+        if len(hits) > limit or search_radius >= radius_km: break
+        search_radius = min(radius_km, search_radius * 2)
+    hits.sort(key=lambda hit: (hit[0], hit[1].id))
+    return hits[:limit], len(hits) > limit
 
 @router.get("/api/local-currency/merchants")
-async def get_merchants(lat: float, lon: float, radius: float = 2.0, type: str = "onnuri", db: Session = Depends(get_db)):
+async def get_merchants(lat: float, lon: float, radius: float = 2.0, type: str = "onnuri", keyword: str = None,
+                        limit: int = 200, cursor: str = None, db: Session = Depends(get_db)):
     if not db:
         return {"data": [], "message": "Database not connected"}
-    
-    # 단순 위경도 사각형 범위로 필터링 (성능을 위해)
-    # 0.01 degree ~= 1.1km
-    delta = radius * 0.01
-    
-    results = db.query(Merchant).filter(
-        Merchant.type == type,
-        Merchant.lat.between(lat - delta, lat + delta),
-        Merchant.lon.between(lon - delta, lon + delta)
-    ).limit(500).all()
-    
+
+    radius = min(max(radius, 0.05), MAX_RADIUS_KM)
+    limit = min(max(limit, 1), MAX_PAGE_SIZE)
+    after = decode_cursor(cursor) if cursor else None
+    keyword = (keyword or "").strip() or None
+    hits, has_more = await asyncio.to_thread(nearest_merchants, db, type, lat, lon, radius, limit, after, keyword)
+
     return {"data": [
         {
             "id": m.id,
@@ -65,185 +220,194 @@ async def get_merchants(lat: float, lon: float, radius: float = 2.0, type: str =
             "y": m.lat,
             "x": m.lon,
             "phone": m.phone,
-            "category_name": m.category
-        } for m in results
-    ]}
+            "category_name": m.category,
+            "distance": round(distance * 1000)
+        } for distance, m in hits
+    ], "next_cursor": encode_cursor(hits[-1][0], hits[-1][1].id) if has_more and hits else None}
 
 @router.post("/api/local-currency/sync")
-async def start_sync_tasks(background_tasks: BackgroundTasks):
-    background_tasks.add_task(sync_all_data)
-    return {"status": "sync_started"}
+async def start_sync_tasks():
+    job, created = await jobs.enqueue("local-currency")
+    return jobs.job_response(job, created)
 
 async def sync_all_data():
+    jobs.report_progress(stage="gyeonggi")
     await sync_gyeonggi_data()
+    jobs.report_progress(stage="onnuri", pages_done=0, pages_total=0)
     await sync_onnuri_data()
 
-async def sync_gyeonggi_data():
-    print("Starting Gyeonggi Local Currency sync...")
-    url = "https://openapi.gg.go.kr/RegionMnyFacltStus"
-    params = {
-        "KEY": GG_KEY,
-        "Type": "json",
-        "pIndex": 1,
-        "pSize": 1000
-    }
-    
+# --- 페이지 수집 파이프라인 ---
+# 정해진 수의 수집 워커가 페이지를 동시에(원본별 초당 요청 수 제한 안에서) 가져와 제한된 큐에 넣고,
+# 적재 워커 하나가 큐에서 꺼내 배치 upsert 합니다. 페이지 수 제한 없이 전체를 수집합니다.
+# 앞에서부터 연속으로 적재가 끝난 페이지를 상태 파일에 기록하여, 중간에 실패하면 다음 실행이 그 다음 페이지부터 이어갑니다.
+GG_URL = "https://openapi.gg.go.kr/RegionMnyFacltStus"
+ONNURI_URL = "https://api.odcloud.kr/api/3060079/v1/uddi:7ffa42f8-01d1-4329-aa94-aefb67c53cf1"
+GG_PAGE_SIZE = 1000
+ONNURI_PAGE_SIZE = int(os.getenv("ONNURI_PAGE_SIZE", "1000"))
+SYNC_CONCURRENCY = int(os.getenv("LOCAL_SYNC_CONCURRENCY", "4"))
+SYNC_QUEUE_SIZE = 8
+# 원본별 초당 요청 수 제한
+SOURCE_RATES = {
+    "gg": float(os.getenv("GG_RATE_PER_SEC", "5")),
+    "onnuri": float(os.getenv("ONNURI_RATE_PER_SEC", "5")),
+}
+SYNC_STATE_FILE = os.getenv("LOCAL_SYNC_STATE_FILE", data_path("merchant_sync_state.json"))
+SYNC_RESUME_TTL = float(os.getenv("LOCAL_SYNC_RESUME_HOURS", "12")) * 3600
+
+def load_sync_state():
+    try:
+        with open(SYNC_STATE_FILE, "r", encoding="utf-8") as f: return json.load(f)
+    except (OSError, ValueError): return {}
+
+def save_sync_state(merchant_type, progress):
+    state = load_sync_state()
+    if progress is None: state.pop(merchant_type, None)
+    else: state[merchant_type] = progress
+    tmp = SYNC_STATE_FILE + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f: json.dump(state, f)
+    os.replace(tmp, SYNC_STATE_FILE)
+
+async def sync_pages(merchant_type, fetch_page, to_rows, page_size):
+    """fetch_page(client, limiter, rate, page) -> (항목 목록, 전체 건수), to_rows(항목 목록, synced_at) -> 적재할 행 목록.
+    모든 페이지를 적재하면 이번 실행에서 확인되지 않은 행을 지우고 True를 반환합니다."""
+    from adaptive_limiter import AdaptiveLimiter, RateLimiter
+    started = time.monotonic()
+    progress = load_sync_state().get(merchant_type)
+    if progress and time.time() - progress["started"] < SYNC_RESUME_TTL:
+        # 이전 실행의 synced_at을 이어 써야 앞서 적재한 행이 오래된 행으로 지워지지 않습니다.
+        print(f"[{datetime.now(seoul_tz)}] {merchant_type} sync: resuming after page {progress['done_upto']}")
+    else:
+        progress = {"synced_at": datetime.now(seoul_tz).strftime('%Y-%m-%d %H:%M:%S'), "started": time.time(), "done_upto": 0}
+    synced_at = progress["synced_at"]
+    limiter = AdaptiveLimiter(initial=SYNC_CONCURRENCY, min_limit=1, max_limit=SYNC_CONCURRENCY)
+    rate = RateLimiter(SOURCE_RATES.get(merchant_type, 0))
+    counts = {"loaded": 0, "failed": 0}
+
     async with httpx.AsyncClient(timeout=60.0) as client:
-        db = None
+        first_items, total_count = await fetch_page(client, limiter, rate, 1)
+        total_pages = -(-total_count // page_size)
+        if total_pages == 0:
+            # 빈 응답으로 기존 가맹점을 모두 지우지 않도록 동기화를 건너뜁니다.
+            print(f"{merchant_type} sync: source returned no merchants, skipping.")
+            return False
+        print(f"Total {merchant_type} merchants found: {total_count} ({total_pages} pages)")
+        pages = iter(range(progress["done_upto"] + 1, total_pages + 1))
+        queue = asyncio.Queue(maxsize=SYNC_QUEUE_SIZE)
+
+        async def fetcher():
+            for page in pages:
+                try:
+                    items = first_items if page == 1 else (await fetch_page(client, limiter, rate, page))[0]
+                except Exception as e:
+                    print(f"{merchant_type} sync: page {page} failed: {e}")
+                    counts["failed"] += 1
+                    continue
+                await queue.put((page, items))
+
+        async def writer():
+            finished = set()
+            while (item := await queue.get()) is not None:
+                page, items = item
+                try:
+                    rows = await to_rows(items, synced_at)
+                    counts["loaded"] += await asyncio.to_thread(upsert_merchants, rows)
+                    finished.add(page)
+                    while progress["done_upto"] + 1 in finished:
+                        progress["done_upto"] += 1
+                        finished.discard(progress["done_upto"])
+                    save_sync_state(merchant_type, progress)
+                except Exception as e:
+                    print(f"{merchant_type} sync: writing page {page} failed: {e}")
+                    counts["failed"] += 1
+                    continue
+                jobs.report_progress(pages_done=progress["done_upto"], pages_total=total_pages)
+
+        write_task = asyncio.create_task(writer())
         try:
-            from shared import SessionLocal
-            db = SessionLocal()
-            if not db: return
-
-            # 첫 페이지를 가져와서 전체 개수 확인
-            resp = await client.get(url, params=params)
-            data = resp.json()
-            
-            head = data.get("RegionMnyFacltStus", [{}])[0].get("head", [])
-            total_count = 0
-            for item in head:
-                if "list_total_count" in item:
-                    total_count = item["list_total_count"]
-                    break
-            
-            print(f"Total Gyeonggi merchants found: {total_count}")
-            # 너무 많으므로 일단 최대 10만건까지만 수집 (100페이지)
-            max_pages = min(100, (total_count // 1000) + 1)
-            
-            for i in range(1, max_pages + 1):
-                params["pIndex"] = i
-                if i > 1: # 첫 페이지는 이미 가져왔으므로
-                    resp = await client.get(url, params=params)
-                    data = resp.json()
-                
-                status_data = data.get("RegionMnyFacltStus", [])
-                if len(status_data) < 2: break
-                
-                items = status_data[1].get("row", [])
-                new_count = 0
-                for item in items:
-                    name = item.get("CMPNM_NM")
-                    lat = item.get("REFINE_WGS84_LAT")
-                    lon = item.get("REFINE_WGS84_LOGT")
-                    if not lat or not lon: continue
-                    
-                    # 중복 확인 (이름과 좌표 기준) - 성능을 위해 한번에 처리하는 것이 좋으나 우선 유지
-                    existing = db.query(Merchant).filter(
-                        Merchant.name == name,
-                        Merchant.lat == float(lat),
-                        Merchant.lon == float(lon)
-                    ).first()
-                    
-                    if not existing:
-                        merchant = Merchant(
-                            name=name,
-                            type="gg",
-                            address=item.get("REFINE_ROADNM_ADDR") or item.get("REFINE_LOTNO_ADDR"),
-                            lat=float(lat),
-                            lon=float(lon),
-                            category=item.get("INDUTYPE_NM"),
-                            phone=item.get("TELNO"),
-                            last_updated=datetime.now(seoul_tz).strftime('%Y-%m-%d %H:%M:%S')
-                        )
-                        db.add(merchant)
-                        new_count += 1
-                
-                db.commit()
-                print(f"Gyeonggi sync: Page {i}/{max_pages} completed. Added {new_count} new records.")
-                
-        except Exception as e:
-            print(f"Gyeonggi sync error: {e}")
-            if db: db.rollback()
+            await asyncio.gather(*[fetcher() for _ in range(SYNC_CONCURRENCY)])
+            await queue.put(None)
+            await write_task
         finally:
-            if db: db.close()
-
-# Kakao REST API Key (for geocoding)
-KAKAO_REST_KEY = os.getenv("KAKAO_REST_KEY", "8220fce5d491da93dda89d8cf3682514") # JS Key may sometimes work or User should provide REST Key
-
-async def get_coordinates(address):
-    if not KAKAO_REST_KEY:
-        return None, None
-    
-    url = "https://dapi.kakao.com/v2/local/search/address.json"
-    headers = {"Authorization": f"KakaoAK {KAKAO_REST_KEY}"}
-    params = {"query": address}
-    
+            write_task.cancel()
+
+    elapsed = time.monotonic() - started
+    if progress["done_upto"] < total_pages:
+        print(f"{merchant_type} sync incomplete: {counts['loaded']} upserted, {counts['failed']} pages failed, resumable after page {progress['done_upto']}/{total_pages} ({elapsed:.1f}s).")
+        return False
+    removed = await asyncio.to_thread(remove_stale_merchants, merchant_type, synced_at)
+    save_sync_state(merchant_type, None)
+    print(f"{merchant_type} sync finished: {counts['loaded']} upserted, {removed} stale removed in {elapsed:.1f}s.")
+    return True
+
+async def fetch_gg_page(client, limiter, rate, page):
+    from adaptive_limiter import request_with_retry
+    params = {"KEY": GG_KEY, "Type": "json", "pIndex": page, "pSize": GG_PAGE_SIZE}
+    res = await request_with_retry(client, limiter, "GET", GG_URL, rate=rate, params=params)
+    res.raise_for_status()
+    data = res.json()
+    status_data = data.get("RegionMnyFacltStus")
+    if not status_data: raise ValueError(f"Unexpected response: {data.get('RESULT')}")
+    total_count = next((h["list_total_count"] for h in status_data[0].get("head", []) if "list_total_count" in h), 0)
+    items = status_data[1].get("row", []) if len(status_data) > 1 else []
+    return items, total_count
+
+async def gg_rows(items, synced_at):
+    return [row for row in (gg_merchant_row(item, synced_at) for item in items) if row]
+
+async def sync_gyeonggi_data():
+    print("Starting Gyeonggi Local Currency sync...")
+    if engine is None: return
     try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            resp = await client.get(url, headers=headers, params=params)
-            if resp.status_code == 200:
-                data = resp.json()
-                documents = data.get("documents", [])
-                if documents:
-                    return float(documents[0]["y"]), float(documents[0]["x"])
+        await sync_pages("gg", fetch_gg_page, gg_rows, GG_PAGE_SIZE)
     except Exception as e:
-        print(f"Geocoding error for {address}: {e}")
-    return None, None
+        print(f"Gyeonggi sync error: {e}")
+
+async def fetch_onnuri_page(client, limiter, rate, page):
+    from adaptive_limiter import request_with_retry
+    params = {"serviceKey": PUBLIC_DATA_KEY, "page": page, "perPage": ONNURI_PAGE_SIZE}
+    res = await request_with_retry(client, limiter, "GET", ONNURI_URL, rate=rate, params=params)
+    res.raise_for_status()
+    data = res.json()
+    return data.get("data", []), data.get("totalCount") or 0
+
+async def onnuri_rows(items, synced_at, geocoder):
+    items = [item for item in items if item.get("가맹점명") and item.get("소재지")]
+    keys = [merchant_key(item["가맹점명"], item["소재지"]) for item in items]
+    # 이미 좌표가 있는 가맹점은 지오코딩하지 않고, 나머지는 페이지 단위로 한 번에 변환합니다 (캐시 우선).
+    known = await asyncio.to_thread(existing_coordinates, "onnuri", keys)
+    coords = await geocoder.geocode_many([item["소재지"] for key, item in zip(keys, items) if key not in known])
+    rows = []
+    for key, item in zip(keys, items):
+        address = item["소재지"]
+        lat, lon = known[key] if key in known else coords[address]
+        if not lat or not lon: continue
+        rows.append({
+            "type": "onnuri",
+            "source_key": key,
+            "name": item["가맹점명"],
+            "address": address,
+            "lat": lat,
+            "lon": lon,
+            "category": item.get("취급품목") or "전통시장",
+            "phone": None, # 이 API에는 전화번호 없음
+            "last_updated": synced_at,
+        })
+    return rows
 
 async def sync_onnuri_data():
     print("Starting Onnuri Merchant sync (New API)...")
-    # 신규 API 엔드포인트
-    url = "https://api.odcloud.kr/api/3060079/v1/uddi:7ffa42f8-01d1-4329-aa94-aefb67c53cf1"
-    params = {
-        "serviceKey": PUBLIC_DATA_KEY,
-        "page": 1,
-        "perPage": 100
-    }
-    
-    async with httpx.AsyncClient(timeout=60.0) as client:
-        db = None
-        try:
-            from shared import SessionLocal
-            db = SessionLocal()
-            if not db: return
-            
-            # 최대 20페이지(2000건) 수집 시도 (지오코딩 할당량 고려)
-            for i in range(1, 21):
-                params["page"] = i
-                resp = await client.get(url, params=params)
-                if resp.status_code != 200: 
-                    print(f"Onnuri API error: {resp.status_code}")
-                    break
-                
-                data = resp.json()
-                items = data.get("data", [])
-                if not items: break
-                
-                new_count = 0
-                for item in items:
-                    name = item.get("가맹점명")
-                    address = item.get("소재지")
-                    if not name or not address: continue
-                    
-                    # 중복 확인
-                    existing = db.query(Merchant).filter(
-                        Merchant.name == name,
-                        Merchant.address == address
-                    ).first()
-                    
-                    if not existing:
-                        # 좌표가 없으므로 지오코딩 수행
-                        lat, lon = await get_coordinates(address)
-                        if not lat or not lon: continue
-                        
-                        merchant = Merchant(
-                            name=name,
-                            type="onnuri",
-                            address=address,
-                            lat=lat,
-                            lon=lon,
-                            category=item.get("취급품목") or "전통시장",
-                            phone=None, # 이 API에는 전화번호 없음
-                            last_updated=datetime.now(seoul_tz).strftime('%Y-%m-%d %H:%M:%S')
-                        )
-                        db.add(merchant)
-                        new_count += 1
-                
-                db.commit()
-                print(f"Onnuri sync: Page {i} completed. Added {new_count} new records.")
-                
-        except Exception as e:
-            print(f"Onnuri sync error: {e}")
-            if db: db.rollback()
-        finally:
-            if db: db.close()
+    if engine is None: return
+    geocoder = Geocoder(engine)
+
+    async def to_rows(items, synced_at):
+        rows = await onnuri_rows(items, synced_at, geocoder)
+        jobs.report_progress(geocode_hit_ratio=round(geocoder.hit_ratio(), 3))
+        return rows
+
+    try:
+        await sync_pages("onnuri", fetch_onnuri_page, to_rows, ONNURI_PAGE_SIZE)
+    except Exception as e:
+        print(f"Onnuri sync error: {e}")
+    finally:
+        await geocoder.close()
+        print(f"Onnuri geocoding: {geocoder.summary()}")
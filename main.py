@@ -1,19 +1,21 @@
 import httpx
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+from fastapi import FastAPI, HTTPException
 from fastapi.responses import HTMLResponse
+from fastapi.staticfiles import StaticFiles
 import os
 import psutil
 import time
 import json
+import asyncio
 import pytz
 from datetime import datetime
-from apscheduler.schedulers.asyncio import AsyncIOScheduler
 
 # 모듈별 라우터 및 유틸리티 임포트
-from shared import r, seoul_tz, CACHE_EXPIRE, boot_time, get_cached_data
+from shared import r, rb, seoul_tz, CACHE_EXPIRE, boot_time, get_cached_data, listen_invalidations, DATA_DIR
 import card_events
 import kfcc
 import local_currency
+import jobs
 
 app = FastAPI()
 
@@ -21,6 +23,9 @@ app = FastAPI()
 app.include_router(card_events.router)
 app.include_router(kfcc.router)
 app.include_router(local_currency.router)
+app.include_router(jobs.router)
+# 여러 페이지가 같이 쓰는 스크립트 (static/card_events_sync.js 등)
+app.mount("/static", StaticFiles(directory="static"), name="static")
 
 # --- 공통 라우터 (대시보드, 헬스체크) ---
 
@@ -211,64 +216,45 @@ def read_root():
     """
     return HTMLResponse(content=html_content)
 
-# --- 스케줄러 설정 ---
-# misfire_grace_time을 설정하여 서버 재시작 시점에 밀린 작업들이 한꺼번에 실행되어 메모리 부족(OOM)으로 크래시되는 것을 방지합니다.
-job_defaults = {
-    'misfire_grace_time': 300, # 5분 이상 지연된 작업은 무시
-    'coalesce': True,
-    'max_instances': 1
-}
-# 스케줄러 인스턴스 생성
-scheduler = AsyncIOScheduler(timezone=seoul_tz, job_defaults=job_defaults)
-    
-# --- 통합 순차 크롤링 태스크 ---
-async def daily_crawl_job():
-    process = psutil.Process(os.getpid())
-    start_mem = process.memory_info().rss / 1024 / 1024
-    print(f"[{datetime.now(seoul_tz)}] Starting sequential daily crawl. Initial memory: {start_mem:.2f} MB")
-    
-    # 1. 새마을금고 크롤링 (데이터량이 많으므로 가장 먼저 수행)
-    try:
-        await kfcc.background_crawl_kfcc()
-    except Exception as e: print(f"Sequential crawl - KFCC error: {e}")
-    
-    # 2. 카드사 크롤링 순차 실행
-    card_tasks = [
-        ("신한", card_events.crawl_shinhan_bg),
-        ("KB", card_events.crawl_kb_bg),
-        ("하나", card_events.crawl_hana_bg),
-        ("우리", card_events.crawl_woori_bg),
-        ("BC", card_events.crawl_bc_bg),
-        ("삼성", card_events.crawl_samsung_bg),
-        ("현대", card_events.crawl_hyundai_bg),
-        ("롯데", card_events.crawl_lotte_bg)
-    ]
-    
-    for name, func in card_tasks:
-        try:
-            print(f"[{datetime.now(seoul_tz)}] Sequential crawl - {name} starting...")
-            await func()
-            current_mem = process.memory_info().rss / 1024 / 1024
-            print(f"[{datetime.now(seoul_tz)}] Sequential crawl - {name} finished. Current memory: {current_mem:.2f} MB")
-        except Exception as e:
-            print(f"Sequential crawl - {name} error: {e}")
-    
-    end_mem = process.memory_info().rss / 1024 / 1024
-    print(f"[{datetime.now(seoul_tz)}] All daily crawl tasks finished. Final memory: {end_mem:.2f} MB")
+# --- 크롤러 워커 및 스케줄러 ---
+# 크롤링은 jobs 큐를 통해 크롤러 워커가 실행합니다.
+# CRAWL_WORKER=inline(기본값)이면 이 프로세스에서 워커와 스케줄러를 함께 돌리고(스케줄러는 리더 잠금을 잡은 프로세스만 작업을 넣음),
+# external이면 `python worker.py`를 별도 프로세스로 띄우고 웹 프로세스는 작업을 큐에 넣기만 합니다.
+_background = {"scheduler": None, "tasks": []}
 
 @app.on_event("startup")
-async def start_scheduler():
+async def start_background():
     # 데이터베이스 초기화 (비동기 스레드 실행)
     import threading
     threading.Thread(target=local_currency.init_db, daemon=True).start()
-    
-    # 매일 새벽 4시에 통합 태스크 실행
-    scheduler.add_job(daily_crawl_job, 'cron', hour=4, minute=0)
-    
-    scheduler.start()
-    
+
+    # 다른 프로세스(크롤러 워커 등)가 게시한 캐시 갱신을 L1에 반영
+    _background["tasks"].append(asyncio.create_task(listen_invalidations()))
+
+    if jobs.WORKER_MODE == "inline":
+        if DATA_DIR: os.makedirs(DATA_DIR, exist_ok=True)
+        _background["scheduler"], tasks = jobs.start_worker()
+        _background["tasks"].extend(tasks)
+    else:
+        # 크롤러 워커가 쓴 파일(금리/카드 이벤트 데이터, KFCC 이력/변경 로그, 카드 이벤트 변경 로그)을 읽으려면 같은 볼륨이 필요합니다.
+        # 캐시가 만료되면 이 파일을 다시 게시하므로, 볼륨이 다르면 오래된 로컬 사본이 모든 프로세스에 퍼집니다.
+        if not DATA_DIR:
+            raise RuntimeError("CRAWL_WORKER=external requires CRAWL_DATA_DIR pointing at a volume shared with worker.py")
+        if await jobs.data_dir_shared() is False:
+            print(f"Warning: CRAWL_DATA_DIR ({DATA_DIR}) is not the directory the crawler worker writes to. Rates, card events, history and change feeds will be stale.")
+
     # 메모리 사용량 로깅
     process = psutil.Process(os.getpid())
     mem_mb = process.memory_info().rss / 1024 / 1024
-    print(f"Scheduler started. Current Memory Usage: {mem_mb:.2f} MB")
-    print("Daily crawl task scheduled for 04:00 AM (Sequential).")
+    print(f"Started (crawl worker: {jobs.WORKER_MODE}). Current Memory Usage: {mem_mb:.2f} MB")
+    if jobs.WORKER_MODE == "inline":
+        print("Daily crawl task scheduled for 04:00 AM (leader process only).")
+
+@app.on_event("shutdown")
+async def close_redis_pool():
+    if _background["scheduler"]: _background["scheduler"].shutdown(wait=False)
+    for task in _background["tasks"]: task.cancel()
+    # 작업 루프가 실행 중인 작업을 마무리(상태 기록, ack)한 뒤에 Redis 풀을 닫습니다.
+    await asyncio.gather(*_background["tasks"], return_exceptions=True)
+    if r: await r.connection_pool.disconnect()
+    if rb: await rb.connection_pool.disconnect()
@@ -0,0 +1,105 @@
+import re
+import heapq
+from array import array
+
+# 카드 이벤트 전문 검색용 n-gram 역색인
+# - 한글은 띄어쓰기 단위가 불규칙하므로 문자 2-gram/3-gram 으로 색인합니다.
+# - 카드사(issuer)별 샤드로 나누어, 크롤링이 끝난 카드사만 다시 색인합니다.
+# - 검색 문법은 템플릿의 parseQuery와 같습니다: "따옴표 구문"은 모두 포함(AND), 나머지 단어는 하나 이상 포함(OR).
+
+NGRAM_SIZES = (2, 3)
+TITLE_WEIGHT = 3
+PHRASE_BONUS = 2
+
+def normalize(text):
+    return re.sub(r"\s+", " ", (text or "").lower()).strip()
+
+def ngrams(text):
+    grams = set()
+    for n in NGRAM_SIZES:
+        for i in range(len(text) - n + 1):
+            grams.add(text[i:i + n])
+    return grams
+
+def parse_query(q):
+    """템플릿의 parseQuery와 같은 규칙으로 (and 구문 목록, or 단어 목록)을 반환합니다."""
+    q = normalize(q)
+    phrases = [normalize(m) for m in re.findall(r'"([^"]+)"', q)]
+    left = re.sub(r'"[^"]*"', " ", q)
+    words = [w for w in left.replace('"', " ").split() if w]
+    return [p for p in phrases if p], words
+
+class IndexShard:
+    """카드사 하나의 이벤트 목록에 대한 색인입니다."""
+
+    def __init__(self, events):
+        self.events = events
+        self.titles = [normalize(ev.get("eventName")) for ev in events]
+        self.texts = [f"{t} {normalize(ev.get('category'))} {normalize(ev.get('companyName'))}" for t, ev in zip(self.titles, events)]
+        postings = {}
+        for doc_id, text in enumerate(self.texts):
+            for gram in ngrams(text):
+                posting = postings.get(gram)
+                if posting is None: posting = postings[gram] = array("I")
+                posting.append(doc_id)
+        self.postings = postings
+
+    def candidates(self, term):
+        """term을 부분 문자열로 포함하는 문서 id 집합. n-gram 교집합으로 후보를 줄인 뒤 실제 포함 여부를 확인합니다."""
+        if len(term) < min(NGRAM_SIZES):
+            return {i for i, text in enumerate(self.texts) if term in text}
+        n = max(size for size in NGRAM_SIZES if size <= len(term))
+        lists = []
+        for i in range(len(term) - n + 1):
+            posting = self.postings.get(term[i:i + n])
+            if posting is None: return set()
+            lists.append(posting)
+        lists.sort(key=len)
+        docs = set(lists[0])
+        # 가장 희소한 두 posting만 교집합하고 나머지는 문자열 검사로 확인합니다.
+        if len(lists) > 1: docs.intersection_update(lists[1])
+        texts = self.texts
+        return {d for d in docs if term in texts[d]}
+
+    def search(self, phrases, words):
+        docs = None
+        for phrase in phrases:
+            found = self.candidates(phrase)
+            docs = found if docs is None else docs & found
+            if not docs: return []
+        if words:
+            matched = set()
+            for word in words: matched |= self.candidates(word)
+            docs = matched if docs is None else docs & matched
+        if docs is None: docs = range(len(self.events))
+        return [(self.score(d, phrases, words), d) for d in docs]
+
+    def score(self, doc_id, phrases, words):
+        title, text = self.titles[doc_id], self.texts[doc_id]
+        score = 0.0
+        for term in phrases:
+            score += (TITLE_WEIGHT if term in title else 1) + PHRASE_BONUS
+        for term in words:
+            if term in title:
+                # 제목 앞쪽에 나올수록 가산점
+                score += TITLE_WEIGHT + 1.0 / (1 + title.index(term))
+            elif term in text:
+                score += 1
+        return score
+
+class CardEventIndex:
+    def __init__(self):
+        self.shards = {}
+
+    def update(self, issuer, events):
+        self.shards[issuer] = IndexShard(events)
+
+    def search(self, q, issuers=None, offset=0, limit=20):
+        phrases, words = parse_query(q)
+        hits = []
+        for order, (issuer, shard) in enumerate(self.shards.items()):
+            if issuers and issuer not in issuers: continue
+            hits.extend((-score, order, doc_id, shard) for score, doc_id in shard.search(phrases, words))
+        top = heapq.nsmallest(offset + limit, hits, key=lambda h: h[:3])[offset:]
+        page = [{**shard.events[doc_id], "score": round(-neg, 3)} for neg, _, doc_id, shard in top]
+        return len(hits), page
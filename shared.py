@@ -1,30 +1,53 @@
 import os
 import redis
+import redis.asyncio as aioredis
 import pytz
 import json
 import time
+import gzip
+import asyncio
+import hashlib
+import socket
+from collections import OrderedDict
 from datetime import datetime
+from fastapi import Request, Response
 from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
 # 시간대 설정
 seoul_tz = pytz.timezone('Asia/Seoul')
 
 # 캐시 만료 시간 (1시간)
 CACHE_EXPIRE = 3600
 
+# 크롤러가 만들고 웹 서버가 읽는 파일(kfcc_data.json, 카드사별 *_data.json, 크롤러 상태, KFCC 금리 이력/변경 로그, 카드 이벤트 변경 로그/스냅샷)의 위치
+# Redis 캐시(CACHE_EXPIRE)가 만료되면 웹 서버는 이 파일을 다시 읽어 게시하므로, 워커와 같은 파일을 봐야 합니다.
+# 크롤러를 별도 컨테이너(worker.py, CRAWL_WORKER=external)로 돌릴 때는 두 컨테이너가 같은 볼륨을 이 경로에 마운트해야 합니다.
+DATA_DIR = os.getenv("CRAWL_DATA_DIR", "")
+
+def data_path(name):
+    return os.path.join(DATA_DIR, name)
+
 # Redis 연결 설정 (환경 변수 지원)
 REDIS_HOST = os.getenv("REDIS_HOST", "redis")
+REDIS_PORT = int(os.getenv("REDIS_PORT", "6379"))
 REDIS_USERNAME = os.getenv("REDIS_USERNAME", "default")
 REDIS_PASSWORD = os.getenv("REDIS_PASSWORD", "2AplNlOnk1oW2FnH6mwVlO5i3MTXOIjyzF5HDoIQAF7k180NekGzpieGEE0yEOdW")
+# 비동기 커넥션 풀 크기 (동시 요청 수만큼 연결을 재사용)
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", "32"))
 
 try:
     # Redis 6+의 ACL을 사용하는 경우 username이 필요하지만, 
     # 일반적인 경우에는 password만 사용합니다. 'default' 유저인 경우 생략하여 호환성을 높입니다.
     redis_args = {
         "host": REDIS_HOST,
-        "port": 6379,
+        "port": REDIS_PORT,
         "password": REDIS_PASSWORD,
         "db": 0,
         "decode_responses": True,
@@ -32,13 +55,24 @@ try:
     }
     if REDIS_USERNAME and REDIS_USERNAME != "default":
         redis_args["username"] = REDIS_USERNAME
-        
-    r = redis.Redis(**redis_args)
-    r.ping() # 연결 테스트
+
+    # 연결 테스트는 기동 시 1회만 동기 클라이언트로 수행합니다.
+    _probe = redis.Redis(**redis_args)
+    _probe.ping()
+    _probe.close()
+
+    # 요청 처리 경로에서는 asyncio 클라이언트를 사용하여 Redis 지연이 이벤트 루프를 막지 않도록 합니다.
+    # 풀이 가득 차면 새 연결을 만들지 않고 반납될 때까지 대기합니다.
+    redis_pool = aioredis.BlockingConnectionPool(max_connections=REDIS_MAX_CONNECTIONS, timeout=5, **redis_args)
+    r = aioredis.Redis(connection_pool=redis_pool)
+    # 사전 압축된 응답(gzip/brotli)처럼 바이너리 값을 다루기 위한 클라이언트 (decode_responses=False)
+    redis_bin_pool = aioredis.BlockingConnectionPool(max_connections=REDIS_MAX_CONNECTIONS, timeout=5, **{**redis_args, "decode_responses": False})
+    rb = aioredis.Redis(connection_pool=redis_bin_pool)
     print(f"Connected to Redis at {REDIS_HOST}")
 except Exception as e:
     print(f"Warning: Redis connection failed ({e}). Running without cache.")
     r = None
+    rb = None
 
 # PostgreSQL 설정
 DATABASE_URL = os.getenv("DATABASE_URL")
@@ -72,20 +106,162 @@ def get_db():
     else:
         yield None
 
+def insert_for(bind):
+    """bind의 DB 종류에 맞는 INSERT 구문 생성자 (ON CONFLICT upsert용). PostgreSQL과 SQLite만 지원합니다."""
+    if bind.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif bind.dialect.name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise NotImplementedError(f"Bulk upsert is not supported for {bind.dialect.name}")
+    return insert
+
 # 서버 시작 시간 기록 (Uptime 계산용)
 boot_time = time.time()
 
-def get_cached_data(cache_key, file_path):
+# 프로세스 식별자 (L1 무효화 메시지 발신자 구분, 스케줄러 리더 잠금에 사용)
+PROCESS_ID = f"{socket.gethostname()}-{os.getpid()}-{int(boot_time)}"
+
+# --- 프로세스 내 L1 캐시 (Redis 앞단) ---
+# 파싱된 객체와 직렬화된 응답 바이트를 함께 보관하여, 적중 시 Redis 왕복과 json.loads를 모두 생략합니다.
+L1_MAX_ENTRIES = int(os.getenv("L1_MAX_ENTRIES", "64"))
+_l1_cache = OrderedDict()  # cache_key -> {"expires": float, "data": obj, "body": bytes, "etag": str, "variants": {encoding: bytes}}
+
+# 사전 압축 인코딩 (Content-Encoding -> 디스크 파일 확장자). brotli 미설치 시 gzip만 사용합니다.
+ENCODINGS = {"br": ".br", "gzip": ".gz"} if brotli else {"gzip": ".gz"}
+
+def l1_get(cache_key):
+    entry = _l1_cache.get(cache_key)
+    if not entry: return None
+    if entry["expires"] < time.monotonic():
+        _l1_cache.pop(cache_key, None)
+        return None
+    _l1_cache.move_to_end(cache_key)
+    return entry
+
+def make_etag(data, body):
+    """last_updated와 본문 해시로 강한 ETag를 만듭니다."""
+    last_updated = data.get("last_updated") if isinstance(data, dict) else None
+    stamp = "".join(ch for ch in str(last_updated or "") if ch.isdigit())
+    return f'"{stamp}-{hashlib.sha1(body).hexdigest()[:16]}"'
+
+def build_entry(data, body=None, variants=None):
+    if body is None: body = json.dumps(data)
+    if isinstance(body, str): body = body.encode("utf-8")
+    return {"expires": time.monotonic() + CACHE_EXPIRE, "data": data, "body": body, "etag": make_etag(data, body), "variants": variants or {}}
+
+def l1_set(cache_key, data, body=None, variants=None):
+    entry = build_entry(data, body, variants)
+    _l1_cache[cache_key] = entry
+    _l1_cache.move_to_end(cache_key)
+    while len(_l1_cache) > L1_MAX_ENTRIES:
+        _l1_cache.popitem(last=False)
+    return entry
+
+def invalidate_cache(cache_key):
+    _l1_cache.pop(cache_key, None)
+
+# --- 프로세스 간 L1 무효화 ---
+# 크롤러가 별도 워커 프로세스에서 실행되면, 웹 프로세스의 L1 캐시는 TTL까지 이전 데이터를 유지합니다.
+# 게시(publish) 시 Redis 채널로 캐시 키를 알리고, 각 프로세스는 구독하여 자신의 L1에서 해당 키를 비웁니다.
+INVALIDATION_CHANNEL = "cache:invalidate"
+
+async def broadcast_invalidation(cache_key):
+    if not r: return
     try:
-        if r:
-            cached = r.get(cache_key)
-            if cached:
-                cached_json = json.loads(cached)
-                return cached_json
+        await r.publish(INVALIDATION_CHANNEL, f"{PROCESS_ID} {cache_key}")
+    except Exception as e:
+        print(f"L1 invalidation broadcast failed: {e}")
+
+async def listen_invalidations():
+    """다른 프로세스가 보낸 L1 무효화 메시지를 구독합니다. 기동 시 백그라운드 태스크로 실행합니다."""
+    if not r: return
+    while True:
+        pubsub = r.pubsub()
+        try:
+            await pubsub.subscribe(INVALIDATION_CHANNEL)
+            while True:
+                msg = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                if not msg: continue
+                sender, _, cache_key = msg["data"].partition(" ")
+                if sender != PROCESS_ID: invalidate_cache(cache_key)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"L1 invalidation listener error: {e}")
+            await asyncio.sleep(5)
+        finally:
+            await pubsub.aclose()
+
+def compress_body(body, quality=11):
+    """응답 본문의 gzip/brotli 인코딩을 만듭니다. 크롤링 시점에 한 번만 수행됩니다.
+    요청 시점에 만드는 응답은 quality를 낮춰 압축 시간을 줄입니다."""
+    variants = {"gzip": gzip.compress(body, compresslevel=9 if quality >= 9 else 6)}
+    if brotli: variants["br"] = brotli.compress(body, quality=quality)
+    return variants
+
+def read_sidecars(file_path):
+    """JSON 파일 옆에 저장된 사전 압축 파일(.gz/.br)을 읽습니다. 원본보다 오래된 경우 무시합니다."""
+    try:
+        mtime = os.path.getmtime(file_path)
+        variants = {}
+        for encoding, ext in ENCODINGS.items():
+            path = file_path + ext
+            if not os.path.exists(path) or os.path.getmtime(path) < mtime: return None
+            with open(path, "rb") as f: variants[encoding] = f.read()
+        return variants
+    except OSError:
+        return None
+
+def write_sidecars(file_path, variants):
+    for encoding, ext in ENCODINGS.items():
+        if encoding in variants:
+            with open(file_path + ext, "wb") as f: f.write(variants[encoding])
+
+async def redis_load_entry(cache_key):
+    """Redis에서 본문과 사전 압축본을 한 번의 MGET으로 가져와 L1에 올립니다."""
+    if not rb: return None
+    encodings = list(ENCODINGS)
+    values = await rb.mget([cache_key] + [f"{cache_key}:{enc}" for enc in encodings])
+    body = values[0]
+    if not body: return None
+    variants = {enc: v for enc, v in zip(encodings, values[1:]) if v}
+    if len(variants) < len(encodings):
+        # 압축본이 없는 구버전 캐시는 한 번 압축하여 다시 저장합니다.
+        return await store_entry(cache_key, json.loads(body), body)
+    return l1_set(cache_key, json.loads(body), body, variants)
+
+async def store_entry(cache_key, data, body=None, variants=None):
+    """본문을 (필요 시) 압축하여 Redis와 L1에 저장합니다."""
+    if body is None: body = json.dumps(data)
+    if isinstance(body, str): body = body.encode("utf-8")
+    if variants is None: variants = await asyncio.to_thread(compress_body, body)
+    await redis_store(cache_key, body, variants)
+    return l1_set(cache_key, data, body, variants)
+
+async def redis_store(cache_key, body, variants):
+    if not rb: return
+    async with rb.pipeline(transaction=False) as pipe:
+        pipe.setex(cache_key, CACHE_EXPIRE, body)
+        for enc, value in variants.items(): pipe.setex(f"{cache_key}:{enc}", CACHE_EXPIRE, value)
+        await pipe.execute()
+
+async def load_cached_entry(cache_key, file_path):
+    """L1 -> Redis -> 로컬 파일 순으로 조회하여 L1 엔트리를 반환합니다."""
+    entry = l1_get(cache_key)
+    if entry: return entry
+    try:
+        entry = await redis_load_entry(cache_key)
+        if entry: return entry
         
         if os.path.exists(file_path):
             with open(file_path, 'r', encoding='utf-8') as f:
                 json_content = json.load(f)
+
+            # 크롤러가 압축본과 함께 저장한 파일은 저장된 형태 그대로 제공합니다.
+            variants = read_sidecars(file_path)
+            if variants and isinstance(json_content, dict) and json_content.get('last_updated'):
+                return await store_entry(cache_key, json_content, None, variants)
             
             # 파일 내용의 형식 확인 (신규: dict, 기존: list)
             if isinstance(json_content, dict) and 'data' in json_content:
@@ -109,7 +285,89 @@ def get_cached_data(cache_key, file_path):
                 last_updated = dt.strftime('%Y-%m-%d %H:%M:%S')
 
             res = {'last_updated': last_updated, 'data': unique_data}
-            if r: r.setex(cache_key, CACHE_EXPIRE, json.dumps(res))
-            return res
+            return await store_entry(cache_key, res)
     except Exception: pass
+    return None
+
+async def get_cached_data(cache_key, file_path):
+    entry = await load_cached_entry(cache_key, file_path)
+    if entry: return entry["data"]
     return {'last_updated': None, 'data': []}
+
+def variant_etag(etag, encoding):
+    """인코딩별 표현마다 서로 다른 강한 ETag를 사용합니다 (예: "...-br")."""
+    return f'{etag[:-1]}-{encoding}"' if encoding else etag
+
+def etag_matches(request: Request, etag):
+    header = request.headers.get("if-none-match")
+    if not header or not etag: return False
+    if header.strip() == "*": return True
+    # 약한 비교: W/ 접두사는 무시하고, 같은 본문의 다른 인코딩 ETag도 일치로 봅니다.
+    candidates = {etag} | {variant_etag(etag, enc) for enc in ENCODINGS}
+    return any(tag.strip().removeprefix("W/") in candidates for tag in header.split(","))
+
+def accepted_encodings(request: Request):
+    """Accept-Encoding 헤더에서 q=0이 아닌 인코딩 집합을 반환합니다."""
+    accepted = set()
+    for part in request.headers.get("accept-encoding", "").split(","):
+        name, _, params = part.strip().partition(";")
+        if name and params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            accepted.add(name.strip().lower())
+    return accepted
+
+def entry_response(request: Request, entry, media_type="application/json"):
+    """L1 엔트리의 직렬화된 바이트를 그대로 응답합니다.
+    If-None-Match가 일치하면 304를, 클라이언트가 지원하면 사전 압축된 본문을 반환합니다."""
+    accepted = accepted_encodings(request)
+    encoding = next((enc for enc in ENCODINGS if enc in accepted and enc in entry["variants"]), None)
+    headers = {"ETag": variant_etag(entry["etag"], encoding), "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    if etag_matches(request, entry["etag"]):
+        return Response(status_code=304, headers=headers)
+    if encoding:
+        headers["Content-Encoding"] = encoding
+        return Response(content=entry["variants"][encoding], media_type=media_type, headers=headers)
+    return Response(content=entry["body"], media_type=media_type, headers=headers)
+
+async def cached_response(request: Request, cache_key, file_path):
+    entry = await load_cached_entry(cache_key, file_path)
+    if entry: return entry_response(request, entry)
+    return Response(content=json.dumps({'last_updated': None, 'data': []}), media_type="application/json")
+
+async def publish_cached_data(cache_key, file_path, data, indent=None):
+    """크롤링 결과를 파일과 Redis에 저장하고 L1 캐시를 새 데이터로 교체합니다.
+    gzip/brotli 압축본도 이 시점에 만들어 파일(.gz/.br)과 Redis에 함께 저장합니다."""
+    invalidate_cache(cache_key)
+    body = json.dumps(data).encode("utf-8")
+    variants = await asyncio.to_thread(compress_body, body)
+    with open(file_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=indent)
+    write_sidecars(file_path, variants)
+    await store_entry(cache_key, data, body, variants)
+    await broadcast_invalidation(cache_key)
+
+async def publish_cached_file(cache_key, file_path):
+    """크롤러가 이미 (임시 파일 + rename으로) 기록한 JSON 파일을 그대로 캐시 본문으로 게시합니다.
+    결과를 다시 직렬화하지 않으며, L1은 비우기만 하여 다음 요청이 Redis(또는 파일)에서 새로 읽게 합니다."""
+    invalidate_cache(cache_key)
+    with open(file_path, "rb") as f: body = f.read()
+    variants = await asyncio.to_thread(compress_body, body)
+    write_sidecars(file_path, variants)
+    await redis_store(cache_key, body, variants)
+    await broadcast_invalidation(cache_key)
+
+# --- 템플릿 캐시 ---
+# HTML 템플릿을 요청마다 디스크에서 읽지 않고, 파일이 바뀐 경우에만 다시 읽어 압축본과 함께 보관합니다.
+_template_cache = {}  # path -> (mtime, entry)
+
+def template_response(request: Request, filename, directory="templates"):
+    path = os.path.join(directory, filename)
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return Response(content=f"Template {filename} not found", media_type="text/html")
+    cached = _template_cache.get(path)
+    if not cached or cached[0] != mtime:
+        with open(path, "rb") as f: body = f.read()
+        entry = {"body": body, "etag": f'"{hashlib.sha1(body).hexdigest()[:16]}"', "variants": compress_body(body)}
+        cached = _template_cache[path] = (mtime, entry)
+    return entry_response(request, cached[1], media_type="text/html")
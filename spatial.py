@@ -0,0 +1,76 @@
+import math
+
+# 가맹점 위치 검색용 공간 유틸리티 (지오해시 + 하버사인)
+# - 좌표를 지오해시 문자열로 저장하면 (type, geohash) 복합 B-tree 인덱스의 범위 조회로 주변 셀만 읽을 수 있습니다.
+#   같은 접두사를 가진 지오해시는 같은 셀 안에 있고, base32 알파벳이 문자 순서대로 정렬되어 있어 셀 하나가 문자열 범위 하나가 됩니다.
+# - 후보를 가져온 뒤 하버사인 거리로 반경을 정확히 거르고 가까운 순으로 정렬합니다.
+
+BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+GEOHASH_PRECISION = 9  # 약 4.8m x 4.8m
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+def geohash_encode(lat, lon, precision=GEOHASH_PRECISION):
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, ch, bit, even = [], 0, 0, True
+    while len(chars) < precision:
+        rng, value = (lon_range, lon) if even else (lat_range, lat)
+        mid = (rng[0] + rng[1]) / 2
+        if value >= mid:
+            ch |= 1 << (4 - bit)
+            rng[0] = mid
+        else:
+            rng[1] = mid
+        even = not even
+        if bit < 4:
+            bit += 1
+        else:
+            chars.append(BASE32[ch])
+            ch, bit = 0, 0
+    return "".join(chars)
+
+def cell_size(precision):
+    """지오해시 셀의 (위도 높이, 경도 너비) (도)."""
+    lon_bits = (5 * precision + 1) // 2
+    lat_bits = 5 * precision // 2
+    return 180.0 / 2 ** lat_bits, 360.0 / 2 ** lon_bits
+
+def next_geohash(cell):
+    """정렬 순서상 cell 바로 다음 셀 (범위의 상한). 마지막 셀이면 None."""
+    chars = list(cell)
+    for i in range(len(chars) - 1, -1, -1):
+        index = BASE32.index(chars[i])
+        if index < len(BASE32) - 1:
+            chars[i] = BASE32[index + 1]
+            return "".join(chars[:i + 1])
+    return None
+
+def bounding_box(lat, lon, radius_km):
+    dlat = radius_km / KM_PER_DEGREE
+    dlon = radius_km / (KM_PER_DEGREE * max(math.cos(math.radians(lat)), 1e-6))
+    return lat - dlat, lat + dlat, lon - dlon, lon + dlon
+
+def cover_ranges(lat, lon, radius_km, max_cells=24):
+    """반경을 덮는 지오해시 셀들을 [하한, 상한) 문자열 범위 목록으로 반환합니다.
+    셀 수가 max_cells 이하인 가장 작은 셀 크기를 고르고, 이어지는 셀은 하나의 범위로 합칩니다."""
+    min_lat, max_lat, min_lon, max_lon = bounding_box(lat, lon, radius_km)
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        height, width = cell_size(precision)
+        rows = range(math.floor((min_lat + 90) / height), math.floor((max_lat + 90) / height) + 1)
+        cols = range(math.floor((min_lon + 180) / width), math.floor((max_lon + 180) / width) + 1)
+        if len(rows) * len(cols) <= max_cells or precision == 1: break
+    cells = sorted({geohash_encode((i + 0.5) * height - 90, (j + 0.5) * width - 180, precision) for i in rows for j in cols})
+    ranges = []
+    for cell in cells:
+        upper = next_geohash(cell)
+        if ranges and ranges[-1][1] == cell:
+            ranges[-1][1] = upper
+        else:
+            ranges.append([cell, upper])
+    return [tuple(r) for r in ranges]
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp, dl = p2 - p1, math.radians(lon2 - lon1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
@@ -0,0 +1,57 @@
+// 카드사 이벤트 통합 목록의 브라우저 사본 (card_events_main.html, card_events_search.html 공용)
+// 통합 스냅샷을 localStorage에 보관합니다. 사본이 있으면 /api/card-events/changes로 그 뒤에 추가/종료/변경된
+// 이벤트만 받아 적용하고, 사본이 없거나 너무 오래되었으면(reset) 전체를 받습니다.
+// 사본과 cursor는 페이지마다 다른 키(storageKey)에 두어, 한 페이지가 변경분을 받아 가도 다른 페이지의 NEW 표시가 남습니다.
+// replace 항목(서버에 직전 스냅샷이 없던 첫 게시)은 그 카드사의 이벤트를 통째로 바꿉니다.
+const CARD_EVENT_FIELDS = ['id', 'issuer', 'companyName', 'category', 'eventName', 'period', 'link', 'image'];
+
+function pickEventFields(ev) {
+    return Object.fromEntries(CARD_EVENT_FIELDS.map(f => [f, ev[f] ?? '']));
+}
+
+function applyEventChanges(events, changes, newIds) {
+    const byId = new Map(events.map(ev => [ev.id, ev]));
+    for (const entry of changes) {
+        const known = new Set(byId.keys());
+        if (entry.replace) {
+            for (const [id, ev] of byId) if (ev.issuer === entry.issuer) { byId.delete(id); newIds.delete(id); }
+        }
+        entry.removed.forEach(ev => { byId.delete(ev.id); newIds.delete(ev.id); });
+        entry.changed.forEach(ev => byId.set(ev.id, pickEventFields(ev)));
+        entry.added.forEach(ev => { byId.set(ev.id, pickEventFields(ev)); if (!known.has(ev.id)) newIds.add(ev.id); });
+    }
+    const merged = [...byId.values()];
+    return [...merged.filter(ev => newIds.has(ev.id)), ...merged.filter(ev => !newIds.has(ev.id))];
+}
+
+function saveEventSnapshot(storageKey, cursor, events) {
+    try { localStorage.setItem(storageKey, JSON.stringify({ cursor, data: events })); } catch (e) { /* 저장 공간 부족 등 */ }
+}
+
+// { events, newIds }를 돌려줍니다. newIds는 이 페이지의 지난 방문 이후 새로 추가된 이벤트 ID입니다.
+async function loadCardEvents(storageKey) {
+    let cached = null;
+    try { cached = JSON.parse(localStorage.getItem(storageKey)); } catch (e) { }
+    if (cached?.cursor && Array.isArray(cached.data)) {
+        try {
+            let cursor = cached.cursor, events = cached.data;
+            const newIds = new Set();
+            while (true) {
+                const res = await fetch(`/api/card-events/changes?limit=100&since=${encodeURIComponent(cursor)}`, { cache: 'no-store' });
+                if (!res.ok) throw new Error(`HTTP ${res.status}`);
+                const delta = await res.json();
+                if (delta.reset.length) throw new Error('snapshot too old');
+                events = applyEventChanges(events, delta.changes, newIds);
+                cursor = delta.cursor;
+                if (!delta.more) break;
+            }
+            saveEventSnapshot(storageKey, cursor, events);
+            return { events, newIds };
+        } catch (e) { /* 전체를 다시 받습니다. */ }
+    }
+    const response = await fetch(`/api/card-events?fields=${CARD_EVENT_FIELDS.join(',')}`);
+    const payload = await response.json();
+    const events = (payload.data || []).map(pickEventFields);
+    saveEventSnapshot(storageKey, payload.cursor, events);
+    return { events, newIds: new Set() };
+}
@@ -0,0 +1,175 @@
+import asyncio
+import random
+import os
+import sys
+import time
+import tempfile
+import httpx
+import kfcc_crawler
+from adaptive_limiter import AdaptiveLimiter, request_with_retry
+
+# 적응형 동시성 제한기 검증
+# - 지연/오류를 주입할 수 있는 가짜 kfcc.co.kr 서버를 띄우고 run_crawler를 실행하여
+#   오류가 섞여도 금고가 누락되지 않는지, 동시성 한도가 서버 용량 근처로 수렴하는지 확인합니다.
+# 사용법: python test_adaptive_limiter.py [지연ms] [오류율] [서버 용량]
+# (pytest 등에서 import할 때는 인자를 읽지 않습니다. LIMITER_TEST_LATENCY_MS / LIMITER_TEST_ERROR_RATE / LIMITER_TEST_CAPACITY로도 바꿀 수 있습니다.)
+
+LATENCY_MS = float(os.getenv("LIMITER_TEST_LATENCY_MS", "20"))
+ERROR_RATE = float(os.getenv("LIMITER_TEST_ERROR_RATE", "0.05"))
+CAPACITY = int(os.getenv("LIMITER_TEST_CAPACITY", "24"))
+REGIONS = [["서울", "강남구", "마포구", "종로구"], ["부산", "중구", "동구"], ["세종", "세종시"]]
+BANKS_PER_REGION = 40
+
+RATE_PAGE = """<html><body><p class="base-date">조회기준일(2026/01/25), 세금공제전, 연이율</p>
+<div id="divTmp1"><p class="tbl-tit">{title}</p><table><tbody>
+<tr><td>12개월</td><td>{rate}</td></tr></tbody></table></div>
+<!-- 요구불예금 조회 내용 끝 --></body></html>"""
+
+class StandInServer:
+    """kfcc.co.kr의 list.do / goods_19.do를 흉내 내는 HTTP 서버.
+    동시 처리 수가 capacity를 넘으면 503을 돌려주고, error_rate 비율로 500 또는 연결 끊김을 만듭니다."""
+
+    def __init__(self, latency_ms, error_rate, capacity, padding=0):
+        self.latency = latency_ms / 1000
+        self.padding = "<!-- " + "x" * padding + " -->" if padding else ""
+        self.error_rate = error_rate
+        self.capacity = capacity
+        self.in_flight = 0
+        self.stats = {"requests": 0, "overloaded": 0, "errors": 0, "resets": 0, "peak": 0}
+        self.rnd = random.Random(7)
+
+    def body_for(self, path, query):
+        if path == "/map/list.do":
+            region = f"{query.get('r1')}-{query.get('r2')}"
+            rows = "".join(f'<tr><td><span title="gmgoCd">{region}-{i}</span><span title="gmgoNm">금고{i}</span></td></tr>' for i in range(BANKS_PER_REGION))
+            return f"<table>{rows}</table>"
+        if query.get("gubuncode") == "13": return self.padding + RATE_PAGE.format(title="MG더뱅킹정기예금", rate="3.10")
+        return self.padding + RATE_PAGE.format(title="MG더뱅킹정기적금", rate="3.50")
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line: break
+                while (await reader.readline()) not in (b"\r\n", b"\n", b""): pass
+                target = line.decode().split()[1]
+                path, _, qs = target.partition("?")
+                query = dict(p.split("=", 1) for p in qs.split("&") if "=" in p)
+                query = {k: httpx.QueryParams(f"v={v}")["v"] for k, v in query.items()}
+
+                self.stats["requests"] += 1
+                self.in_flight += 1
+                self.stats["peak"] = max(self.stats["peak"], self.in_flight)
+                try:
+                    overloaded = self.in_flight > self.capacity
+                    # 과부하일수록 지연도 늘어납니다.
+                    await asyncio.sleep(self.latency * (3 if overloaded else 1))
+                    roll = self.rnd.random()
+                    if overloaded:
+                        self.stats["overloaded"] += 1
+                        status, body = 503, "busy"
+                    elif roll < self.error_rate / 2:
+                        self.stats["resets"] += 1
+                        writer.transport.abort()
+                        return
+                    elif roll < self.error_rate:
+                        self.stats["errors"] += 1
+                        status, body = 500, "error"
+                    else:
+                        status, body = 200, self.body_for(path, query)
+                finally:
+                    self.in_flight -= 1
+                payload = body.encode("utf-8")
+                writer.write(f"HTTP/1.1 {status} X\r\nContent-Type: text/html; charset=utf-8\r\nContent-Length: {len(payload)}\r\n\r\n".encode() + payload)
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError): pass
+        finally: writer.close()
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle, "127.0.0.1", 0)
+        return f"http://127.0.0.1:{self.server.sockets[0].getsockname()[1]}"
+
+async def test_limiter_aimd():
+    limiter = AdaptiveLimiter(initial=4, min_limit=1, max_limit=32)
+    for _ in range(200):
+        await limiter.acquire(); limiter.in_flight = int(limiter.limit)
+        await limiter.release("ok", 0.01)
+    grown = limiter.limit
+    assert grown > 8, grown
+    limiter.in_flight = 0; limiter.last_decrease = 0
+    # 과부하 신호가 아닌 개별 오류는 한도를 줄이지 않습니다.
+    await limiter.acquire(); await limiter.release("error", 0.01)
+    assert limiter.limit == grown, limiter.limit
+    await limiter.acquire(); await limiter.release("overload", 0.01)
+    assert abs(limiter.limit - grown * 0.5) < 1e-6, limiter.limit
+    # 같은 순간에 실패한 요청들은 한 번만 감소시킵니다.
+    await limiter.acquire(); await limiter.release("overload", 0.01)
+    assert abs(limiter.limit - grown * 0.5) < 1e-6, limiter.limit
+
+async def test_backoff_signals():
+    # 5xx/429 응답, 연결 끊김, 타임아웃은 한 번만 나와도 한도를 절반으로 줄입니다.
+    def respond(status=None, error=None):
+        def handler(request):
+            if error: raise error("injected", request=request)
+            return httpx.Response(status)
+        return handler
+    cases = [("500", respond(500)), ("502", respond(502)), ("503", respond(503)), ("504", respond(504)), ("429", respond(429)),
+             ("reset", respond(error=httpx.ReadError)), ("connect", respond(error=httpx.ConnectError)),
+             ("protocol", respond(error=httpx.RemoteProtocolError)), ("timeout", respond(error=httpx.ReadTimeout))]
+    for name, handler in cases:
+        limiter = AdaptiveLimiter(initial=16, min_limit=1)
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            try:
+                await request_with_retry(client, limiter, "GET", "http://kfcc.test/", retries=0)
+                raise AssertionError(f"{name}: expected failure")
+            except AssertionError: raise
+            except Exception: pass
+        assert limiter.limit == 8 and limiter.stats["decreases"] == 1, (name, limiter.snapshot())
+    # 정상 응답과 재시도 대상이 아닌 4xx는 줄이지 않습니다.
+    for status in [200, 404]:
+        limiter = AdaptiveLimiter(initial=16, min_limit=1)
+        async with httpx.AsyncClient(transport=httpx.MockTransport(respond(status))) as client:
+            await request_with_retry(client, limiter, "GET", "http://kfcc.test/", retries=0)
+        assert limiter.limit >= 16 and limiter.stats["decreases"] == 0, (status, limiter.snapshot())
+
+async def test_retry_exhaustion_raises():
+    server = StandInServer(1, 0, 0)  # 용량 0: 항상 503
+    base = await server.start()
+    limiter = AdaptiveLimiter(initial=2, min_limit=1)
+    async with httpx.AsyncClient() as client:
+        try:
+            await request_with_retry(client, limiter, "GET", f"{base}/map/goods_19.do", retries=2, base_delay=0.01)
+            raise AssertionError("expected failure after retries")
+        except Exception as e:
+            assert "503" in str(e), e
+    assert server.stats["requests"] == 3
+    server.server.close()
+
+async def test_crawl_without_losing_branches():
+    server = StandInServer(LATENCY_MS, ERROR_RATE, CAPACITY)
+    kfcc_crawler.BASE_URL = await server.start()
+    kfcc_crawler.ALL_REGIONS = REGIONS
+    kfcc_crawler.SWEEP_DELAY = 0.2
+    tmp = tempfile.mkdtemp()
+    kfcc_crawler.PARTIAL_FILE = os.path.join(tmp, "partial.ndjson")
+    kfcc_crawler.BRANCHES_FILE = os.path.join(tmp, "branches.ndjson")
+    started = time.monotonic()
+    results = await kfcc_crawler.run_crawler(incremental=False)
+    elapsed = time.monotonic() - started
+    expected = sum(len(reg) - 1 for reg in REGIONS) * BANKS_PER_REGION
+    limiter = kfcc_crawler.last_run_stats["limiter"]
+    print(f"server: {server.stats}, limiter: {limiter}, elapsed: {elapsed:.1f}s")
+    assert len(results) == expected, (len(results), expected)
+    assert all(len(res["rates"]) == 2 for res in results)
+    assert kfcc_crawler.last_run_stats["failed"] == 0
+    # 초기값보다는 늘어나고, 서버 용량 근처까지 올라가야 합니다.
+    assert limiter["peak_limit"] >= CAPACITY * 0.5, limiter
+    assert server.stats["peak"] <= kfcc_crawler.AdaptiveLimiter().max_limit
+    server.server.close()
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1: LATENCY_MS = float(sys.argv[1])
+    if len(sys.argv) > 2: ERROR_RATE = float(sys.argv[2])
+    if len(sys.argv) > 3: CAPACITY = int(sys.argv[3])
+    for test in [test_limiter_aimd, test_backoff_signals, test_retry_exhaustion_raises, test_crawl_without_losing_branches]:
+        asyncio.run(test()); print(f"{test.__name__}: OK")
@@ -0,0 +1,93 @@
+import asyncio
+import os
+import tempfile
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+import card_changes
+import card_events
+
+# 카드사 이벤트 변경 피드 검증
+# - 이벤트 ID가 상세 링크(또는 목록 링크를 같이 쓰는 카드사는 정규화한 제목)로 안정적으로 정해지는지
+# - 크롤링 결과를 게시할 때마다 신규/종료/변경 이벤트가 카드사별 로그에 기록되는지
+#   (첫 게시는 전체 목록을 replace 항목으로 기록하여 배포 전 데이터를 받아 둔 cursor 0 클라이언트도 따라오는지)
+# - 통합 응답의 cursor로 /api/card-events/changes를 받아 이전 사본에 적용하면 새 통합 응답과 같아지는지
+# - 잘못된/오래된 cursor 처리를 확인합니다.
+# 사용법: python test_card_changes.py (임시 디렉터리에서 실행되어 실제 *_data.json은 건드리지 않습니다)
+
+def event(title, link="", period="2026.10.01 ~ 2026.10.31"):
+    return {"category": "이벤트", "eventName": title, "period": period, "link": link, "image": "", "bgColor": "#ffffff"}
+
+def test_event_ids():
+    # 상세 링크가 있으면 링크 기준 (제목이 바뀌어도 같은 ID)
+    a = card_changes.assign_ids("kb", [event("A", "https://x/ev?id=1"), event("B", "https://x/ev?id=2")])
+    b = card_changes.assign_ids("kb", [event("A 수정", "https://x/ev?id=1")])
+    assert a[0]["id"] == b[0]["id"] and a[0]["id"] != a[1]["id"]
+    # 모든 이벤트가 같은 목록 링크를 쓰거나 javascript: 링크면 제목 기준 (공백/전각/대소문자 차이 무시)
+    c = card_changes.assign_ids("lotte", [event("Ｔ머니  캐시백", "https://x/list"), event("여행", "https://x/list")])
+    d = card_changes.assign_ids("lotte", [event("t머니 캐시백", "javascript:goDetail(1)")])
+    assert c[0]["id"] == d[0]["id"] and c[0]["id"] != c[1]["id"]
+    assert card_changes.assign_ids("hana", [event("A", "https://x/1")])[0]["id"] != card_changes.assign_ids("kb", [event("A", "https://x/1")])[0]["id"]
+
+def apply_changes(events, changes):
+    """static/card_events_sync.js(applyEventChanges)와 같은 방식으로 변경을 적용합니다."""
+    by_id = {ev["id"]: ev for ev in events}
+    for entry in changes:
+        if entry.get("replace"):
+            by_id = {i: ev for i, ev in by_id.items() if ev["issuer"] != entry["issuer"]}
+        for ev in entry["removed"]: by_id.pop(ev["id"], None)
+        for ev in entry["added"] + entry["changed"]:
+            by_id[ev["id"]] = {k: v for k, v in ev.items() if k != "before"}
+    return by_id
+
+def test_feed_roundtrip():
+    os.chdir(tempfile.mkdtemp())
+    card_changes.CHANGES_DIR = "card_changes"
+    app = FastAPI()
+    app.include_router(card_events.router)
+    client = TestClient(app)
+    fields = "id,issuer,companyName,category,eventName,period,link,image,bgColor"
+
+    # 배포 전 데이터(change_seq 없음)를 받아 둔 클라이언트: cursor는 0입니다.
+    old_kb = [{**ev, "issuer": "kb"} for ev in card_changes.assign_ids("kb", [event("KB 예전", "https://kb/ev?no=old")])]
+    kb = [event(f"KB {i}", f"https://kb/ev?no={i}") for i in range(5)]
+    lotte = [event(f"롯데 {i}", "https://lotte/list") for i in range(3)]
+    asyncio.run(card_events.save_card_events("kb", kb))
+    asyncio.run(card_events.save_card_events("lotte", lotte))
+    first = client.get("/api/card-events", params={"fields": fields}).json()
+    assert "kb:1" in first["cursor"] and "lotte:1" in first["cursor"]
+    assert len({ev["id"] for ev in first["data"]}) == 8
+    # 첫 게시는 전체 목록을 replace 항목으로 기록하므로, cursor 0 사본도 새 목록으로 바뀝니다.
+    res = client.get("/api/card-events/changes", params={"since": "kb:0,lotte:0"}).json()
+    assert res["reset"] == [] and all(e["replace"] for e in res["changes"])
+    assert apply_changes(old_kb, res["changes"]) == {ev["id"]: ev for ev in first["data"]}
+
+    # KB: 하나 종료, 하나 기간 변경, 두 개 신규 / 롯데: 하나 신규 (두 번에 나눠 게시)
+    kb2 = kb[1:3] + [event("KB 3", "https://kb/ev?no=3", period="2026.10.01 ~ 2026.11.30"), kb[4]] + [event(f"KB 신규 {i}", f"https://kb/ev?no=new{i}") for i in range(2)]
+    asyncio.run(card_events.save_card_events("kb", kb2))
+    asyncio.run(card_events.save_card_events("lotte", lotte + [event("롯데 신규", "https://lotte/list")]))
+    asyncio.run(card_events.save_card_events("lotte", lotte + [event("롯데 신규", "https://lotte/list")]))  # 변화 없음
+
+    res = client.get("/api/card-events/changes", params={"since": first["cursor"]}).json()
+    assert res["reset"] == [] and not res["more"]
+    kb_entry = next(e for e in res["changes"] if e["issuer"] == "kb")
+    assert [ev["eventName"] for ev in kb_entry["added"]] == ["KB 신규 0", "KB 신규 1"]
+    assert [ev["eventName"] for ev in kb_entry["removed"]] == ["KB 0"]
+    assert kb_entry["changed"][0]["before"] == {"period": "2026.10.01 ~ 2026.10.31"}
+    assert len(res["changes"]) == 2 and "kb:2" in res["cursor"] and "lotte:2" in res["cursor"]
+
+    latest = client.get("/api/card-events", params={"fields": fields}).json()
+    assert latest["cursor"] == res["cursor"]
+    assert apply_changes(first["data"], res["changes"]) == {ev["id"]: ev for ev in latest["data"]}
+    assert client.get("/api/card-events/changes", params={"since": latest["cursor"]}).json()["changes"] == []
+
+    # 일부 카드사만, cursor 없이 현재 위치만, 잘못된 cursor
+    only_kb = client.get("/api/card-events/changes", params={"since": "kb:1"}).json()
+    assert only_kb["cursor"] == "kb:2" and {e["issuer"] for e in only_kb["changes"]} == {"kb"}
+    assert client.get("/api/card-events/changes", params={"issuers": "kb,lotte"}).json()["cursor"] == "kb:2,lotte:2"
+    assert client.get("/api/card-events/changes", params={"since": "kb:x"}).status_code == 400
+    assert client.get("/api/card-events/changes", params={"since": "visa:1"}).status_code == 404
+    assert client.get("/api/card-events/changes", params={"since": "kb:9"}).json()["reset"] == ["kb"]
+
+if __name__ == "__main__":
+    for test in [test_event_ids, test_feed_roundtrip]:
+        test(); print(f"{test.__name__}: OK")
@@ -0,0 +1,61 @@
+import json
+import tempfile
+import card_changes
+from card_events import parse_woori_events, parse_samsung_events, parse_hyundai_events, valid_events, direct_min_events
+
+# 직접 경로(브라우저 없는) 파서 검증: 저장해 둔 응답/HTML 덤프를 파싱하여 Playwright 경로와 같은 형식인지 확인합니다.
+# 사용법: python test_direct_parsers.py
+
+def load_text(path):
+    with open(path, "r", encoding="utf-8") as f: return f.read()
+
+def check_events(events, category, expected_count):
+    assert len(events) == expected_count, (category, len(events))
+    assert valid_events(events)
+    for ev in events:
+        assert ev["category"] == category
+        assert ev["eventName"] and "\n" not in ev["eventName"]
+        assert "~" in ev["period"]
+        assert ev["link"].startswith("http")
+        assert ev["image"].startswith("https://")
+
+def test_woori():
+    with open("woori_api_sample.json", "r", encoding="utf-8") as f: data = json.load(f)
+    events = parse_woori_events(data)
+    check_events(events, "우리카드", len(data["prgEvntList"]))
+    assert events[0]["link"].endswith("evntSrno=30004692")
+    assert events[0]["period"] == "2025.11.07 ~ 2026.12.31"
+
+def test_samsung():
+    for path in ["samsung_dump.html", "samsung_m_dump.html"]:
+        events = parse_samsung_events(load_text(path))
+        check_events(events, "삼성카드", 12)
+        assert all("UHPPBE1403M0.jsp?cms_id=" in ev["link"] for ev in events)
+    assert events[0]["period"] == "2026.01.23~2026.02.28"
+
+def test_hyundai():
+    events = parse_hyundai_events(load_text("hyundai_dump.html"))
+    check_events(events, "현대카드", 28)
+    assert events[0]["eventName"] == "국내 제휴 호텔 1~3월 이벤트 혜택 안내"
+    assert events[0]["link"].startswith("https://www.hyundaicard.com/cpb/ev/CPBEV0101_06.hc?")
+
+def test_invalid_falls_back():
+    assert not valid_events([])
+    assert not valid_events([{"eventName": "이벤트", "period": ""}])
+
+def test_partial_page_falls_back():
+    # 일부만 파싱된 결과는 카드사별 하한 또는 직전 게시 개수의 절반에 못 미치면 Playwright로 넘어갑니다.
+    events = parse_samsung_events(load_text("samsung_dump.html"))
+    assert not valid_events(events[:1], direct_min_events("samsung", 0))
+    assert valid_events(events, direct_min_events("samsung", 0))
+    assert not valid_events(events, direct_min_events("samsung", 30))
+    assert valid_events(events, direct_min_events("samsung", 24))
+    card_changes.CHANGES_DIR = tempfile.mkdtemp()
+    assert card_changes.event_count("samsung") == 0
+    entry, snapshot = card_changes.diff_events("samsung", card_changes.assign_ids("samsung", events), "2026-02-01 04:00:00")
+    card_changes.commit_changes("samsung", entry, snapshot)
+    assert card_changes.event_count("samsung") == 12
+
+if __name__ == "__main__":
+    for test in [test_woori, test_samsung, test_hyundai, test_invalid_falls_back, test_partial_page_falls_back]:
+        test(); print(f"{test.__name__}: OK")
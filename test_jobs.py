@@ -0,0 +1,141 @@
+import asyncio
+import sys
+import types
+import jobs
+
+# 크롤링 작업 큐 검증 (Redis 없이 프로세스 내 큐로 실행)
+# - 같은 데이터셋의 작업이 대기/실행 중이면 새로 넣지 않고 기존 작업에 합류하는지
+# - 일괄 작업(daily)이 개별 데이터셋 요청을 흡수하는지, 성공 후 쿨다운 동안 수동 요청을 막는지
+# - 실제 크롤러(card_events/kfcc)가 실패하거나 결과가 비면 작업이 failed로 끝나고 쿨다운이 걸리지 않는지
+# - 작업 루프를 취소(종료)하면 실행 중인 작업을 기다리거나 취소하여 상태 기록까지 마친 뒤에 끝나는지
+# - 진행 상황이 작업 상태에 기록되는지 확인합니다.
+# 사용법: python test_jobs.py
+
+fake = types.ModuleType("fake_crawlers")
+runs = []
+
+async def crawl():
+    runs.append(1)
+    jobs.report_progress(done=1, total=2)
+    await asyncio.sleep(0.2)
+    jobs.report_progress(done=2, total=2)
+
+async def broken():
+    raise RuntimeError("boom")
+
+async def slow():
+    await asyncio.sleep(30)
+
+fake.crawl, fake.broken, fake.slow = crawl, broken, slow
+sys.modules["fake_crawlers"] = fake
+for name in ["daily", "kfcc", "card:kb", "local-currency"]:
+    jobs.JOB_TARGETS[name] = ("fake_crawlers", "crawl")
+jobs.JOB_TARGETS["broken"] = ("fake_crawlers", "broken")
+jobs.JOB_TARGETS["slow"] = ("fake_crawlers", "slow")
+
+def reset():
+    jobs._local.update(queue=None, inflight={}, cooldown={})
+    jobs._local["jobs"].clear()
+    runs.clear()
+
+async def test_duplicate_triggers_attach():
+    reset()
+    worker = asyncio.create_task(jobs.worker_loop())
+    first, created = await jobs.enqueue("card:kb")
+    assert created
+    for _ in range(5):
+        again, created = await jobs.enqueue("card:kb")
+        assert not created and again["id"] == first["id"]
+    await asyncio.sleep(0.1)
+    running = await jobs.get_job(first["id"])
+    assert running["status"] == "running" and running["progress"] == {"done": 1, "total": 2}, running
+    await asyncio.sleep(0.3)
+    done = await jobs.get_job(first["id"])
+    assert done["status"] == "done" and done["progress"]["done"] == 2, done
+    assert len(runs) == 1, runs
+    worker.cancel()
+
+async def test_daily_covers_datasets():
+    reset()
+    worker = asyncio.create_task(jobs.worker_loop())
+    daily, _ = await jobs.enqueue("daily", source="schedule")
+    kfcc, created = await jobs.enqueue("kfcc")
+    assert not created and kfcc["id"] == daily["id"]
+    # 일괄 작업에 포함되지 않는 데이터셋은 따로 실행됩니다.
+    _, created = await jobs.enqueue("local-currency")
+    assert created
+    await asyncio.sleep(0.4)
+    assert len(runs) == 2, runs
+    worker.cancel()
+
+async def test_cooldown():
+    reset()
+    worker = asyncio.create_task(jobs.worker_loop())
+    first, _ = await jobs.enqueue("kfcc")
+    await asyncio.sleep(0.4)
+    again, created = await jobs.enqueue("kfcc")
+    assert not created and again["id"] == first["id"] and again["cooldown_remaining"] > 0, again
+    res = jobs.job_response(again, created)
+    assert res["deduplicated"] and res["status"] == "done" and "cooldown_remaining" in res, res
+    # 스케줄 작업은 쿨다운을 무시합니다.
+    _, created = await jobs.enqueue("kfcc", source="schedule")
+    assert created
+    worker.cancel()
+
+async def test_failed_job_releases():
+    reset()
+    worker = asyncio.create_task(jobs.worker_loop())
+    job, _ = await jobs.enqueue("broken")
+    await asyncio.sleep(0.1)
+    failed = await jobs.get_job(job["id"])
+    assert failed["status"] == "failed" and failed["error"] == "boom", failed
+    # 실패한 작업은 쿨다운 없이 바로 다시 요청할 수 있습니다.
+    _, created = await jobs.enqueue("broken")
+    assert created
+    worker.cancel()
+
+async def test_crawler_failure_not_done():
+    import card_events
+    import kfcc_crawler
+    jobs.JOB_TARGETS["real:kb"] = ("card_events", "crawl_kb_bg")
+    jobs.JOB_TARGETS["real:kfcc"] = ("kfcc", "background_crawl_kfcc")
+
+    async def site_down(*args): raise RuntimeError("site down")
+    async def no_events(*args): return []
+    async def no_branches(**kwargs): return 0
+    original = card_events.fetch_events_with_fallback, kfcc_crawler.run_crawler
+    try:
+        for name, patch, error in [("real:kb", lambda: setattr(card_events, "fetch_events_with_fallback", site_down), "site down"),
+                                   ("real:kb", lambda: setattr(card_events, "fetch_events_with_fallback", no_events), "KB crawl found no events"),
+                                   ("real:kfcc", lambda: setattr(kfcc_crawler, "run_crawler", no_branches), "KFCC crawl returned no branches")]:
+            reset(); patch()
+            worker = asyncio.create_task(jobs.worker_loop())
+            job, _ = await jobs.enqueue(name)
+            await asyncio.sleep(0.1)
+            failed = await jobs.get_job(job["id"])
+            assert failed["status"] == "failed" and failed["error"] == error, failed
+            assert name not in jobs._local["cooldown"]
+            # 실패한 크롤링에는 합류하지 않고 새 작업이 만들어집니다.
+            _, created = await jobs.enqueue(name)
+            assert created
+            worker.cancel()
+    finally:
+        card_events.fetch_events_with_fallback, kfcc_crawler.run_crawler = original
+
+async def test_shutdown_drains_jobs():
+    reset()
+    jobs.SHUTDOWN_GRACE = 0.5
+    worker = asyncio.create_task(jobs.worker_loop())
+    fast, _ = await jobs.enqueue("kfcc")
+    stuck, _ = await jobs.enqueue("slow")
+    await asyncio.sleep(0.05)
+    worker.cancel()
+    await asyncio.gather(worker, return_exceptions=True)
+    # 유예 시간 안에 끝난 작업은 완료, 끝나지 않은 작업은 취소로 기록되고 중복 방지 표시도 풀려 있습니다.
+    assert (await jobs.get_job(fast["id"]))["status"] == "done"
+    assert (await jobs.get_job(stuck["id"]))["status"] == "cancelled"
+    assert not jobs._local["inflight"]
+
+if __name__ == "__main__":
+    for test in [test_duplicate_triggers_attach, test_daily_covers_datasets, test_cooldown, test_failed_job_releases, test_crawler_failure_not_done, test_shutdown_drains_jobs]:
+        asyncio.run(test()); print(f"{test.__name__}: OK")
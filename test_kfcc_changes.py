@@ -0,0 +1,77 @@
+import os
+import tempfile
+import time
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+import kfcc
+import kfcc_changes
+
+# KFCC 금리 변경 피드 검증
+# - 첫 게시는 기준점만 저장하고, 이후 게시마다 신규/삭제/금리 변경 지점이 정확히 기록되는지
+#   (표기만 다른 금리 "2.6" / "2.60"과 기준일만 바뀐 지점은 변경이 아닌지)
+# - since 커서로 이어 받기, limit으로 나눠 받기, 보관 범위를 벗어난 커서의 reset 처리를 확인하고
+# - 지점 1만 곳 스냅샷 비교가 충분히 빠른지 잽니다.
+# 사용법: python test_kfcc_changes.py
+
+DEP, SAV = kfcc.PRODUCT_ALIASES["dep"], kfcc.PRODUCT_ALIASES["sav"]
+
+def snapshot(day, rates):
+    return {"last_updated": f"2026-10-{day:02d} 04:00:00",
+            "data": [{"gmgoCd": code, "gmgoNm": f"금고{code}", "rates": r, "기준일": f"2026/10/{day:02d}"} for code, r in rates.items()]}
+
+def use_tmp_files(keep=90):
+    tmp = tempfile.mkdtemp()
+    kfcc_changes.SNAPSHOT_FILE = os.path.join(tmp, "snapshot.json")
+    kfcc_changes.CHANGES_FILE = os.path.join(tmp, "changes.ndjson")
+    kfcc_changes.CHANGES_KEEP = keep
+
+def test_diff_entries():
+    use_tmp_files()
+    base = {"1": {DEP: "2.6", SAV: "2.4"}, "2": {DEP: "3.0"}, "3": {DEP: "2.9"}}
+    assert kfcc_changes.record_changes(snapshot(1, base)) is None  # 기준점
+    assert kfcc_changes.record_changes(snapshot(2, {**base, "1": {DEP: "2.60", SAV: "2.4"}})) is None  # 표기/기준일만 다름
+
+    entry = kfcc_changes.record_changes(snapshot(3, {"1": {DEP: "2.75", SAV: "2.4"}, "2": {DEP: "3.0", SAV: "2.1"}, "4": {DEP: "2.2"}}))
+    assert entry["seq"] == 1 and entry["previous"] == "2026-10-02 04:00:00"
+    assert entry["added"] == [{"gmgoCd": "4", "gmgoNm": "금고4", "rates": {DEP: 2.2}}]
+    assert entry["removed"] == [{"gmgoCd": "3", "gmgoNm": "금고3", "rates": {DEP: 2.9}}]
+    assert entry["changed"] == [{"gmgoCd": "1", "gmgoNm": "금고1", "rates": {DEP: {"old": 2.6, "new": 2.75}}},
+                                {"gmgoCd": "2", "gmgoNm": "금고2", "rates": {SAV: {"old": None, "new": 2.1}}}]
+    assert kfcc_changes.record_changes(snapshot(4, {"1": {SAV: "2.4"}, "2": {DEP: "3.0", SAV: "2.1"}, "4": {DEP: "2.2"}}))["changed"] == \
+        [{"gmgoCd": "1", "gmgoNm": "금고1", "rates": {DEP: {"old": 2.75, "new": None}}}]
+
+def test_cursor_and_reset():
+    use_tmp_files(keep=5)
+    kfcc_changes.record_changes(snapshot(1, {"1": {DEP: "2.0"}}))
+    for day in range(2, 10):  # 변경 8건, 최근 5건(seq 4..8)만 보관
+        kfcc_changes.record_changes(snapshot(day, {"1": {DEP: f"{2 + day / 100:.2f}"}}))
+    app = FastAPI()
+    app.include_router(kfcc.router)
+    client = TestClient(app)
+
+    latest = client.get("/api/kfcc/changes").json()
+    assert latest["cursor"] == 8 and [e["seq"] for e in latest["changes"]] == [4, 5, 6, 7, 8]
+    res = client.get("/api/kfcc/changes", params={"since": 6}).json()
+    assert [e["seq"] for e in res["changes"]] == [7, 8] and res["cursor"] == 8 and not res["reset"]
+    assert res["changes"][-1]["changed"][0]["rates"][DEP] == {"old": 2.08, "new": 2.09}
+    res = client.get("/api/kfcc/changes", params={"since": 3, "limit": 2}).json()
+    assert [e["seq"] for e in res["changes"]] == [4, 5] and res["cursor"] == 5 and res["more"]
+    assert client.get("/api/kfcc/changes", params={"since": 8}).json() == {"cursor": 8, "reset": False, "more": False, "changes": []}
+    assert client.get("/api/kfcc/changes", params={"since": 2}).json()["reset"]  # seq 3은 이미 지워짐
+    assert client.get("/api/kfcc/changes", params={"since": 20}).json()["reset"]  # 로그가 초기화된 서버
+    assert len(open(kfcc_changes.CHANGES_FILE, encoding="utf-8").readlines()) == 5
+
+def test_diff_speed():
+    use_tmp_files()
+    rates = {str(i): {DEP: f"{2 + i % 100 / 100:.2f}", SAV: "2.4"} for i in range(10_000)}
+    kfcc_changes.record_changes(snapshot(1, rates))
+    rates = {**rates, **{str(i): {DEP: "3.5", SAV: "2.4"} for i in range(0, 10_000, 100)}}
+    t0 = time.perf_counter()
+    entry = kfcc_changes.record_changes(snapshot(2, rates))
+    elapsed = (time.perf_counter() - t0) * 1000
+    print(f"  10,000 branches diffed and recorded in {elapsed:.0f} ms, change entry {os.path.getsize(kfcc_changes.CHANGES_FILE):,} bytes")
+    assert len(entry["changed"]) == 100 and elapsed < 1000
+
+if __name__ == "__main__":
+    for test in [test_diff_entries, test_cursor_and_reset, test_diff_speed]:
+        test(); print(f"{test.__name__}: OK")
@@ -0,0 +1,99 @@
+import os
+import tempfile
+import numpy as np
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+import kfcc
+import kfcc_history
+
+# KFCC 금리 이력 저장소 검증
+# - 여러 날의 수집 결과를 추가하면 지점별 구간 조회가 추가한 값과 같은지 (같은 기준일 재수집은 마지막 값으로 바뀌는지)
+# - 추가할 때 이미 쓴 파일은 바뀌지 않고(조각 파일만 늘어남), 지나간 달의 조각은 월 파일 하나로 합쳐지는지
+# - 월이 바뀌어도 (월별 파일이 나뉘어도) 이어서 조회되는지, 월마다 지점/상품 사전이 달라도 되는지
+# - 주/월 단위 집계와 전체 지점 집계가 직접 계산한 값과 같은지
+# - /api/kfcc/history의 기본 기간/오류 처리를 확인합니다.
+# 사용법: python test_kfcc_history.py
+
+DEP, SAV = kfcc.PRODUCT_ALIASES["dep"], kfcc.PRODUCT_ALIASES["sav"]
+
+def snapshot(date, rates):
+    """rates: {gmgoCd: {상품: 금리}}"""
+    return {"last_updated": f"{date} 04:00:00",
+            "data": [{"gmgoCd": code, "gmgoNm": f"금고{code}", "rates": {p: str(v) for p, v in r.items()}, "기준일": date.replace("-", "/")}
+                     for code, r in rates.items()]}
+
+def use_tmp_dir():
+    kfcc_history.HISTORY_DIR = tempfile.mkdtemp()
+    kfcc_history._months.clear()
+
+def test_append_and_range():
+    use_tmp_dir()
+    days = np.arange(np.datetime64("2026-01-25"), np.datetime64("2026-02-10"))
+    expected = {}
+    for i, day in enumerate(days):
+        rates = {"100": {DEP: 2.5 + i * 0.01, SAV: 2.4}, "200": {DEP: 3.0}}
+        if i >= 10: rates["050"] = {DEP: 2.0 + i * 0.001}  # 2월에 새로 생긴 지점 (사전 앞쪽에 끼어듭니다)
+        if i == 3: rates["100"][DEP] = 9.9
+        kfcc_history.append_snapshot(snapshot(str(day), rates))
+        if i == 0: first = os.stat(os.path.join(kfcc_history.HISTORY_DIR, "2026-01.0001.npz"))
+        if i == 3:
+            rates["100"][DEP] = 2.53  # 같은 기준일 재수집
+            kfcc_history.append_snapshot(snapshot(str(day), rates))
+            kfcc_history.series(kfcc_history.to_day("2026-01-25"), kfcc_history.to_day("2026-01-31"), "100")  # 조회 캐시를 채워 둡니다.
+        if i == 6:
+            # 1월 조각은 추가만 되었고 처음 쓴 조각은 그대로입니다 (재수집 포함 8개).
+            assert len(kfcc_history.chunk_paths("2026-01")) == 8
+            now = os.stat(os.path.join(kfcc_history.HISTORY_DIR, "2026-01.0001.npz"))
+            assert (now.st_ino, now.st_mtime_ns, now.st_size) == (first.st_ino, first.st_mtime_ns, first.st_size)
+        for code, r in rates.items():
+            for product, rate in r.items(): expected.setdefault((code, product), []).append((str(day), rate))
+    # 2월 수집이 시작되면 1월은 월 파일 하나로 합쳐지고, 2월은 조각으로 남습니다.
+    assert sorted(os.listdir(kfcc_history.HISTORY_DIR)) == ["2026-01.npz"] + [f"2026-02.{n:04d}.npz" for n in range(1, 10)]
+
+    start, end = kfcc_history.to_day("2026-01-28"), kfcc_history.to_day("2026/02/05")
+    for code in ["100", "200", "050"]:
+        got = kfcc_history.series(start, end, code)
+        for product, points in got.items():
+            want = [(d, round(v, 3)) for d, v in expected[(code, product)] if "2026-01-28" <= d <= "2026-02-05"]
+            assert [(p["date"], p["rate"]) for p in points] == want, (code, product)
+    assert kfcc_history.series(start, end, "100")[DEP][0]["rate"] == 2.53
+    assert list(kfcc_history.series(start, end, "100", SAV)) == [SAV]
+    assert kfcc_history.series(start, end, "999") == {}
+
+def test_aggregates():
+    use_tmp_dir()
+    rng = np.random.default_rng(3)
+    days = np.arange(np.datetime64("2026-03-01"), np.datetime64("2026-05-15"))
+    rows = []
+    for day in days:
+        rates = {f"{c:04d}": {DEP: round(float(rng.uniform(2, 3.5)), 2)} for c in range(30)}
+        kfcc_history.append_snapshot(snapshot(str(day), rates))
+        rows += [(day, r[DEP]) for r in rates.values()]
+    start, end = kfcc_history.to_day("2026-03-01"), kfcc_history.to_day("2026-05-14")
+    for interval, bucket in [("week", lambda d: d - (d.astype(int) + 3) % 7), ("month", lambda d: d.astype("datetime64[M]").astype("datetime64[D]"))]:
+        want = {}
+        for day, rate in rows: want.setdefault(str(bucket(day)), []).append(rate)
+        got = kfcc_history.series(start, end, interval=interval)[DEP]
+        assert [p["date"] for p in got] == sorted(want), interval
+        for p in got:
+            values = want[p["date"]]
+            assert p["count"] == len(values) and p["min"] == min(values) and p["max"] == max(values)
+            assert abs(p["mean"] - sum(values) / len(values)) < 1e-4
+    assert got[0]["date"] == "2026-03-01" and got[0]["count"] == 31 * 30
+
+def test_endpoint():
+    use_tmp_dir()
+    kfcc_history.append_snapshot(snapshot("2026-02-03", {"100": {DEP: 2.6}}))
+    app = FastAPI()
+    app.include_router(kfcc.router)
+    client = TestClient(app)
+    res = client.get("/api/kfcc/history", params={"gmgoCd": "100", "from": "2026-02-01", "to": "2026-02-28", "product": "dep"})
+    assert res.status_code == 200 and res.json()["series"] == {DEP: [{"date": "2026-02-03", "rate": 2.6}]}
+    res = client.get("/api/kfcc/history", params={"to": "2026-02-28", "interval": "month"}).json()
+    assert res["from"] == "2025-12-01" and res["series"][DEP][0]["count"] == 1
+    for params in [{"from": "2026-13-01"}, {"interval": "year"}, {"from": "2020-01-01", "to": "2026-01-01"}, {"from": "2026-02-02", "to": "2026-02-01"}]:
+        assert client.get("/api/kfcc/history", params=params).status_code == 400, params
+
+if __name__ == "__main__":
+    for test in [test_append_and_range, test_aggregates, test_endpoint]:
+        test(); print(f"{test.__name__}: OK")
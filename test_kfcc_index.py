@@ -0,0 +1,128 @@
+import asyncio
+import json
+import random
+import numpy as np
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+import kfcc
+
+# KFCC 정렬 인덱스(/api/kfcc/top)와 집계 통계(/api/kfcc/stats) 검증
+# - 상품/지역/정렬 방향별 결과가 전체 데이터를 직접 정렬한 결과와 같은지 (페이지를 이어 붙여도 같은지)
+# - 금리가 없거나 숫자가 아닌 지점은 순위에서 빠지는지, r1/r2가 없는 이전 형식은 주소로 지역을 정하는지 (주소도 없으면 전국에만)
+# - 기본 화면(상위 10개) 응답이 전체 데이터보다 훨씬 작은지
+# - 상품/지역별 통계가 그룹마다 numpy로 직접 계산한 값과 같은지 확인합니다.
+# 사용법: python test_kfcc_index.py
+
+PRODUCTS = list(kfcc.PRODUCT_ALIASES.values())
+REGIONS = {"서울": ["강남구", "마포구", "중구"], "부산": ["중구", "해운대구"], "충북": ["청주시"]}
+
+def sample_data(n=1000, seed=7):
+    rng = random.Random(seed)
+    data = []
+    for i in range(n):
+        r1 = rng.choice(list(REGIONS)); r2 = rng.choice(REGIONS[r1])
+        rates = {p: f"{rng.uniform(1.5, 4.0):.2f}" for p in PRODUCTS if rng.random() > 0.1}
+        if i % 50 == 0: rates[PRODUCTS[0]] = "-"
+        item = {"gmgoCd": str(1000 + i), "gmgoNm": f"금고{i}", "location": f"{r1} {r2} 어딘가로 {i}", "r1": r1, "r2": r2, "rates": rates, "기준일": "2026/10/17"}
+        if i % 7 == 0: del item["r1"], item["r2"]  # 이전 형식
+        data.append(item)
+    return {"last_updated": "2026-10-17 04:00:00", "data": data}
+
+def expected(data, product, region, order):
+    hits = []
+    for item in data["data"]:
+        r1, r2 = (item["location"].split() + ["", ""])[:2]
+        rate = kfcc.to_rate(item["rates"].get(product))
+        if rate is None or region not in (("", r1, f"{r1}/{r2}") if r1 else ("",)): continue
+        hits.append((-rate, item["gmgoNm"], item["gmgoCd"]))
+    hits.sort()
+    codes = [code for *_, code in hits]
+    return codes[::-1] if order == "asc" else codes
+
+def client_for(data):
+    kfcc.invalidate_cache(kfcc.KFCC_INDEX_KEY)
+    asyncio.run(kfcc.store_kfcc_index(kfcc.build_kfcc_index(data)))
+    app = FastAPI()
+    app.include_router(kfcc.router)
+    return TestClient(app)
+
+def test_matches_full_sort():
+    data = sample_data()
+    for item in data["data"][::97]:
+        # 지역을 알 수 없는 지점은 전국 순위에 한 번만 나옵니다.
+        item.pop("r1", None); item.pop("r2", None); item["location"] = ""
+    client = client_for(data)
+    for key, product in kfcc.PRODUCT_ALIASES.items():
+        for region in ["", "서울", "부산/중구", "충북/청주시", "제주"]:
+            for order in ["desc", "asc"]:
+                want = expected(data, product, region, order)
+                got, offset = [], 0
+                while offset is not None:
+                    res = client.get("/api/kfcc/top", params={"product": key, "region": region, "order": order, "n": 100, "offset": offset}).json()
+                    assert res["total"] == len(want)
+                    got += [row["gmgoCd"] for row in res["data"]]
+                    assert all(isinstance(row["rates"][product], float) for row in res["data"])
+                    offset = res["next_offset"]
+                assert got == want, (key, region, order)
+
+def test_errors_and_etag():
+    client = client_for(sample_data())
+    assert client.get("/api/kfcc/top", params={"product": "unknown"}).status_code == 400
+    assert client.get("/api/kfcc/top", params={"order": "up"}).status_code == 400
+    assert client.get("/api/kfcc/top", params={"n": 1000}).status_code == 422
+    res = client.get("/api/kfcc/top")
+    assert client.get("/api/kfcc/top", headers={"If-None-Match": res.headers["etag"]}).status_code == 304
+    other = client.get("/api/kfcc/top", params={"region": "서울"})
+    assert other.headers["etag"] != res.headers["etag"]
+
+def test_default_view_size():
+    data = sample_data()
+    client = client_for(data)
+    res = client.get("/api/kfcc/top", headers={"Accept-Encoding": "identity"})
+    assert len(res.json()["data"]) == 10
+    full = len(json.dumps(data, ensure_ascii=False).encode("utf-8"))
+    raw = int(res.headers["content-length"])
+    res = client.get("/api/kfcc/top", headers={"Accept-Encoding": "br, gzip"})
+    assert res.headers["content-encoding"] in ("br", "gzip")
+    # TestClient는 본문을 풀어서 돌려주므로 전송 크기는 다시 압축해서 잽니다.
+    sent = len(kfcc.compress_body(res.content, quality=5)[res.headers["content-encoding"]])
+    print(f"  full dataset {full:,} bytes -> top 10 {raw:,} bytes ({sent:,} bytes {res.headers['content-encoding']})")
+    assert sent < 1000 and raw * 20 < full
+
+def test_stats_match_numpy():
+    data = sample_data(3000, seed=11)
+    data["data"][0]["rates"]["신상품"] = "5.0"  # TARGET_PRODUCTS 밖의 상품도 집계됩니다.
+    stats = kfcc.build_kfcc_stats(data)
+    assert stats["branches"]["all"] == 3000
+    assert sum(stats["branches"]["regions"].values()) == 3000
+    assert stats["products"]["신상품"]["all"] == {"count": 1, "min": 5.0, "max": 5.0, "mean": 5.0, "median": 5.0, "p10": 5.0, "p25": 5.0, "p75": 5.0, "p90": 5.0}
+    for product in PRODUCTS:
+        groups = {}
+        for item in data["data"]:
+            rate = kfcc.to_rate(item["rates"].get(product))
+            if rate is None: continue
+            r1, r2 = item["location"].split()[:2]
+            for level, name in [("all", None), ("regions", r1), ("districts", f"{r1}/{r2}")]:
+                groups.setdefault((level, name), []).append(rate)
+        for (level, name), rates in groups.items():
+            got = stats["products"][product][level] if level == "all" else stats["products"][product][level][name]
+            values = np.array(rates)
+            want = {"count": len(rates), "min": values.min(), "max": values.max(), "mean": values.mean(), "median": np.median(values),
+                    **{f"p{p}": np.percentile(values, p) for p in kfcc.PERCENTILES}}
+            assert got["count"] == want.pop("count")
+            for key, value in want.items(): assert abs(got[key] - value) < 1e-3, (product, level, name, key)
+        assert len(stats["products"][product]["districts"]) == sum(len(v) for v in REGIONS.values())
+    assert kfcc.build_kfcc_stats({"data": []})["products"] == {}
+
+def test_stats_endpoint():
+    data = sample_data()
+    kfcc.invalidate_cache(kfcc.KFCC_STATS_KEY)
+    asyncio.run(kfcc.store_entry(kfcc.KFCC_STATS_KEY, kfcc.build_kfcc_stats(data)))
+    client = client_for(data)
+    res = client.get("/api/kfcc/stats")
+    assert res.json()["products"][PRODUCTS[0]]["regions"]["서울"]["count"] > 0
+    assert client.get("/api/kfcc/stats", headers={"If-None-Match": res.headers["etag"]}).status_code == 304
+
+if __name__ == "__main__":
+    for test in [test_matches_full_sort, test_errors_and_etag, test_default_view_size, test_stats_match_numpy, test_stats_endpoint]:
+        test(); print(f"{test.__name__}: OK")
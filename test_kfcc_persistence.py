@@ -0,0 +1,140 @@
+import asyncio
+import json
+import os
+import tempfile
+import tracemalloc
+import httpx
+import kfcc_crawler
+from adaptive_limiter import AdaptiveLimiter
+from test_adaptive_limiter import StandInServer, RATE_PAGE
+
+# KFCC 결과 스트리밍 영속화 검증
+# - 중간에 중단된 수집을 다시 실행하면 부분 결과(NDJSON)에서 이어서 수집하는지
+# - 잘린 마지막 줄을 무시하고, 출력 파일은 임시 파일 + rename으로 한 번에 교체되는지
+# - 파싱에 실패한 금고가 조용히 빠지지 않고 실패로 세어져 재시도되는지
+# - 한쪽 페이지만 304이고 지문이 다르면, 다시 받은 응답으로 페이지 상태(지문, ETag)를 저장하는지
+# - 금고 수가 늘어도 수집 중 메모리 사용량이 크게 늘지 않는지 확인합니다.
+# 사용법: python test_kfcc_persistence.py
+
+def setup(tmp, regions):
+    kfcc_crawler.ALL_REGIONS = regions
+    kfcc_crawler.SWEEP_DELAY = 0.1
+    kfcc_crawler.PARTIAL_FILE = os.path.join(tmp, "partial.ndjson")
+    kfcc_crawler.BRANCHES_FILE = os.path.join(tmp, "branches.ndjson")
+    return os.path.join(tmp, "kfcc_data.json")
+
+async def test_resume_after_crash():
+    server = StandInServer(5, 0, 64)
+    kfcc_crawler.BASE_URL = await server.start()
+    output = setup(tempfile.mkdtemp(), [["서울", "강남구", "마포구"], ["부산", "중구"]])
+    expected = 3 * 40
+
+    # 1. 일부만 수집한 뒤 중단 (프로세스 종료와 같은 효과)
+    task = asyncio.create_task(kfcc_crawler.run_crawler(incremental=False, output_path=output, last_updated="2026-01-25 10:00:00"))
+    while not os.path.exists(kfcc_crawler.PARTIAL_FILE) or os.path.getsize(kfcc_crawler.PARTIAL_FILE) < 8000:
+        await asyncio.sleep(0.01)
+    task.cancel()
+    try: await task
+    except asyncio.CancelledError: pass
+    assert not os.path.exists(output)
+    # 기록 도중 끊긴 줄을 흉내 냅니다.
+    with open(kfcc_crawler.PARTIAL_FILE, "ab") as f: f.write(b'{"gmgoCd": "broken", "da')
+    done_before = len(kfcc_crawler.BranchLog(kfcc_crawler.PARTIAL_FILE))
+    assert 0 < done_before < expected, done_before
+
+    # 2. 다시 실행하면 끝난 금고는 건너뜁니다.
+    requests_before = server.stats["requests"]
+    count = await kfcc_crawler.run_crawler(incremental=False, output_path=output, last_updated="2026-01-25 10:00:00")
+    assert count == expected, count
+    assert kfcc_crawler.last_run_stats["resumed"] == done_before
+    assert server.stats["requests"] - requests_before < expected * 2 + 3
+    with open(output, "r", encoding="utf-8") as f: saved = json.load(f)
+    assert saved["last_updated"] == "2026-01-25 10:00:00"
+    assert len(saved["data"]) == expected and len({d["gmgoCd"] for d in saved["data"]}) == expected
+    assert not os.path.exists(kfcc_crawler.PARTIAL_FILE) and os.path.exists(kfcc_crawler.BRANCHES_FILE)
+    server.server.close()
+
+async def test_parse_failures_retried():
+    server = StandInServer(1, 0, 64)
+    kfcc_crawler.BASE_URL = await server.start()
+    regions = [["서울", "강남구"]]
+    expected = 40
+    parse, calls = kfcc_crawler.parse_bank_pages, {"count": 0}
+
+    def flaky(bodies):
+        calls["count"] += 1
+        if calls["count"] <= 3: raise ValueError("parser broke")
+        return parse(bodies)
+
+    def broken(bodies):
+        raise ValueError("parser broke")
+
+    kfcc_crawler.PARSE_EXECUTOR = "thread"  # 바꾼 파서를 그대로 쓰도록 스레드 풀에서 파싱합니다.
+    try:
+        # 일시적인 파싱 실패는 재시도에서 복구됩니다.
+        kfcc_crawler.parse_bank_pages = flaky
+        setup(tempfile.mkdtemp(), regions)
+        results = await kfcc_crawler.run_crawler(incremental=False, last_updated="2026-01-25 10:00:00")
+        assert len(results) == expected
+        assert kfcc_crawler.last_run_stats["parse_errors"] == 3 and kfcc_crawler.last_run_stats["failed"] == 0, kfcc_crawler.last_run_stats
+        # 파서가 계속 실패하면 "성공한" 수집이 아니라 실패로 남습니다.
+        kfcc_crawler.parse_bank_pages = broken
+        setup(tempfile.mkdtemp(), regions)
+        results = await kfcc_crawler.run_crawler(incremental=False, last_updated="2026-01-25 10:00:00")
+        assert results == [] and kfcc_crawler.last_run_stats["failed"] == expected, kfcc_crawler.last_run_stats
+        assert kfcc_crawler.last_run_stats["parse_errors"] == expected * 2
+    finally:
+        kfcc_crawler.parse_bank_pages = parse
+        kfcc_crawler.PARSE_EXECUTOR = "process"
+    server.server.close()
+
+async def peak_memory(regions):
+    output = setup(tempfile.mkdtemp(), regions)
+    tracemalloc.start()
+    await kfcc_crawler.run_crawler(incremental=False, output_path=output, last_updated="2026-01-25 10:00:00")
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+async def test_memory_flat():
+    # 실제 금리 페이지(약 10KB)와 비슷한 크기로 응답합니다.
+    server = StandInServer(1, 0, 64, padding=10_000)
+    kfcc_crawler.BASE_URL = await server.start()
+    # 동시 요청 수를 고정하여 두 실행의 차이가 금고 수에서만 나오게 합니다.
+    os.environ["CRAWL_INITIAL_CONCURRENCY"] = os.environ["CRAWL_MAX_CONCURRENCY"] = "16"
+    # 수집 중인 페이지와 파싱 큐가 가득 차는 정상 상태까지 가도록 두 실행 모두 충분히 크게 잡습니다.
+    districts = [f"구{i}" for i in range(32)]
+    await peak_memory([["서울"] + districts[:2]])  # 모듈 import 등 1회성 할당 제외
+    small = await peak_memory([["서울"] + districts[:8]])
+    large = await peak_memory([["서울"] + districts])
+    per_bank = (large - small) / (24 * 40)
+    print(f"peak memory: 320 banks {small / 1024:.0f} KB, 1280 banks {large / 1024:.0f} KB ({per_bank:.0f} B per extra bank)")
+    # 금고 수에 비례해 늘어나는 것은 금고 목록과 오프셋 색인(금고당 수백 바이트)뿐이어야 합니다.
+    # 페이지나 결과를 모아 두면 금고당 20KB(페이지 2장) 이상 늘어납니다.
+    assert per_bank < 5 * 1024, (small, large)
+    server.server.close()
+
+async def test_partial_304_refetch_state():
+    pages = {"13": RATE_PAGE.format(title="MG더뱅킹정기예금", rate="3.20"), "14": RATE_PAGE.format(title="MG더뱅킹정기적금", rate="3.60")}
+    sent = []
+    def handler(request):
+        gubun = request.url.params["gubuncode"]
+        sent.append((gubun, request.headers.get("if-none-match")))
+        # 예금 페이지는 조건부 요청에 304로 답하지만, 서버 쪽 내용은 이전 상태와 다릅니다.
+        if gubun == "13" and request.headers.get("if-none-match") == '"old-13"': return httpx.Response(304)
+        return httpx.Response(200, text=pages[gubun], headers={"ETag": f'"new-{gubun}"'})
+    bank = {"gmgoCd": "1001", "gmgoNm": "금고", "addr": "서울 강남구", "r1": "서울", "r2": "강남구"}
+    prev = {"fingerprint": "stale", "data": {"gmgoCd": "1001"},
+            "pages": {"13": {"hash": "old-hash-13", "etag": '"old-13"'}, "14": {"hash": "old-hash-14", "etag": '"old-14"'}}}
+    stats = {"not_modified": 0, "skipped": 0}
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+        record, bodies = await kfcc_crawler.fetch_bank_pages_incremental(client, bank, AdaptiveLimiter(initial=2), prev, stats)
+    assert bodies == pages
+    assert sent[2:] == [("13", None), ("14", None)], sent
+    want = {g: {"hash": kfcc_crawler.page_fingerprint(pages[g]), "etag": f'"new-{g}"', "last_modified": None} for g in pages}
+    assert record["pages"] == want, record
+    assert record["fingerprint"] == kfcc_crawler.bank_fingerprint(want)
+
+if __name__ == "__main__":
+    for test in [test_resume_after_crash, test_parse_failures_retried, test_partial_304_refetch_state, test_memory_flat]:
+        asyncio.run(test()); print(f"{test.__name__}: OK")
@@ -0,0 +1,153 @@
+import asyncio
+import json
+import os
+import tempfile
+import time
+from sqlalchemy import create_engine, func, select, insert, delete
+import httpx
+import geocoder
+import local_currency
+from geocoder import Geocoder, normalize_address
+from local_currency import Merchant
+from adaptive_limiter import RateLimiter
+from test_adaptive_limiter import StandInServer
+
+# 가맹점 동기화 파이프라인 검증 (SQLite + 가짜 공공 API 서버)
+# - 페이지를 동시에 가져오되 원본별 속도 제한과 동시 요청 수를 지키는지
+# - 중간 페이지가 실패하면 연속으로 끝난 페이지까지 기록하고, 다음 실행이 그 다음부터 이어가는지
+# - 전체 적재가 끝난 뒤에만 원본에서 사라진 가맹점을 지우는지,
+# - 지오코딩 결과(찾지 못한 주소 포함)를 캐시하여 다음 동기화에서 다시 요청하지 않는지,
+#   깨진 응답 본문은 그 주소 하나의 일시적인 실패로 세고 캐시하지 않는지 확인합니다.
+# 사용법: python test_merchant_sync.py
+
+GG_ROWS = 2350
+ONNURI_ROWS = 730
+NOT_FOUND = {f"서울시 {i}" for i in (13, 400)}
+
+class OpenApiServer(StandInServer):
+    """경기지역화폐(RegionMnyFacltStus)와 온누리(odcloud) 목록 API를 흉내 냅니다. broken 페이지는 오류 응답을 돌려줍니다."""
+
+    def __init__(self):
+        super().__init__(latency_ms=10, error_rate=0, capacity=1000)
+        self.broken = set()
+
+    def body_for(self, path, query):
+        if path.endswith("address.json"):
+            if query["query"] in NOT_FOUND: return json.dumps({"documents": []})
+            return json.dumps({"documents": [{"y": "37.5", "x": "127.0"}]})
+        if path.endswith("RegionMnyFacltStus"):
+            page, size = int(query["pIndex"]), int(query["pSize"])
+            if page in self.broken: return json.dumps({"RESULT": {"CODE": "ERROR-500", "MESSAGE": "서버 오류"}})
+            rows = [{"CMPNM_NM": f"가맹점{i}", "REFINE_WGS84_LAT": f"{37 + i / 1e5:.7f}", "REFINE_WGS84_LOGT": "127.0000000",
+                     "REFINE_ROADNM_ADDR": f"경기도 {i}", "INDUTYPE_NM": "음식점", "TELNO": ""}
+                    for i in range((page - 1) * size, min(page * size, GG_ROWS))]
+            return json.dumps({"RegionMnyFacltStus": [{"head": [{"list_total_count": GG_ROWS}]}, {"row": rows}]}, ensure_ascii=False)
+        page, size = int(query["page"]), int(query["perPage"])
+        rows = [{"가맹점명": f"시장{i}", "소재지": f"서울시 {i}", "취급품목": "농산물"} for i in range((page - 1) * size, min(page * size, ONNURI_ROWS))]
+        return json.dumps({"page": page, "perPage": size, "totalCount": ONNURI_ROWS, "data": rows}, ensure_ascii=False)
+
+def setup(base):
+    tmp = tempfile.mkdtemp()
+    local_currency.engine = create_engine(f"sqlite:///{os.path.join(tmp, 'merchants.db')}")
+    Merchant.metadata.create_all(bind=local_currency.engine)  # geocode_cache 포함
+    local_currency.SYNC_STATE_FILE = os.path.join(tmp, "sync_state.json")
+    local_currency.GG_URL = f"{base}/openapi/RegionMnyFacltStus"
+    local_currency.ONNURI_URL = f"{base}/api/onnuri"
+    local_currency.GG_PAGE_SIZE = 100
+    local_currency.ONNURI_PAGE_SIZE = 100
+    local_currency.SOURCE_RATES.update(gg=50, onnuri=50)
+
+def new_geocoder():
+    return Geocoder(local_currency.engine)
+
+def onnuri_rows_with(run):
+    async def to_rows(items, synced_at): return await local_currency.onnuri_rows(items, synced_at, run)
+    return to_rows
+
+def count(*where):
+    with local_currency.engine.connect() as conn:
+        return conn.execute(select(func.count()).select_from(Merchant).where(*where)).scalar()
+
+async def test_rate_limiter():
+    rate = RateLimiter(20)
+    started = time.monotonic()
+    for _ in range(30): await rate.acquire()
+    elapsed = time.monotonic() - started
+    # 처음 20개는 버스트로, 나머지 10개는 초당 20개 속도로
+    assert 0.45 <= elapsed < 0.8, elapsed
+
+async def test_gg_resume_and_stale_removal():
+    server = OpenApiServer()
+    setup(await server.start())
+    with local_currency.engine.begin() as conn:
+        conn.execute(insert(Merchant.__table__), [{"type": "gg", "name": "폐업", "source_key": "폐업|0|0", "last_updated": "2025-01-01 00:00:00"},
+                                                 {"type": "onnuri", "name": "다른 원본", "source_key": "x", "last_updated": "2025-01-01 00:00:00"}])
+    server.broken = {7}
+    assert not await local_currency.sync_pages("gg", local_currency.fetch_gg_page, local_currency.gg_rows, 100)
+    state = local_currency.load_sync_state()["gg"]
+    assert state["done_upto"] == 6, state
+    # 실패한 실행에서는 오래된 행을 지우지 않습니다.
+    assert count(Merchant.name == "폐업") == 1
+    assert server.stats["peak"] <= local_currency.SYNC_CONCURRENCY, server.stats
+
+    server.broken = set()
+    requests_before = server.stats["requests"]
+    assert await local_currency.sync_pages("gg", local_currency.fetch_gg_page, local_currency.gg_rows, 100)
+    # 첫 페이지(전체 건수 확인) + 7페이지부터 24페이지까지만 다시 요청합니다.
+    assert server.stats["requests"] - requests_before == 1 + 18, server.stats
+    assert count(Merchant.type == "gg") == GG_ROWS
+    assert count(Merchant.name == "폐업") == 0
+    assert count(Merchant.type == "onnuri") == 1
+    assert "gg" not in local_currency.load_sync_state()
+    server.server.close()
+
+async def test_onnuri_geocode_cache():
+    server = OpenApiServer()
+    base = await server.start()
+    setup(base)
+    geocoder.KAKAO_GEOCODE_URL = f"{base}/v2/local/search/address.json"
+    # 첫 동기화: 찾지 못하는 주소를 제외하고 모두 지오코딩하여 캐시에 저장합니다.
+    assert await local_currency.sync_pages("onnuri", local_currency.fetch_onnuri_page, onnuri_rows_with(run := new_geocoder()), 100)
+    await run.close()
+    assert run.stats["requests"] == ONNURI_ROWS and run.stats["not_found"] == len(NOT_FOUND), run.stats
+    assert count(Merchant.type == "onnuri") == ONNURI_ROWS - len(NOT_FOUND)
+
+    # 같은 동기화: 이미 좌표가 있는 가맹점은 캐시도 조회하지 않고, 실패했던 주소는 다시 요청하지 않습니다.
+    assert await local_currency.sync_pages("onnuri", local_currency.fetch_onnuri_page, onnuri_rows_with(run := new_geocoder()), 100)
+    await run.close()
+    assert run.stats["requests"] == 0 and run.stats["lookups"] == len(NOT_FOUND) and run.hit_ratio() == 1.0, run.stats
+
+    # 가맹점 테이블을 비워도 주소 캐시로 다시 채웁니다 (Kakao 요청 없음).
+    with local_currency.engine.begin() as conn:
+        conn.execute(delete(Merchant))
+    assert await local_currency.sync_pages("onnuri", local_currency.fetch_onnuri_page, onnuri_rows_with(run := new_geocoder()), 100)
+    await run.close()
+    assert run.stats["requests"] == 0 and run.stats["negative_hits"] == len(NOT_FOUND), run.stats
+    assert count(Merchant.type == "onnuri") == ONNURI_ROWS - len(NOT_FOUND)
+    server.server.close()
+
+async def test_malformed_geocode_response():
+    setup("http://unused.test")
+    def handler(request):
+        query = request.url.params["query"]
+        if query == "서울시 html": return httpx.Response(200, text="<html>점검 중</html>")
+        if query == "서울시 shape": return httpx.Response(200, json={"documents": [{"lat": "37.5"}]})
+        return httpx.Response(200, json={"documents": [{"y": "37.5", "x": "127.0"}]})
+    run = new_geocoder()
+    await run.client.aclose()
+    run.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    results = await run.geocode_many(["서울시 html", "서울시 shape", "서울시 1"])
+    await run.close()
+    # 깨진 응답이 같은 페이지의 다른 주소를 막지 않고, 찾지 못함(negative cache)으로 저장되지도 않습니다.
+    assert results == {"서울시 html": (None, None), "서울시 shape": (None, None), "서울시 1": (37.5, 127.0)}, results
+    assert run.stats["errors"] == 2 and run.stats["not_found"] == 0 and run.stats["found"] == 1, run.stats
+    assert geocoder.load_geocodes(["서울시 html", "서울시 shape", "서울시 1"], local_currency.engine) == {"서울시 1": (37.5, 127.0)}
+
+def test_normalize_address():
+    assert normalize_address(" 서울시  종로구 종로 1 (종로1가) ") == "서울시 종로구 종로 1"
+    assert normalize_address("서울시 종로구 종로１") == "서울시 종로구 종로1"
+
+if __name__ == "__main__":
+    test_normalize_address(); print("test_normalize_address: OK")
+    for test in [test_rate_limiter, test_gg_resume_and_stale_removal, test_onnuri_geocode_cache, test_malformed_geocode_response]:
+        asyncio.run(test()); print(f"{test.__name__}: OK")
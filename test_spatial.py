@@ -0,0 +1,56 @@
+import math
+import random
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+from local_currency import Merchant, nearest_merchants, encode_cursor, decode_cursor
+from spatial import geohash_encode, cover_ranges, haversine_km, KM_PER_DEGREE
+
+# 반경 검색 검증
+# - 지오해시 인코딩과, 반경 안의 모든 점이 cover_ranges의 범위 안에 들어가는지
+# - nearest_merchants가 전수 계산한 최근접 목록과 같고, 커서로 나눠 받아도 빠지거나 겹치는 항목이 없는지 확인합니다.
+# 사용법: python test_spatial.py
+
+def test_geohash_encode():
+    assert geohash_encode(57.64911, 10.40744, 11) == "u4pruydqqvj"
+    assert geohash_encode(37.5665, 126.9780, 5) == "wydm9"
+
+def test_cover_ranges_contain_radius():
+    rnd = random.Random(1)
+    for _ in range(500):
+        lat, lon = 33 + rnd.random() * 5, 126 + rnd.random() * 3
+        radius = rnd.choice([0.1, 0.5, 2, 5, 20])
+        ranges = cover_ranges(lat, lon, radius)
+        for _ in range(20):
+            bearing, d = rnd.random() * 2 * math.pi, radius * math.sqrt(rnd.random())
+            plat = lat + d * math.cos(bearing) / KM_PER_DEGREE
+            plon = lon + d * math.sin(bearing) / (KM_PER_DEGREE * math.cos(math.radians(lat)))
+            if haversine_km(lat, lon, plat, plon) > radius: continue
+            cell = geohash_encode(plat, plon)
+            assert any(lo <= cell and (hi is None or cell < hi) for lo, hi in ranges), (lat, lon, radius, cell, ranges)
+
+def test_nearest_matches_brute_force():
+    engine = create_engine("sqlite://")
+    Merchant.metadata.create_all(bind=engine)
+    rnd = random.Random(2)
+    rows = []
+    for i in range(20_000):
+        lat, lon = 37.4 + rnd.random() * 0.2, 126.9 + rnd.random() * 0.2
+        rows.append({"type": "onnuri", "source_key": str(i), "name": f"{'약국' if i % 7 == 0 else '시장'}{i}",
+                     "address": f"주소 {i}", "lat": lat, "lon": lon, "geohash": geohash_encode(lat, lon)})
+    with engine.begin() as conn:
+        conn.execute(insert(Merchant.__table__), rows)
+    db = sessionmaker(bind=engine)()
+    for lat, lon, radius, keyword in [(37.5, 127.0, 1.0, None), (37.45, 126.95, 3.0, None), (37.5, 127.0, 2.0, "약국")]:
+        expected = sorted((haversine_km(lat, lon, r["lat"], r["lon"]), i + 1) for i, r in enumerate(rows)
+                          if haversine_km(lat, lon, r["lat"], r["lon"]) <= radius and (not keyword or keyword in r["name"]))
+        collected, after = [], None
+        while True:
+            hits, has_more = nearest_merchants(db, "onnuri", lat, lon, radius, 37, after, keyword)
+            collected += [(d, row.id) for d, row in hits]
+            if not has_more: break
+            after = decode_cursor(encode_cursor(hits[-1][0], hits[-1][1].id))
+        assert collected == expected, (len(collected), len(expected))
+
+if __name__ == "__main__":
+    for test in [test_geohash_encode, test_cover_ranges_contain_radius, test_nearest_matches_brute_force]:
+        test(); print(f"{test.__name__}: OK")
@@ -0,0 +1,49 @@
+import os
+import asyncio
+import signal
+import sys
+import psutil
+from datetime import datetime
+from shared import r, rb, seoul_tz, listen_invalidations, DATA_DIR, REDIS_HOST, REDIS_PORT
+import jobs
+
+# 크롤러 워커 (Crawler worker)
+# - 웹 서버(uvicorn)와 분리된 프로세스에서 jobs 큐의 크롤링 작업과 매일 04:00 스케줄을 실행합니다.
+# - 웹 서버는 CRAWL_WORKER=external로 띄워 작업을 큐에 넣기만 하게 합니다. 큐/상태는 Redis로 공유하므로 Redis에 연결되지 않으면 종료합니다.
+# - 워커를 여러 개 띄워도 스케줄러 작업은 리더 잠금을 잡은 하나만 큐에 넣습니다.
+# - 데이터 파일(kfcc_data.json, 카드사별 *_data.json, 크롤러 상태, KFCC 이력/변경 로그, 카드 이벤트 변경 로그/스냅샷)은 CRAWL_DATA_DIR에 씁니다. 웹 서버와 같은 볼륨이어야 합니다.
+# 사용법: CRAWL_WORKER=external CRAWL_DATA_DIR=/data python worker.py
+
+async def main():
+    # 웹 서버가 넣은 작업은 Redis 큐로만 전달되므로, Redis 없이 뜬 워커는 아무 작업도 받지 못합니다.
+    if not r:
+        print(f"Redis is not reachable at {REDIS_HOST}:{REDIS_PORT}: set REDIS_HOST/REDIS_PORT/REDIS_PASSWORD to the server the web process uses.")
+        sys.exit(1)
+    if not DATA_DIR:
+        print("CRAWL_DATA_DIR is not set: mount a volume shared with the web server and point CRAWL_DATA_DIR at it.")
+        sys.exit(1)
+    await jobs.mark_data_dir()
+    import local_currency
+    await asyncio.to_thread(local_currency.init_db)
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    scheduler, tasks = jobs.start_worker()
+    tasks.append(asyncio.create_task(listen_invalidations()))
+    mem_mb = psutil.Process(os.getpid()).memory_info().rss / 1024 / 1024
+    print(f"[{datetime.now(seoul_tz)}] Crawler worker ready. Daily crawl scheduled for 04:00 AM (leader only). Current Memory Usage: {mem_mb:.2f} MB")
+
+    await stop.wait()
+    print(f"[{datetime.now(seoul_tz)}] Crawler worker stopping...")
+    scheduler.shutdown(wait=False)
+    # worker_loop는 취소되면 실행 중인 작업을 마무리(상태 기록, ack, 임대 해제)하고 끝나므로, 모두 끝난 뒤에 Redis 풀을 닫습니다.
+    for task in tasks: task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    if r: await r.connection_pool.disconnect()
+    if rb: await rb.connection_pool.disconnect()
+
+if __name__ == "__main__":
+    asyncio.run(main())